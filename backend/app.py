@@ -1,10 +1,16 @@
-from flask import Flask
+from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
 import os
 
+# Load environment variables and set up logging before the modules that read them at import time
+load_dotenv()
+
+from utils.log_config import configure_logging
+configure_logging()
+
 from routes.sempgrep import semgrep_bp
 from routes.History import history_bp
 from routes.user_routes import user_bp
@@ -15,12 +21,15 @@ from routes.scan_routes import scan_bp
 from routes.checkov import checkov_bp
 from routes.risks import risks_bp
 from routes.t5_base import t5_base_bp
-
-# Load environment variables
-load_dotenv()
+from routes.jobs_routes import jobs_bp
+from utils.scheduler import SchedulerBusy
+from utils.db import db_pool, DatabaseUnavailable
+from utils.http_cache import init_compression
+from utils.migrations import upgrade_on_startup
 
 app = Flask(__name__)
 CORS(app)
+init_compression(app)
 bcrypt = Bcrypt(app)
 
 # JWT configuration
@@ -42,6 +51,26 @@ app.register_blueprint(history_bp, url_prefix="/")
 app.register_blueprint(semgrep_bp, url_prefix="/")
 app.register_blueprint(risks_bp, url_prefix="/")
 app.register_blueprint(t5_base_bp,url_prefix="/")
+app.register_blueprint(jobs_bp, url_prefix="/")
+
+
+@app.errorhandler(SchedulerBusy)
+def scan_queue_full(e):
+    """Backpressure from the scan scheduler: 429 with a Retry-After estimate."""
+    response = jsonify({"error": str(e), "retry_after": e.retry_after})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+
+@app.errorhandler(DatabaseUnavailable)
+def database_unavailable(e):
+    return jsonify({"error": "Base de données indisponible"}), 503
+
+
+db_pool.warm_up()
+upgrade_on_startup()
+
 
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,62 @@
+-- Tables the application was written against. IF NOT EXISTS keeps this a
+-- no-op on databases created before migrations existed.
+
+CREATE TABLE IF NOT EXISTS users_test (
+    id SERIAL PRIMARY KEY,
+    name TEXT,
+    email TEXT UNIQUE,
+    password TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS github_users (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users_test (id) ON DELETE CASCADE,
+    github_id BIGINT,
+    access_token TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS selected_repos (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    full_name TEXT NOT NULL UNIQUE,
+    name TEXT,
+    html_url TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS repo_configs (
+    id SERIAL PRIMARY KEY,
+    repo_id INTEGER NOT NULL REFERENCES selected_repos (id) ON DELETE CASCADE,
+    file_path TEXT NOT NULL,
+    file_name TEXT,
+    content BYTEA,
+    sha TEXT,
+    framework TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    UNIQUE (file_path, repo_id)
+);
+
+CREATE TABLE IF NOT EXISTS scan_history (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    repo_id INTEGER REFERENCES selected_repos (id) ON DELETE SET NULL,
+    scan_result JSONB,
+    repo_url TEXT,
+    status TEXT,
+    score INTEGER,
+    compliant BOOLEAN,
+    input_type TEXT,
+    scan_type TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS file_contents (
+    id SERIAL PRIMARY KEY,
+    scan_id INTEGER NOT NULL REFERENCES scan_history (id) ON DELETE CASCADE,
+    file_path TEXT,
+    content TEXT,
+    input_type TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,15 @@
+-- Reuse of repository scans by commit (utils/commit_cache.py): the commit and
+-- scanner version of history scans, and the raw /scan results
+
+ALTER TABLE scan_history ADD COLUMN IF NOT EXISTS commit_sha TEXT;
+ALTER TABLE scan_history ADD COLUMN IF NOT EXISTS scanner_version TEXT;
+
+CREATE TABLE IF NOT EXISTS repo_scan_cache (
+    user_id TEXT NOT NULL,
+    repo_url TEXT NOT NULL,
+    commit_sha TEXT NOT NULL,
+    scanner_version TEXT NOT NULL,
+    result JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, repo_url, commit_sha, scanner_version)
+);
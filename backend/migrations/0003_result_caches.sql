@@ -0,0 +1,23 @@
+-- Shared tiers of the suggestion and Checkov result caches
+-- (utils/suggestion_cache.py, utils/scan_cache.py)
+
+CREATE TABLE IF NOT EXISTS suggestion_cache (
+    check_id TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    framework TEXT NOT NULL,
+    suggestion TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    last_used_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (check_id, resource_type, framework)
+);
+
+CREATE TABLE IF NOT EXISTS checkov_result_cache (
+    cache_key TEXT PRIMARY KEY,
+    result JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    last_used_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Pruning drops expired rows, then the least recently used ones
+CREATE INDEX IF NOT EXISTS suggestion_cache_last_used_idx ON suggestion_cache (last_used_at);
+CREATE INDEX IF NOT EXISTS checkov_result_cache_last_used_idx ON checkov_result_cache (last_used_at);
@@ -0,0 +1,14 @@
+-- Per-user rollup behind /stats (utils/scan_stats.py). Fill it for existing
+-- scans with: python -m utils.scan_stats backfill
+
+CREATE TABLE IF NOT EXISTS user_scan_stats (
+    user_id TEXT NOT NULL,
+    scan_type TEXT NOT NULL,
+    total_scans BIGINT NOT NULL DEFAULT 0,
+    passed BIGINT NOT NULL DEFAULT 0,
+    failed BIGINT NOT NULL DEFAULT 0,
+    score_sum BIGINT NOT NULL DEFAULT 0,
+    score_count BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, scan_type)
+);
@@ -0,0 +1,20 @@
+-- Normalized failed checks behind /risks (utils/findings.py). Fill it for
+-- existing scans with: python -m utils.findings backfill
+
+CREATE TABLE IF NOT EXISTS findings (
+    id BIGSERIAL PRIMARY KEY,
+    scan_id INTEGER NOT NULL,
+    user_id TEXT NOT NULL,
+    scan_type TEXT NOT NULL,
+    check_id TEXT,
+    severity TEXT NOT NULL,
+    file_path TEXT,
+    fingerprint TEXT NOT NULL,
+    message TEXT,
+    suggestion TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS findings_user_created_idx ON findings (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS findings_scan_id_idx ON findings (scan_id, id DESC);
+CREATE INDEX IF NOT EXISTS findings_user_fingerprint_idx ON findings (user_id, fingerprint);
@@ -0,0 +1,16 @@
+-- Content-addressed storage of scanned files (utils/blob_store.py). Move
+-- existing inline content with: python -m utils.blob_store migrate
+
+CREATE TABLE IF NOT EXISTS file_blobs (
+    hash TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    data BYTEA NOT NULL,
+    raw_size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE file_contents ADD COLUMN IF NOT EXISTS blob_hash TEXT REFERENCES file_blobs (hash);
+ALTER TABLE file_contents ALTER COLUMN content DROP NOT NULL;
+CREATE INDEX IF NOT EXISTS file_contents_blob_hash_idx ON file_contents (blob_hash);
@@ -0,0 +1,9 @@
+-- Per-user change versions behind ETag / Last-Modified (utils/http_cache.py)
+
+CREATE TABLE IF NOT EXISTS user_data_versions (
+    user_id TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    changed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, scope)
+);
@@ -0,0 +1,21 @@
+-- Indexes for the access paths of the read endpoints and scan writers.
+-- `python -m utils.migrations check-plans` verifies the planner uses them.
+
+-- /history (keyset pages), /risks default scope
+CREATE INDEX IF NOT EXISTS scan_history_user_created_idx
+    ON scan_history (user_id, created_at DESC, id DESC);
+-- /history?scan_type=, /risks?scan_type=
+CREATE INDEX IF NOT EXISTS scan_history_user_type_created_idx
+    ON scan_history (user_id, scan_type, created_at DESC, id DESC);
+-- Commit-cache reuse and incremental rescans: latest scan of a repository
+CREATE INDEX IF NOT EXISTS scan_history_user_repo_idx
+    ON scan_history (user_id, repo_url, scan_type, created_at DESC);
+
+-- item_name lookup of /history, file listing of /history/<id>/files
+CREATE INDEX IF NOT EXISTS file_contents_scan_id_idx ON file_contents (scan_id, id);
+
+-- /github/repo-configs, /github/repos, GitHub OAuth callback
+CREATE INDEX IF NOT EXISTS selected_repos_user_id_idx ON selected_repos (user_id);
+CREATE INDEX IF NOT EXISTS github_users_user_id_idx ON github_users (user_id);
+CREATE INDEX IF NOT EXISTS github_users_github_id_idx ON github_users (github_id);
+CREATE INDEX IF NOT EXISTS repo_configs_repo_id_idx ON repo_configs (repo_id);
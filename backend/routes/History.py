@@ -1,78 +1,153 @@
+import base64
+import logging
+from datetime import datetime
+
 from flask import Blueprint, request, jsonify
-from routes.checkov import logger
-from utils.db import get_db_connection
+from utils.blob_store import load_file_contents
+from utils.db import db_cursor
+from utils.http_cache import conditional
+from utils.result_codec import render_result
 
 history_bp = Blueprint('history', __name__)
 
+logger = logging.getLogger(__name__)
+
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 200
+
+# List projection: everything but scan_result, plus the first saved file to name the item
+HISTORY_LIST_QUERY = """
+    SELECT sh.id, sh.repo_id, sh.repo_url, sh.status, sh.score, sh.compliant, sh.created_at,
+           sh.input_type, sh.scan_type, fc.id, fc.file_path
+    FROM scan_history sh
+    LEFT JOIN LATERAL (
+        SELECT id, file_path FROM file_contents
+        WHERE scan_id = sh.id
+        ORDER BY id
+        LIMIT 1
+    ) fc ON sh.input_type IS NOT NULL AND sh.input_type <> ''
+    WHERE sh.user_id = %s {filters}
+    ORDER BY sh.created_at DESC, sh.id DESC
+    LIMIT %s
+"""
+
+HISTORY_DETAIL_QUERY = """
+    SELECT sh.id, sh.repo_id, sh.repo_url, sh.status, sh.score, sh.compliant, sh.created_at,
+           sh.input_type, sh.scan_type, fc.id, fc.file_path, sh.scan_result
+    FROM scan_history sh
+    LEFT JOIN LATERAL (
+        SELECT id, file_path FROM file_contents WHERE scan_id = sh.id ORDER BY id LIMIT 1
+    ) fc ON sh.input_type IS NOT NULL AND sh.input_type <> ''
+    WHERE sh.id = %s AND sh.user_id = %s
+"""
+
+
+def encode_cursor(created_at, scan_id):
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{scan_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) from a cursor; raises ValueError if it is malformed."""
+    created_at, _, scan_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").partition("|")
+    return datetime.fromisoformat(created_at), int(scan_id)
+
+
+def history_page_query(user_id, scan_type=None, after=None, limit=HISTORY_DEFAULT_LIMIT):
+    """SQL and params of one page of the history list, plus one row telling whether another page follows."""
+    filters = ""
+    params = [user_id]
+    if scan_type:
+        filters += " AND sh.scan_type = %s"
+        params.append(scan_type)
+    if after:
+        filters += " AND (sh.created_at, sh.id) < (%s, %s)"
+        params.extend(after)
+    params.append(limit + 1)
+    return HISTORY_LIST_QUERY.format(filters=filters), params
+
+
+def _history_item(row):
+    return {
+        "id": row[0],
+        "repo_id": row[1],
+        "repo_url": row[2],
+        "item_name": f"{row[10]} {row[9]}" if row[9] is not None else None,  # file_path + id
+        "status": row[3],
+        "score": row[4],
+        "compliant": row[5],
+        "created_at": row[6].isoformat(),
+        "input_type": row[7],
+        "scan_type": row[8]
+    }
+
 
 @history_bp.route("/history", methods=["GET"])
+@conditional("scans")
 def get_scan_history():
+    """One page of the user's scans, newest first, without scan_result.
+
+    Pass the returned next_cursor back as ?cursor= to get the following page.
+    """
     user_id = request.headers.get("X-User-ID")
     if not user_id:
         return jsonify({"error": "user_id is required"}), 400
 
     scan_type = request.args.get("scan_type")  # Get scan_type from query params
+    try:
+        limit = min(max(int(request.args.get("limit", HISTORY_DEFAULT_LIMIT)), 1), HISTORY_MAX_LIMIT)
+        after = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except (ValueError, UnicodeDecodeError):
+        return jsonify({"error": "Invalid limit or cursor"}), 400
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Base query
-        query = """
-            SELECT id, repo_id, scan_result, repo_url, status, score, compliant, created_at, input_type, scan_type
-            FROM scan_history
-            WHERE user_id = %s
-        """
-        params = [user_id]
-
-        # Add scan_type filter if provided
-        if scan_type:
-            query += " AND scan_type = %s"
-            params.append(scan_type)
-
-        query += " ORDER BY created_at DESC"
-
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        history = []
-
-        for row in rows:
-            input_type = row[8]
-            item_name = None
-            if input_type and input_type != "":
-                scan_id = row[0]
-                cursor.execute(
-                    """
-                    SELECT id, scan_id, file_path, content, input_type, created_at
-                    FROM file_contents
-                    WHERE scan_id = %s
-                    """,
-                    (scan_id,)
-                )
-                file_row = cursor.fetchone()
-                if file_row:
-                    item_name = f"{file_row[2]} {file_row[0]}"  # file_path + id
-                    logger.debug(f"Item name for scan_id {scan_id}: {item_name}")
-
-            element = {
-                "id": row[0],
-                "repo_id": row[1],
-                "scan_result": row[2],
-                "repo_url": row[3],
-                "item_name": item_name,
-                "status": row[4],
-                "score": row[5],
-                "compliant": row[6],
-                "created_at": row[7].isoformat(),
-                "input_type": row[8],
-                "scan_type": row[9]
-            }
-            history.append(element)
-
-        return jsonify(history)
+        with db_cursor() as cursor:
+            cursor.execute(*history_page_query(user_id, scan_type, after, limit))
+            rows = cursor.fetchall()
     except Exception as e:
         logger.error(f"Failed to fetch scan history for user_id {user_id}: {str(e)}")
         return jsonify({"error": "Failed to fetch scan history"}), 500
-    finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+
+    next_cursor = encode_cursor(rows[limit - 1][6], rows[limit - 1][0]) if len(rows) > limit else None
+    return jsonify({"items": [_history_item(row) for row in rows[:limit]], "next_cursor": next_cursor})
+
+
+@history_bp.route("/history/<int:scan_id>", methods=["GET"])
+@conditional("scans")
+def get_scan_detail(scan_id):
+    """One scan of the user, with its full scan_result."""
+    user_id = request.headers.get("X-User-ID")
+    if not user_id:
+        return jsonify({"error": "user_id is required"}), 400
+
+    try:
+        with db_cursor() as cursor:
+            cursor.execute(HISTORY_DETAIL_QUERY, (scan_id, user_id))
+            row = cursor.fetchone()
+    except Exception as e:
+        logger.error(f"Failed to fetch scan {scan_id} for user_id {user_id}: {str(e)}")
+        return jsonify({"error": "Failed to fetch scan"}), 500
+
+    if not row:
+        return jsonify({"error": "Scan introuvable"}), 404
+    return jsonify({**_history_item(row), "scan_result": render_result(row[11])})
+
+
+@history_bp.route("/history/<int:scan_id>/files", methods=["GET"])
+@conditional("scans")
+def get_scan_files(scan_id):
+    """The files saved with one scan of the user, decompressed from the blob store."""
+    user_id = request.headers.get("X-User-ID")
+    if not user_id:
+        return jsonify({"error": "user_id is required"}), 400
+
+    try:
+        with db_cursor() as cursor:
+            cursor.execute("SELECT 1 FROM scan_history WHERE id = %s AND user_id = %s", (scan_id, user_id))
+            if not cursor.fetchone():
+                return jsonify({"error": "Scan introuvable"}), 404
+            files = load_file_contents(cursor, scan_id)
+    except Exception as e:
+        logger.error(f"Failed to fetch files of scan {scan_id} for user_id {user_id}: {str(e)}")
+        return jsonify({"error": "Failed to fetch scan files"}), 500
+
+    return jsonify([{"file_path": file_path, "content": content} for file_path, content in files])
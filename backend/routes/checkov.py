@@ -7,13 +7,32 @@ import subprocess
 import shutil
 import stat
 import json
+import copy
 import logging
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 import google.generativeai as genai
 from google.api_core import exceptions
 from psycopg2.extras import Json
 
-from utils.db import get_db_connection
+from utils.db import db_connection, DatabaseUnavailable
+from utils.checkov_pool import checkov_pool
+from utils.suggestion_cache import suggestion_cache, suggestion_key
+from utils.scan_cache import scan_cache, scan_cache_key, content_hash, CHECKOV_RULESET_VERSION
+from utils.jobs import scan_jobs, report_progress
+from utils.scheduler import scan_scheduler, run_scheduled, scheduled_events, discard_path
+from utils.streaming import event_stream_response
+from utils.zip_ingest import ingest_zip, ZipLimitError
+from utils.git_utils import head_commit, changed_files, remote_head
+from utils.commit_cache import reuse_scan
+from utils.repo_cache import repo_cache, clone_repo
+from utils.log_config import log_payload
+from utils.result_codec import expand_result, render_result, stored_result
+from utils.findings import replace_findings
+from utils.http_cache import bump_version
+from utils.scan_store import save_scan
 
 checkov_bp = Blueprint('checkov', __name__)
 
@@ -21,15 +40,6 @@ checkov_bp = Blueprint('checkov', __name__)
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Configure logging to file and console
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s %(levelname)s:%(name)s: %(message)s',
-    handlers=[
-        logging.FileHandler('checkov_app.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 # Configure Gemini API
@@ -39,8 +49,33 @@ if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY environment variable not set.")
 genai.configure(api_key=GEMINI_API_KEY)
 
-# Cache the Checkov path globally
+# Cache the Checkov path and version globally
 _checkov_path = None
+_checkov_version = None
+
+# Files Checkov knows how to scan
+SCANNABLE_EXTENSIONS = ('.tf', '.yaml', '.yml')
+SCANNABLE_FILENAMES = ('Dockerfile',)
+
+# Repository checkout: "full" tree, or "sparse" (only the scannable files' blobs are fetched)
+REPO_CHECKOUT_MODE = os.getenv("REPO_CHECKOUT_MODE", "full")
+SPARSE_CHECKOUT_PATTERNS = [f"*{ext}" for ext in SCANNABLE_EXTENSIONS] + list(SCANNABLE_FILENAMES)
+
+# Number of files scanned concurrently by run_checkov_on_dir (1 = sequential)
+CHECKOV_MAX_WORKERS = int(os.getenv("CHECKOV_MAX_WORKERS", "4"))
+
+# Directory scan strategy: "parallel" (one process per file) or "batch" (one process per framework)
+CHECKOV_SCAN_MODE = os.getenv("CHECKOV_SCAN_MODE", "parallel")
+CHECKOV_BATCH_TIMEOUT = int(os.getenv("CHECKOV_BATCH_TIMEOUT", "600"))
+
+# Failed checks sent to Gemini per prompt, and concurrent Gemini calls across all scans
+GEMINI_BATCH_SIZE = int(os.getenv("GEMINI_BATCH_SIZE", "15"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+_gemini_slots = threading.BoundedSemaphore(GEMINI_MAX_CONCURRENCY)
+
+# Background stage filling in suggestions for scans saved with defer_suggestions
+SUGGESTION_BACKGROUND_WORKERS = int(os.getenv("SUGGESTION_BACKGROUND_WORKERS", "2"))
+_suggestion_executor = ThreadPoolExecutor(max_workers=SUGGESTION_BACKGROUND_WORKERS, thread_name_prefix="suggestions")
 
 def clean_path(full_path):
     """Remove temporary directory prefix from file paths."""
@@ -77,39 +112,175 @@ def get_checkov_path():
     _checkov_path = "checkov"
     return _checkov_path
 
-def get_gemini_suggestion(check, max_retries=3, retry_delay=5):
-    prompt = (
-        f"I have detected an issue in an Infrastructure-as-Code file using Checkov. "
-        f"Here are the details:\n"
-        f"- Check ID: {check['check_id']}\n"
-        f"- Check Name: {check['check_name']}\n"
-        f"- File Path: {check['file_path']}\n"
-        f"- Line Range: {check['file_line_range']}\n"
-        f"- Resource: {check['resource']}\n"
-        f"- Severity: {check['severity'] or 'Unknown'}\n"
-        f"Please provide a concise suggestion for improving this issue. "
-        f"Do not suggest automatic fixes, only recommend manual improvements."
-    )
+def get_checkov_version():
+    """Return the installed Checkov version, used to key cached scan results."""
+    global _checkov_version
+    if _checkov_version:
+        return _checkov_version
 
+    checkov_path = get_checkov_path()
+    try:
+        if checkov_path == "checkov":
+            process = subprocess.run("checkov --version", shell=True, capture_output=True, text=True, timeout=60)
+        else:
+            process = subprocess.run([checkov_path, "--version"], shell=False, capture_output=True, text=True, timeout=60)
+        _checkov_version = process.stdout.strip() or "unknown"
+    except (subprocess.TimeoutExpired, OSError) as e:
+        logger.warning(f"Could not read the Checkov version: {str(e)}")
+        _checkov_version = "unknown"
+    return _checkov_version
+
+def _call_gemini(prompt, label, max_retries=3, retry_delay=5, json_output=False):
+    """Send a prompt to Gemini with retries; return the response text or None."""
+    generation_config = {"response_mime_type": "application/json"} if json_output else None
     for attempt in range(max_retries):
         try:
-            logger.debug(f"Attempt {attempt + 1}/{max_retries} - Sending prompt to Gemini for check {check['check_id']}: {prompt[:100]}...")
+            logger.debug(f"Attempt {attempt + 1}/{max_retries} - Sending prompt to Gemini for {label}: {prompt[:100]}...")
             model = genai.GenerativeModel('gemini-1.5-flash')
-            response = model.generate_content(prompt)
-            suggestion = response.text.strip()
-            logger.debug(f"Gemini suggestion for {check['check_id']}: {suggestion}")
-            return suggestion
+            with _gemini_slots:
+                response = model.generate_content(prompt, generation_config=generation_config)
+            text = response.text.strip()
+            logger.debug(f"Gemini response for {label}: {text[:500]}")
+            return text
         except exceptions.ResourceExhausted:
-            logger.warning(f"Rate limit hit for check {check['check_id']}, attempt {attempt + 1}/{max_retries}. Retrying after {retry_delay}s...")
+            logger.warning(f"Rate limit hit for {label}, attempt {attempt + 1}/{max_retries}. Retrying after {retry_delay}s...")
             time.sleep(retry_delay)
         except Exception as e:
-            logger.error(f"Failed to get Gemini suggestion for check {check['check_id']}, attempt {attempt + 1}/{max_retries}: {str(e)}")
+            logger.error(f"Failed to get Gemini response for {label}, attempt {attempt + 1}/{max_retries}: {str(e)}")
             if attempt < max_retries - 1:
                 time.sleep(retry_delay)
             continue
-    logger.error(f"All {max_retries} attempts failed for check {check['check_id']}.")
+    logger.error(f"All {max_retries} attempts failed for {label}.")
+    return None
+
+def request_gemini_suggestion(key, check, max_retries=3, retry_delay=5):
+    """Ask Gemini for a suggestion; return None if every attempt fails.
+
+    Suggestions are cached for every user under key (check id, resource type,
+    framework), so the prompt carries only those fields and no file path,
+    line range or resource name of the scanned code.
+    """
+    _, resource_type, framework = key
+    prompt = (
+        f"I have detected an issue in an Infrastructure-as-Code file using Checkov. "
+        f"Here are the details:\n"
+        f"- Check ID: {check['check_id']}\n"
+        f"- Check Name: {check['check_name']}\n"
+        f"- Resource Type: {resource_type}\n"
+        f"- Framework: {framework}\n"
+        f"- Severity: {check['severity'] or 'Unknown'}\n"
+        f"Please provide a concise, generic suggestion for improving this issue on this resource type. "
+        f"Do not suggest automatic fixes, only recommend manual improvements."
+    )
+    return _call_gemini(prompt, f"check {check['check_id']}", max_retries, retry_delay)
+
+def request_gemini_suggestions_batch(batch, max_retries=3, retry_delay=5):
+    """Ask Gemini for suggestions on several checks in one prompt.
+
+    batch is a list of (id, key, check) triples; returns a dict of
+    id -> suggestion holding the ids Gemini answered, or None when the call
+    itself failed. As for single checks, only the cache key fields are sent,
+    never the scanned file's details.
+    """
+    details = "\n".join(
+        f"- id: {item_id} | Check ID: {key[0]} | Check Name: {check['check_name']} | "
+        f"Resource Type: {key[1]} | Framework: {key[2]} | Severity: {check['severity'] or 'Unknown'}"
+        for item_id, key, check in batch
+    )
+    prompt = (
+        f"I have detected the following issues in Infrastructure-as-Code files using Checkov:\n"
+        f"{details}\n"
+        f"For each issue, provide a concise, generic suggestion for improving it on that resource type. "
+        f"Do not suggest automatic fixes, only recommend manual improvements. "
+        f"Answer with a JSON object mapping each id to its suggestion string."
+    )
+    text = _call_gemini(prompt, f"batch of {len(batch)} checks", max_retries, retry_delay, json_output=True)
+    if text is None:
+        return None
+    try:
+        parsed = json.loads(text.removeprefix("```json").removeprefix("```").removesuffix("```"))
+    except json.JSONDecodeError:
+        logger.error(f"Could not parse Gemini batch response: {text[:500]}")
+        return {}
+    if isinstance(parsed, list):
+        parsed = {str(entry.get("id")): entry.get("suggestion") for entry in parsed if isinstance(entry, dict)}
+    if not isinstance(parsed, dict):
+        return {}
+    return {
+        item_id: parsed[item_id].strip()
+        for item_id, _, _ in batch
+        if isinstance(parsed.get(item_id), str) and parsed[item_id].strip()
+    }
+
+def fallback_suggestion(check):
     return f"Review the {check['check_name']} issue in {check['file_path']} (lines {check['file_line_range'][0]}-{check['file_line_range'][1]}) and apply best practices to address it."
 
+def _suggest_batch(batch):
+    """Resolve one batch of (key, check) pairs.
+
+    Checks missing from a successful reply are retried one by one. When the
+    batch call itself failed, Gemini is not asked again: the checks keep no
+    suggestion and get the fallback one.
+    """
+    ids = {":".join(key): (key, check) for key, check in batch}
+    answers = request_gemini_suggestions_batch([(item_id, key, check) for item_id, (key, check) in ids.items()])
+    if answers is None:
+        logger.warning(f"Gemini batch of {len(ids)} checks failed, using fallback suggestions")
+        return {key: None for key, _ in ids.values()}
+    suggestions = {}
+    for item_id, (key, check) in ids.items():
+        suggestion = answers.get(item_id)
+        if suggestion is None:
+            logger.debug(f"No batched suggestion for {item_id}, asking for it on its own")
+            suggestion = request_gemini_suggestion(key, check)
+        if suggestion is not None:
+            suggestion_cache.set(key, suggestion)
+        suggestions[key] = suggestion
+    return suggestions
+
+def enrich_suggestions(failed_checks):
+    """Fill the suggestion of every failed check in place.
+
+    Checks sharing a cache key are resolved once; cache misses are sent to
+    Gemini GEMINI_BATCH_SIZE at a time, with batches running concurrently.
+    """
+    by_key = {}
+    for check in failed_checks:
+        key = suggestion_key(check, framework_from_name(check.get("file_path") or ""))
+        by_key.setdefault(key, []).append(check)
+
+    resolved = {}
+    misses = []
+    for key, checks in by_key.items():
+        suggestion = suggestion_cache.get(key)
+        if suggestion is not None:
+            resolved[key] = suggestion
+        else:
+            misses.append((key, checks[0]))
+
+    batches = [misses[i:i + GEMINI_BATCH_SIZE] for i in range(0, len(misses), GEMINI_BATCH_SIZE)]
+    if len(batches) == 1:
+        resolved.update(_suggest_batch(batches[0]))
+    elif batches:
+        with ThreadPoolExecutor(max_workers=min(GEMINI_MAX_CONCURRENCY, len(batches))) as executor:
+            for suggestions in executor.map(_suggest_batch, batches):
+                resolved.update(suggestions)
+
+    for key, checks in by_key.items():
+        for check in checks:
+            check["suggestion"] = resolved.get(key) or fallback_suggestion(check)
+    return failed_checks
+
+def framework_from_name(file_path):
+    """Guess the Checkov framework from a file name alone."""
+    if file_path.endswith(('.yaml', '.yml')):
+        return 'kubernetes'
+    if file_path.endswith('.tf'):
+        return 'terraform'
+    if os.path.basename(file_path) == 'Dockerfile':
+        return 'dockerfile'
+    return None
+
 def detect_framework(file_path):
     if file_path.endswith(('.yaml', '.yml')):
         try:
@@ -126,7 +297,98 @@ def detect_framework(file_path):
         return 'dockerfile'
     return None
 
-def run_checkov_on_single_file(file_path):
+def is_scannable_file(file_name):
+    """Return True if Checkov should scan a file with this name."""
+    return file_name.endswith(SCANNABLE_EXTENSIONS) or file_name in SCANNABLE_FILENAMES
+
+def find_scannable_files(path):
+    """Walk a directory and return the scannable files in a stable order."""
+    files_found = []
+    for root, dirs, files in os.walk(path):
+        for file in files:
+            if is_scannable_file(file):
+                files_found.append(os.path.join(root, file))
+    files_found.sort()
+    return files_found
+
+def split_checkov_output(output):
+    """Return the (failed, passed) raw check lists from Checkov JSON output."""
+    if isinstance(output, dict):
+        results = output.get("results", {})
+        return results.get("failed_checks", []), results.get("passed_checks", [])
+    if isinstance(output, list):
+        # Several frameworks: one report per check type, or a flat list of records
+        if all(isinstance(r, dict) and "results" in r for r in output):
+            failed, passed = [], []
+            for report in output:
+                report_failed, report_passed = split_checkov_output(report)
+                failed.extend(report_failed)
+                passed.extend(report_passed)
+            return failed, passed
+        failed = [r for r in output if r.get("check_result", {}).get("result") == "FAILED"]
+        passed = [r for r in output if r.get("check_result", {}).get("result") == "PASSED"]
+        return failed, passed
+    return [], []
+
+def build_file_result(file_path, failed, passed):
+    """Build the per-file result dict from raw Checkov failed/passed checks.
+
+    Suggestions are left empty; enrich_suggestions fills them in.
+    """
+    filtered_failed = []
+    for item in failed:
+        issue = {
+            "check_id": item.get("check_id"),
+            "check_name": item.get("check_name"),
+            "file_path": clean_path(file_path),
+            "guideline": item.get("guideline"),
+            "file_line_range": item.get("file_line_range"),
+            "resource": item.get("resource"),
+            "severity": item.get("severity"),
+            "suggestion": None
+        }
+        filtered_failed.append(issue)
+
+    filtered_passed = [
+        {
+            "check_id": item.get("check_id"),
+            "check_name": item.get("check_name"),
+            "file_path": clean_path(file_path),
+            "file_line_range": item.get("file_line_range"),
+            "resource": item.get("resource")
+        }
+        for item in passed
+    ]
+
+    total_passed = len(filtered_passed)
+    total_failed = len(filtered_failed)
+    total_checks = total_passed + total_failed
+    score = round((total_passed / total_checks) * 100) if total_checks > 0 else 0
+
+    return {
+        "results": {
+            "status": "success",
+            "path_scanned": clean_path(file_path),
+            "files_found": [clean_path(file_path)],
+            "passed_checks": filtered_passed,
+            "failed_checks": filtered_failed,
+            "summary": {"passed": total_passed, "failed": total_failed},
+            "score": score,
+            "compliant": score == 100
+        }
+    }
+
+def run_checkov_on_single_file(file_path, enrich=True):
+    result = scan_single_file(file_path)
+    if enrich:
+        enrich_suggestions(result["results"]["failed_checks"])
+    return result
+
+def scan_single_file(file_path, file_hash=None):
+    """Run Checkov on one file without generating suggestions.
+
+    file_hash is the SHA-256 of the file when the caller already has it.
+    """
     if not os.path.exists(file_path):
         return {
             "results": {
@@ -150,6 +412,25 @@ def run_checkov_on_single_file(file_path):
             }
         }
 
+    cache_key = scan_cache_key(file_hash or content_hash(file_path), framework, get_checkov_version())
+    cached = scan_cache.get(cache_key)
+    if cached is not None:
+        logger.debug(f"Scan cache hit for {file_path}")
+        return build_file_result(file_path, cached["failed_checks"], cached["passed_checks"])
+
+    result = _run_checkov_on_file(file_path, framework)
+    if result["results"]["status"] == "success":
+        scan_cache.set(cache_key, result["results"]["failed_checks"], result["results"]["passed_checks"])
+    return result
+
+def _run_checkov_on_file(file_path, framework):
+    """Run Checkov on one file, on a warm worker if possible, else through the CLI."""
+    if checkov_pool.enabled():
+        output = checkov_pool.scan(file_path, framework)
+        if output is not None:
+            failed, passed = split_checkov_output(output)
+            return build_file_result(file_path, failed, passed)
+
     checkov_path = get_checkov_path()
     cmd = [
         checkov_path,
@@ -179,69 +460,11 @@ def run_checkov_on_single_file(file_path):
 
         try:
             output = json.loads(process.stdout)
-            logger.debug(f"Checkov output for {file_path}: {json.dumps(output, indent=2)[:500]}...")
-
-            if isinstance(output, dict):
-                results = output.get("results", {})
-                failed = results.get("failed_checks", [])
-                passed = results.get("passed_checks", [])
-            elif isinstance(output, list):
-                failed = [r for r in output if r.get("check_result", {}).get("result") == "FAILED"]
-                passed = [r for r in output if r.get("check_result", {}).get("result") == "PASSED"]
-            else:
-                failed, passed = [], []
-
-            filtered_failed = []
-            for item in failed:
-                issue = {
-                    "check_id": item.get("check_id"),
-                    "check_name": item.get("check_name"),
-                    "file_path": clean_path(file_path),
-                    "guideline": item.get("guideline"),
-                    "file_line_range": item.get("file_line_range"),
-                    "resource": item.get("resource"),
-                    "severity": item.get("severity"),
-                    "suggestion": get_gemini_suggestion({
-                        "check_id": item.get("check_id"),
-                        "check_name": item.get("check_name"),
-                        "file_path": clean_path(file_path),
-                        "file_line_range": item.get("file_line_range"),
-                        "resource": item.get("resource"),
-                        "severity": item.get("severity")
-                    })
-                }
-                filtered_failed.append(issue)
-                time.sleep(1)
-
-            filtered_passed = [
-                {
-                    "check_id": item.get("check_id"),
-                    "check_name": item.get("check_name"),
-                    "file_path": clean_path(file_path),
-                    "file_line_range": item.get("file_line_range"),
-                    "resource": item.get("resource")
-                }
-                for item in passed
-            ]
-
-            total_passed = len(filtered_passed)
-            total_failed = len(filtered_failed)
-            total_checks = total_passed + total_failed
-            score = round((total_passed / total_checks) * 100) if total_checks > 0 else 0
+            log_payload(logger, f"Checkov output for {file_path}", output)
 
-            result = {
-                "results": {
-                    "status": "success",
-                    "path_scanned": clean_path(file_path),
-                    "files_found": [clean_path(file_path)],
-                    "passed_checks": filtered_passed,
-                    "failed_checks": filtered_failed,
-                    "summary": {"passed": total_passed, "failed": total_failed},
-                    "score": score,
-                    "compliant": score == 100
-                }
-            }
-            logger.debug(f"Single file result for {file_path}: {json.dumps(result, indent=2)[:500]}...")
+            failed, passed = split_checkov_output(output)
+            result = build_file_result(file_path, failed, passed)
+            log_payload(logger, f"Single file result for {file_path}", result)
             return result
 
         except json.JSONDecodeError as e:
@@ -279,9 +502,152 @@ def run_checkov_on_single_file(file_path):
             }
         }
 
-def run_checkov_on_dir(path, is_file=False):
+def _resolve_check_file(item, root):
+    """Return the real absolute path of the file a Checkov record belongs to."""
+    abs_path = item.get("file_abs_path")
+    if not abs_path:
+        abs_path = os.path.join(root, (item.get("file_path") or "").lstrip("/\\"))
+    return os.path.realpath(abs_path)
+
+def run_checkov_batched(path, files_found, file_hashes=None):
+    """Scan a directory with one Checkov run per framework and split the report per file.
+
+    Returns one result per entry of files_found, in the same order and with the
+    same shape as scan_single_file. Files found in the scan cache are not
+    rescanned, and frameworks whose batched run fails fall back to per-file scans.
+    file_hashes maps file paths to their SHA-256 when the caller already has it.
+    """
+    file_hashes = file_hashes or {}
+    checkov_version = get_checkov_version()
+    file_results = {}
+    cache_keys = {}
+    by_framework = {}
+    for file_path in files_found:
+        framework = detect_framework(file_path)
+        cache_keys[file_path] = scan_cache_key(file_hashes.get(file_path) or content_hash(file_path), framework, checkov_version)
+        cached = scan_cache.get(cache_keys[file_path])
+        if cached is not None:
+            file_results[file_path] = build_file_result(file_path, cached["failed_checks"], cached["passed_checks"])
+        else:
+            by_framework.setdefault(framework, []).append(file_path)
+
+    raw_checks = {os.path.realpath(f): ([], []) for f in files_found}
+    checkov_path = get_checkov_path()
+
+    # -d scans the whole tree, so it is only used when every file of the framework there needs scanning
+    tree_files = {}
+    for file_path in find_scannable_files(path) if by_framework else []:
+        tree_files.setdefault(detect_framework(file_path), set()).add(os.path.realpath(file_path))
+
+    for framework, framework_files in by_framework.items():
+        if {os.path.realpath(f) for f in framework_files} == tree_files.get(framework):
+            targets = ["-d", path]
+        else:
+            targets = [arg for file_path in framework_files for arg in ("-f", file_path)]
+        cmd = [
+            checkov_path,
+            *targets,
+            "--framework", framework,
+            "-o", "json",
+            "--quiet"
+        ]
+        try:
+            logger.debug(f"Executing batched Checkov command: {' '.join(cmd)}")
+            if checkov_path == "checkov":
+                process = subprocess.run(' '.join(cmd), shell=True, capture_output=True, text=True, timeout=CHECKOV_BATCH_TIMEOUT)
+            else:
+                process = subprocess.run(cmd, shell=False, capture_output=True, text=True, timeout=CHECKOV_BATCH_TIMEOUT)
+            # An empty or non-JSON report is a failed run, not a clean scan: it must not be cached
+            if not process.stdout.strip():
+                raise ValueError(f"no output (exit code {process.returncode})")
+            output = json.loads(process.stdout)
+            if not isinstance(output, (dict, list)):
+                raise ValueError(f"unexpected output (exit code {process.returncode}): {process.stdout[:200]}")
+        except subprocess.TimeoutExpired:
+            logger.error(f"Batched Checkov run timed out after {CHECKOV_BATCH_TIMEOUT} seconds for framework {framework}, scanning files one by one")
+            for file_path in framework_files:
+                file_results[file_path] = scan_single_file(file_path, file_hashes.get(file_path))
+            continue
+        except (ValueError, OSError) as e:
+            logger.error(f"Batched Checkov run failed for framework {framework}: {str(e)}, scanning files one by one")
+            for file_path in framework_files:
+                file_results[file_path] = scan_single_file(file_path, file_hashes.get(file_path))
+            continue
+
+        failed, passed = split_checkov_output(output)
+        for index, items in ((0, failed), (1, passed)):
+            for item in items:
+                checks = raw_checks.get(_resolve_check_file(item, path))
+                if checks is None:
+                    logger.debug(f"Ignoring Checkov record for unscanned file {item.get('file_path')}")
+                    continue
+                checks[index].append(item)
+
+    for file_path in files_found:
+        if file_path not in file_results:
+            failed, passed = raw_checks[os.path.realpath(file_path)]
+            file_results[file_path] = build_file_result(file_path, failed, passed)
+            scan_cache.set(
+                cache_keys[file_path],
+                file_results[file_path]["results"]["failed_checks"],
+                file_results[file_path]["results"]["passed_checks"]
+            )
+    return [file_results[file_path] for file_path in files_found]
+
+def iter_checkov_file_results(path, files_found, mode, workers, file_hashes=None):
+    """Yield (file_path, result) for each scanned file as soon as it is done."""
+    file_hashes = file_hashes or {}
+    if mode == "batch":
+        yield from zip(files_found, run_checkov_batched(path, files_found, file_hashes))
+    elif workers == 1:
+        for file_path in files_found:
+            yield file_path, scan_single_file(file_path, file_hashes.get(file_path))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(scan_single_file, file_path, file_hashes.get(file_path)): file_path
+                for file_path in files_found
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+def merge_file_results(path, files_found, file_results):
+    """Merge per-file results, in files_found order, into one directory result."""
+    results = {
+        "status": "completed",
+        "path_scanned": clean_path(path),
+        "files_found": [clean_path(f) for f in files_found],
+        "passed_checks": [],
+        "failed_checks": [],
+        "summary": {"passed": 0, "failed": 0}
+    }
+
+    total_passed = 0
+    total_failed = 0
+
+    for file_path in files_found:
+        file_results_entry = file_results[file_path].get("results", {})
+        log_payload(logger, f"Processing file {file_path}", file_results_entry)
+        total_passed += len(file_results_entry.get("passed_checks", []))
+        total_failed += len(file_results_entry.get("failed_checks", []))
+        results["failed_checks"].extend(file_results_entry.get("failed_checks", []))
+        results["passed_checks"].extend(file_results_entry.get("passed_checks", []))
+
+    results["summary"]["passed"] = total_passed
+    results["summary"]["failed"] = total_failed
+    total_checks = total_passed + total_failed
+    results["score"] = round((total_passed / total_checks) * 100) if total_checks > 0 else 0
+    results["compliant"] = results["score"] == 100
+    return results
+
+def run_checkov_on_dir(path, is_file=False, max_workers=None, mode=None, enrich=True, progress=None, files=None,
+                       file_hashes=None):
+    """Scan a directory, or only the given files inside it when files is set.
+
+    file_hashes maps file paths to their SHA-256 when the caller already has it.
+    """
     if is_file:
-        return run_checkov_on_single_file(path)
+        return run_checkov_on_single_file(path, enrich=enrich)
 
     if not os.path.exists(path):
         return {
@@ -294,12 +660,7 @@ def run_checkov_on_dir(path, is_file=False):
             }
         }
 
-    files_found = []
-    for root, dirs, files in os.walk(path):
-        for file in files:
-            file_path = os.path.join(root, file)
-            if file.endswith(('.tf', '.yaml', '.yml')) or file == 'Dockerfile':
-                files_found.append(file_path)
+    files_found = sorted(files) if files is not None else find_scannable_files(path)
 
     if not files_found:
         return {
@@ -312,127 +673,472 @@ def run_checkov_on_dir(path, is_file=False):
             }
         }
 
-    results = {
-        "status": "completed",
-        "path_scanned": clean_path(path),
-        "files_found": [clean_path(f) for f in files_found],
-        "passed_checks": [],
-        "failed_checks": [],
-        "summary": {"passed": 0, "failed": 0}
-    }
-
-    total_passed = 0
-    total_failed = 0
+    mode = mode or CHECKOV_SCAN_MODE
+    workers = max(1, min(max_workers or CHECKOV_MAX_WORKERS, len(files_found)))
+    started = time.monotonic()
+    total_files = len(files_found)
+    report_progress(progress, "scanning", 0, total_files)
+    file_results = {}
+    for file_path, file_result in iter_checkov_file_results(path, files_found, mode, workers, file_hashes):
+        file_results[file_path] = file_result
+        report_progress(progress, "scanning", len(file_results), total_files)
+
+    results = merge_file_results(path, files_found, file_results)
+    results["scan_mode"] = mode
+    results["workers"] = workers
+    results["scan_time_seconds"] = round(time.monotonic() - started, 3)
+
+    if enrich:
+        report_progress(progress, "enriching")
+        enrich_suggestions(results["failed_checks"])
+
+    log_payload(logger, "Final directory scan result", results)
+    return {"results": results}
 
-    for file_path in files_found:
-        file_result = run_checkov_on_single_file(file_path)
-        file_results = file_result.get("results", {})
-        logger.debug(f"Processing file {file_path}: {json.dumps(file_results, indent=2)[:500]}...")
-        total_passed += len(file_results.get("passed_checks", []))
-        total_failed += len(file_results.get("failed_checks", []))
-        results["failed_checks"].extend(file_results.get("failed_checks", []))
-        results["passed_checks"].extend(file_results.get("passed_checks", []))
+def checkov_scanner_version():
+    """Version string stored with each scan; results are only reused for the same one."""
+    return f"checkov {get_checkov_version()} ({CHECKOV_RULESET_VERSION})"
 
-    results["summary"]["passed"] = total_passed
-    results["summary"]["failed"] = total_failed
-    total_checks = total_passed + total_failed
-    results["score"] = round((total_passed / total_checks) * 100) if total_checks > 0 else 0
-    results["compliant"] = results["score"] == 100
+def save_scan_history(user_id, result, input_type, repo_url=None, files_to_save=None, commit_sha=None):
+    """Save the scan result and associated file contents to the database."""
+    try:
+        # Normalize paths in files_found
+        if result.get("results", {}).get("files_found"):
+            result["results"]["files_found"] = [f.replace("\\", "/") for f in result["results"]["files_found"]]
+        # Set path_scanned if missing
+        if not result.get("results", {}).get("path_scanned"):
+            result["results"]["path_scanned"] = clean_path(tempfile.gettempdir())
 
-    logger.debug(f"Final directory scan result: {json.dumps(results, indent=2)[:1000]}...")
-    return {"results": results}
+        scan_id = save_scan(
+            user_id, "checkov", result, input_type,
+            status=result.get("results", {}).get("status", "unknown"),
+            score=result.get("results", {}).get("score"),
+            compliant=result.get("results", {}).get("compliant"),
+            repo_url=repo_url,
+            files=files_to_save,
+            commit_sha=commit_sha,
+            scanner_version=checkov_scanner_version(),
+            link_repository=True
+        )
+        logger.info(f"Scan history saved for user_id {user_id} with scan_id {scan_id}")
+        return scan_id
+    except Exception as e:
+        logger.error(f"Failed to save scan history: {str(e)}")
+        raise
 
-def save_file_contents(scan_id, files, input_type):
-    """Save the content of files to the file_contents table."""
+def get_request_option(name):
+    """Read an option from the form fields or, for JSON requests, the body."""
+    value = request.form.get(name)
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get(name)
+    return value
+
+def get_request_flag(name):
+    return str(get_request_option(name)).lower() in ("1", "true", "yes")
+
+def get_checkout_mode():
+    checkout_mode = get_request_option("checkout")
+    return checkout_mode if checkout_mode in ("full", "sparse") else None
+
+def get_scan_mode():
+    """Return the directory scan mode requested by the client, if valid."""
+    scan_mode = get_request_option("scan_mode")
+    return scan_mode if scan_mode in ("parallel", "batch") else None
+
+def save_checkov_scan(user_id, result, input_type, defer=False, repo_url=None, files_to_save=None, commit_sha=None):
+    """Save a scan and, in deferred mode, queue its suggestions for the background stage."""
+    failed_checks = result.get("results", {}).get("failed_checks", [])
+    if not defer:
+        # Findings carried forward from a deferred scan may still be waiting for their suggestion
+        unresolved = [check for check in failed_checks if not check.get("suggestion")]
+        if unresolved:
+            enrich_suggestions(unresolved)
+    for index, check in enumerate(failed_checks):
+        check["finding_id"] = index
+        # Findings carried forward from an earlier scan already have their suggestion
+        check["suggestion_status"] = "pending" if defer and not check.get("suggestion") else "ready"
+
+    scan_id = save_scan_history(
+        user_id, result, input_type, repo_url=repo_url, files_to_save=files_to_save, commit_sha=commit_sha
+    )
+    if defer:
+        result["scan_id"] = scan_id
+        if any(check["suggestion_status"] == "pending" for check in failed_checks):
+            _suggestion_executor.submit(complete_deferred_suggestions, scan_id, copy.deepcopy(result))
+    return scan_id
+
+def complete_deferred_suggestions(scan_id, result):
+    """Background stage: generate pending suggestions and store them in scan_history."""
+    failed_checks = result["results"]["failed_checks"]
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        for file_path, content in files:
-            cursor.execute(
-                """
-                INSERT INTO file_contents (scan_id, file_path, content, input_type)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (scan_id, file_path, content, input_type)
-            )
+        enrich_suggestions([check for check in failed_checks if check["suggestion_status"] == "pending"])
+        status = "ready"
+    except Exception as e:
+        logger.error(f"Deferred suggestion generation failed for scan_id {scan_id}: {str(e)}")
+        for check in failed_checks:
+            check["suggestion"] = check.get("suggestion") or fallback_suggestion(check)
+        status = "failed"
+    for check in failed_checks:
+        if check["suggestion_status"] == "pending":
+            check["suggestion_status"] = status
 
-        conn.commit()
-        logger.info(f"Saved {len(files)} file contents for scan_id {scan_id}")
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE scan_history SET scan_result = %s WHERE id = %s RETURNING user_id",
+                    (Json(stored_result(result)), scan_id)
+                )
+                row = cursor.fetchone()
+                if row:
+                    replace_findings(cursor, scan_id, row[0], "checkov", result)
+                    bump_version(cursor, row[0], "scans")
+            conn.commit()
+            logger.info(f"Stored {len(failed_checks)} deferred suggestions for scan_id {scan_id}")
+    except DatabaseUnavailable:
+        logger.error(f"Could not store deferred suggestions for scan_id {scan_id}: no database connection")
+        return
     except Exception as e:
-        logger.error(f"Failed to save file contents for scan_id {scan_id}: {str(e)}")
-        conn.rollback()
+        logger.error(f"Failed to store deferred suggestions for scan_id {scan_id}: {str(e)}")
+
+def _scan_content(user_id, temp_dir, temp_file_path, content, defer=False, progress=None):
+    """Scan pasted content already written to temp_file_path; returns (payload, status)."""
+    try:
+        report_progress(progress, "scanning", 0, 1)
+        result = run_checkov_on_single_file(temp_file_path, enrich=False)
+        if not defer:
+            report_progress(progress, "enriching")
+            enrich_suggestions(result["results"]["failed_checks"])
+
+        # Save the content of the single file
+        report_progress(progress, "saving")
+        files_to_save = [(clean_path(temp_file_path), content)]
+        save_checkov_scan(user_id, result, "content", defer=defer, files_to_save=files_to_save)
+
+        log_payload(logger, "Returning result for content input", result)
+        return result, 200
     finally:
-        cursor.close()
-        conn.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
-def save_scan_history(user_id, result, input_type, repo_url=None, files_to_save=None):
-    """Save the scan result and associated file contents to the database."""
+def _scan_uploaded_file(user_id, file_path, defer=False, progress=None):
+    """Scan an uploaded single file; returns (payload, status)."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        repo_id = None
-
-        if repo_url:
-            repo_name = repo_url.split("/")[-2] + "/" + repo_url.split("/")[-1]
-            cursor.execute(
-                "SELECT id FROM selected_repos WHERE full_name = %s",
-                (repo_name,)
-            )
-            row = cursor.fetchone()
-            if row:
-                repo_id = row[0]
-            else:
+        # Read the file content before running Checkov
+        with open(file_path, "r", encoding="utf-8") as f:
+            file_content = f.read()
+
+        report_progress(progress, "scanning", 0, 1)
+        result = run_checkov_on_dir(file_path, is_file=True, enrich=False)
+        if not defer:
+            report_progress(progress, "enriching")
+            enrich_suggestions(result["results"]["failed_checks"])
+
+        # Save the content of the single file
+        report_progress(progress, "saving")
+        files_to_save = [(clean_path(file_path), file_content)]
+        save_checkov_scan(user_id, result, "file", defer=defer, files_to_save=files_to_save)
+
+        log_payload(logger, "Returning result for file input", result)
+        return result, 200
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+def _no_scannable_files(message):
+    return {
+        "results": {
+            "status": "error",
+            "message": message,
+            "passed_checks": [],
+            "failed_checks": [],
+            "summary": {"passed": 0, "failed": 0}
+        }
+    }
+
+def _zip_files(manifest):
+    """Return (files_to_save, file_hashes) of an ingested ZIP.
+
+    Files are saved under the same clean_path() as their findings, with the
+    SHA-256 computed during extraction so neither the scan cache nor the
+    blob store reads them again.
+    """
+    files_to_save = [(clean_path(entry["abs_path"]), entry["content"], entry["sha256"]) for entry in manifest]
+    file_hashes = {entry["abs_path"]: entry["sha256"] for entry in manifest}
+    return files_to_save, file_hashes
+
+def _ingest_zip(temp_dir, zip_path):
+    """Extract only the scannable members of an uploaded ZIP and return their manifest."""
+    return ingest_zip(zip_path, is_scannable_file, dest_dir=temp_dir)
+
+def _clone_repo(repo_url, temp_dir, checkout_mode=None):
+    """Check out a repository into temp_dir; returns (commit SHA, checkout info)."""
+    logger.debug(f"Cloning repository {repo_url} to {temp_dir}")
+    sparse = (checkout_mode or REPO_CHECKOUT_MODE) == "sparse"
+    checkout = clone_repo(repo_url, temp_dir, sparse_patterns=SPARSE_CHECKOUT_PATTERNS if sparse else None)
+    return head_commit(temp_dir), checkout
+
+def _strip_git_dir(temp_dir):
+    git_dir = os.path.join(temp_dir, ".git")
+    if os.path.exists(git_dir):
+        def remove_readonly(func, path, _):
+            os.chmod(path, stat.S_IWRITE)
+            func(path)
+        shutil.rmtree(git_dir, onerror=remove_readonly)
+
+def _has_scannable_files(temp_dir):
+    return any(is_scannable_file(f) for _, _, files in os.walk(temp_dir) for f in files)
+
+def _previous_repo_scan(user_id, repo_url):
+    """Return the latest completed Checkov scan of repo_url that recorded a commit, or None."""
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
                 cursor.execute(
-                    "INSERT INTO selected_repos (user_id, full_name, html_url) VALUES (%s, %s, %s) RETURNING id",
-                    (user_id, repo_name, repo_url)
+                    """
+                    SELECT id, commit_sha, scan_result
+                    FROM scan_history
+                    WHERE user_id = %s AND repo_url = %s AND scan_type = 'checkov'
+                      AND commit_sha IS NOT NULL AND status = 'completed'
+                    ORDER BY created_at DESC
+                    LIMIT 1
+                    """,
+                    (user_id, repo_url)
                 )
-                repo_id = cursor.fetchone()[0]
+                row = cursor.fetchone()
+            return {"id": row[0], "commit_sha": row[1], "scan_result": expand_result(row[2])} if row else None
+    except DatabaseUnavailable:
+        return None
+    except Exception as e:
+        logger.warning(f"Could not look up the previous scan of {repo_url}: {str(e)}")
+        return None
+
+def _rescan_changed_files(temp_dir, previous, diff, scan_mode=None, defer=False, progress=None):
+    """Scan only the files changed since the previous scan and carry the other findings forward."""
+    changed, deleted = diff
+    touched = set(changed) | set(deleted)
+    files_found = find_scannable_files(temp_dir)
+    to_scan = [f for f in files_found if os.path.relpath(f, temp_dir).replace(os.sep, "/") in touched]
+
+    # Stored paths are prefixed with the previous scan's temp directory; re-root them on this one
+    previous_results = previous["scan_result"].get("results", {})
+    old_prefix = previous_results.get("path_scanned", "") + "/"
+    new_prefix = clean_path(temp_dir) + "/"
+
+    def carried_forward(checks):
+        kept = []
+        for check in checks:
+            path = check.get("file_path") or ""
+            relative = path[len(old_prefix):] if path.startswith(old_prefix) else path
+            if relative not in touched:
+                kept.append({**check, "file_path": new_prefix + relative})
+        return kept
+
+    failed_checks = carried_forward(previous_results.get("failed_checks", []))
+    passed_checks = carried_forward(previous_results.get("passed_checks", []))
+
+    started = time.monotonic()
+    if to_scan:
+        scanned = run_checkov_on_dir(temp_dir, is_file=False, mode=scan_mode, enrich=not defer, progress=progress, files=to_scan)
+        failed_checks.extend(scanned["results"].get("failed_checks", []))
+        passed_checks.extend(scanned["results"].get("passed_checks", []))
+
+    total_passed = len(passed_checks)
+    total_failed = len(failed_checks)
+    total_checks = total_passed + total_failed
+    score = round((total_passed / total_checks) * 100) if total_checks > 0 else 0
+    return {
+        "results": {
+            "status": "completed",
+            "path_scanned": clean_path(temp_dir),
+            "files_found": [clean_path(f) for f in files_found],
+            "passed_checks": passed_checks,
+            "failed_checks": failed_checks,
+            "summary": {"passed": total_passed, "failed": total_failed},
+            "score": score,
+            "compliant": score == 100,
+            "scan_time_seconds": round(time.monotonic() - started, 3),
+            "incremental": {
+                "base_scan_id": previous["id"],
+                "base_commit": previous["commit_sha"],
+                "files_rescanned": [clean_path(f) for f in to_scan],
+                "files_deleted": deleted,
+            }
+        }
+    }
 
-        # Normalize paths in files_found
-        if result.get("results", {}).get("files_found"):
-            result["results"]["files_found"] = [f.replace("\\", "/") for f in result["results"]["files_found"]]
-        # Set path_scanned if missing
-        if not result.get("results", {}).get("path_scanned"):
-            result["results"]["path_scanned"] = clean_path(tempfile.gettempdir())
+ZIP_ERRORS = {
+    "empty": "Aucun fichier scannable trouvé dans l’archive",
+    "invalid": "Le fichier ZIP est invalide",
+    "decode": "Erreur de décodage du fichier dans l’archive",
+    "limits": "L’archive dépasse les limites autorisées",
+}
 
-        # Insert scan history
-        cursor.execute(
-            """
-            INSERT INTO scan_history (user_id, repo_id, scan_result, repo_url, status, score, compliant, input_type,scan_type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-            """,
-            (
-                user_id,
-                repo_id,
-                Json(result),
-                repo_url,
-                result.get("results", {}).get("status", "unknown"),
-                result.get("results", {}).get("score"),
-                result.get("results", {}).get("compliant"),
-                input_type,
-                "checkov"
-            )
+def _scan_zip(user_id, temp_dir, zip_path, scan_mode=None, defer=False, progress=None):
+    """Extract and scan an uploaded ZIP saved in temp_dir; returns (payload, status)."""
+    try:
+        report_progress(progress, "extracting")
+        manifest = _ingest_zip(temp_dir, zip_path)
+        if not manifest:
+            return _no_scannable_files(ZIP_ERRORS["empty"]), 400
+        if any(entry["content"] is None for entry in manifest):
+            return _no_scannable_files(ZIP_ERRORS["decode"]), 400
+        files_to_save, file_hashes = _zip_files(manifest)
+
+        result = run_checkov_on_dir(
+            temp_dir, is_file=False, mode=scan_mode, enrich=not defer, progress=progress,
+            files=[entry["abs_path"] for entry in manifest], file_hashes=file_hashes
         )
+        report_progress(progress, "saving")
+        save_checkov_scan(user_id, result, "zip", defer=defer, files_to_save=files_to_save)
+
+        log_payload(logger, "Returning result for zip input", result)
+        return result, 200
+    except zipfile.BadZipFile:
+        return _no_scannable_files(ZIP_ERRORS["invalid"]), 400
+    except ZipLimitError as e:
+        logger.warning(f"Rejected ZIP upload: {str(e)}")
+        return _no_scannable_files(ZIP_ERRORS["limits"]), 400
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def _reuse_repo_scan(user_id, repo_url):
+    """Return the stored result for the remote HEAD if this user already scanned it, else None."""
+    commit_sha = remote_head(repo_url)
+    if not commit_sha:
+        return None
+    reused = reuse_scan(user_id, repo_url, commit_sha, "checkov", checkov_scanner_version())
+    if not reused:
+        return None
+    scan_id, result = reused
+    result["scan_id"] = scan_id
+    if any(check.get("suggestion_status") == "pending" for check in result["results"].get("failed_checks", [])):
+        # The deferred stage of the original scan only updates the original row
+        _suggestion_executor.submit(complete_deferred_suggestions, scan_id, copy.deepcopy(result))
+    result["results"]["from_commit_cache"] = True
+    return result
+
+def _scan_repo(user_id, repo_url, scan_mode=None, defer=False, incremental=False, checkout_mode=None,
+               force=False, progress=None):
+    """Clone and scan a repository; returns (payload, status).
+
+    Unless force is set, a remote HEAD the user already scanned is answered
+    from scan_history without cloning. In incremental mode only the files
+    changed since the last scanned commit are scanned; findings for the other
+    files are carried forward.
+    """
+    if not force:
+        cached = _reuse_repo_scan(user_id, repo_url)
+        if cached:
+            return cached, 200
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        report_progress(progress, "cloning")
+        commit_sha, checkout = _clone_repo(repo_url, temp_dir, checkout_mode)
 
-        scan_id = cursor.fetchone()[0]
+        diff = None
+        previous = _previous_repo_scan(user_id, repo_url) if incremental else None
+        if previous:
+            diff = changed_files(temp_dir, previous["commit_sha"], commit_sha)
+        _strip_git_dir(temp_dir)
 
+        if not _has_scannable_files(temp_dir):
+            return _no_scannable_files("Aucun fichier scannable trouvé dans le dépôt"), 400
 
+        if diff is not None:
+            logger.info(f"Incremental scan of {repo_url} from {previous['commit_sha']} to {commit_sha}")
+            result = _rescan_changed_files(temp_dir, previous, diff, scan_mode=scan_mode, defer=defer, progress=progress)
+        else:
+            result = run_checkov_on_dir(temp_dir, is_file=False, mode=scan_mode, enrich=not defer, progress=progress)
+        result["results"].update(checkout=checkout, from_commit_cache=False)
+        report_progress(progress, "saving")
+        save_checkov_scan(user_id, result, "repo", defer=defer, repo_url=repo_url, commit_sha=commit_sha)
+
+        log_payload(logger, "Returning result for repo input", result)
+        return result, 200
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Failed to clone repository: {e.stderr}")
+        return {"error": "Échec du clonage du dépôt GitHub", "details": e.stderr}, 400
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
-        conn.commit()
-        # Save file contents if provided
-        if files_to_save:
-            save_file_contents(scan_id, files_to_save, input_type)
-        logger.info(f"Scan history saved for user_id {user_id} with scan_id {scan_id}")
-        return scan_id
+def _stream_scan(user_id, input_type, temp_dir, zip_path=None, repo_url=None, scan_mode=None, checkout_mode=None,
+                 force=False):
+    """Yield (event, data) pairs: one "file" event per scanned file, then a "summary"."""
+    try:
+        cached = _reuse_repo_scan(user_id, repo_url) if input_type == "repo" and not force else None
+        if cached:
+            files_found = cached["results"].get("files_found", [])
+            yield "start", {"files_found": files_found, "total": len(files_found)}
+            summary = {k: v for k, v in cached["results"].items() if k not in ("passed_checks", "failed_checks")}
+            yield "summary", {"scan_id": cached["scan_id"], "results": summary}
+            return
+
+        files_to_save = None
+        file_hashes = None
+        commit_sha = None
+        checkout = None
+        if input_type == "zip":
+            manifest = _ingest_zip(temp_dir, zip_path)
+            if not manifest:
+                yield "error", _no_scannable_files(ZIP_ERRORS["empty"])
+                return
+            if any(entry["content"] is None for entry in manifest):
+                yield "error", _no_scannable_files(ZIP_ERRORS["decode"])
+                return
+            files_to_save, file_hashes = _zip_files(manifest)
+            files_found = sorted(entry["abs_path"] for entry in manifest)
+        else:
+            commit_sha, checkout = _clone_repo(repo_url, temp_dir, checkout_mode)
+            _strip_git_dir(temp_dir)
+            if not _has_scannable_files(temp_dir):
+                yield "error", _no_scannable_files("Aucun fichier scannable trouvé dans le dépôt")
+                return
+            files_found = find_scannable_files(temp_dir)
+        yield "start", {"files_found": [clean_path(f) for f in files_found], "total": len(files_found)}
+
+        mode = scan_mode or CHECKOV_SCAN_MODE
+        workers = max(1, min(CHECKOV_MAX_WORKERS, len(files_found)))
+        started = time.monotonic()
+        file_results = {}
+        for file_path, file_result in iter_checkov_file_results(temp_dir, files_found, mode, workers, file_hashes):
+            enrich_suggestions(file_result["results"]["failed_checks"])
+            file_results[file_path] = file_result
+            yield "file", {"file_path": clean_path(file_path), "done": len(file_results), "total": len(files_found), **file_result}
+
+        result = {"results": merge_file_results(temp_dir, files_found, file_results)}
+        result["results"].update(scan_mode=mode, workers=workers, scan_time_seconds=round(time.monotonic() - started, 3))
+        if checkout:
+            result["results"].update(checkout=checkout, from_commit_cache=False)
+        scan_id = save_checkov_scan(user_id, result, input_type, repo_url=repo_url, files_to_save=files_to_save, commit_sha=commit_sha)
+
+        summary = {k: v for k, v in result["results"].items() if k not in ("passed_checks", "failed_checks")}
+        yield "summary", {"scan_id": scan_id, "results": summary}
+    except zipfile.BadZipFile:
+        yield "error", _no_scannable_files(ZIP_ERRORS["invalid"])
+    except ZipLimitError as e:
+        logger.warning(f"Rejected ZIP upload: {str(e)}")
+        yield "error", _no_scannable_files(ZIP_ERRORS["limits"])
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Failed to clone repository: {e.stderr}")
+        yield "error", {"error": "Échec du clonage du dépôt GitHub", "details": e.stderr}
     except Exception as e:
-        logger.error(f"Failed to save scan history: {str(e)}")
-        conn.rollback()
-        raise
+        logger.error(f"Streaming scan failed: {str(e)}")
+        yield "error", {"error": str(e)}
     finally:
-        cursor.close()
-        conn.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def _dispatch(user_id, func, *args, cleanup=None, **kwargs):
+    """Run a scan in the request, or as a background job when async is requested.
+
+    Either way the scan waits for a slot from the scan scheduler. cleanup()
+    removes the scan's input files if the scan is refused or times out.
+    """
+    if get_request_flag("async"):
+        job_id = scan_jobs.submit(user_id, "checkov", func, user_id, *args, cleanup=cleanup, **kwargs)
+        return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}), 202
+    payload, status = run_scheduled(user_id, func, user_id, *args, cleanup=cleanup, **kwargs)
+    return jsonify(render_result(payload)), status
 
 @checkov_bp.route("/checkov", methods=["POST"])
 def validate():
@@ -443,6 +1149,10 @@ def validate():
     if not user_id:
         return jsonify({"error": "user_id is required"}), 400
 
+    # Refuse before anything is written to disk when the scan queues are full
+    scan_scheduler.check_admission(user_id)
+    defer = get_request_flag("defer_suggestions")
+
     # Handle JSON input (code or repo_url)
     if not input_type and request.is_json:
         data = request.get_json()
@@ -456,25 +1166,18 @@ def validate():
             }.get(framework, ".tf")
 
             temp_dir = tempfile.mkdtemp()
-            try:
-                if extension == "Dockerfile":
-                    temp_file_path = os.path.join(temp_dir, "Dockerfile")
-                else:
-                    temp_file_path = os.path.join(temp_dir, f"input{extension}")
-
-                with open(temp_file_path, "w", encoding="utf-8") as f:
-                    f.write(data["content"])
-
-                result = run_checkov_on_single_file(temp_file_path)
+            if extension == "Dockerfile":
+                temp_file_path = os.path.join(temp_dir, "Dockerfile")
+            else:
+                temp_file_path = os.path.join(temp_dir, f"input{extension}")
 
-                # Save the content of the single file
-                files_to_save = [(clean_path(temp_file_path), data["content"])]
-                save_scan_history(user_id, result, input_type="content", files_to_save=files_to_save)
+            with open(temp_file_path, "w", encoding="utf-8") as f:
+                f.write(data["content"])
 
-                logger.debug(f"Returning result for content input: {json.dumps(result, indent=2)[:500]}...")
-                return jsonify(result)
-            finally:
-                shutil.rmtree(temp_dir, ignore_errors=True)
+            return _dispatch(
+                user_id, _scan_content, temp_dir, temp_file_path, data["content"], defer=defer,
+                cleanup=partial(discard_path, temp_dir)
+            )
 
         if "repo_url" in data:
             input_type = "repo"
@@ -483,126 +1186,123 @@ def validate():
     if input_type == "file" and "file" in request.files:
         file = request.files["file"]
         file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-        try:
-            file.save(file_path)
-
-            # Read the file content before running Checkov
-            with open(file_path, "r", encoding="utf-8") as f:
-                file_content = f.read()
-
-            result = run_checkov_on_dir(file_path, is_file=True)
-
-            # Save the content of the single file
-            files_to_save = [(clean_path(file_path), file_content)]
-            save_scan_history(user_id, result, input_type="file", files_to_save=files_to_save)
-
-            logger.debug(f"Returning result for file input: {json.dumps(result, indent=2)[:500]}...")
-            return jsonify(result)
-        finally:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+        file.save(file_path)
+        return _dispatch(user_id, _scan_uploaded_file, file_path, defer=defer, cleanup=partial(discard_path, file_path))
 
     elif input_type == "zip" and "file" in request.files:
         file = request.files["file"]
         temp_dir = tempfile.mkdtemp()
         zip_path = os.path.join(temp_dir, file.filename)
-        try:
-            file.save(zip_path)
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(temp_dir)
-
-            macosx_path = os.path.join(temp_dir, "__MACOSX")
-            if os.path.exists(macosx_path):
-                shutil.rmtree(macosx_path)
-
-            if not any(f.endswith(('.tf', '.yaml', '.yml')) or f == "Dockerfile" for _, _, files in os.walk(temp_dir) for f in files):
-                return jsonify({
-                    "results": {
-                        "status": "error",
-                        "message": "Aucun fichier scannable trouvé dans l’archive",
-                        "passed_checks": [],
-                        "failed_checks": [],
-                        "summary": {"passed": 0, "failed": 0}
-                    }
-                }), 400
-
-            # Collect the content of all scannable files in the ZIP
-            files_to_save = []
-            for root, dirs, files in os.walk(temp_dir):
-                for file_name in files:
-                    file_path = os.path.join(root, file_name)
-                    if file_name.endswith(('.tf', '.yaml', '.yml')) or file_name == 'Dockerfile':
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            content = f.read()
-                        files_to_save.append((clean_path(file_path), content))
-
-            result = run_checkov_on_dir(temp_dir, is_file=False)
-            save_scan_history(user_id, result, input_type="zip", files_to_save=files_to_save)
-
-            logger.debug(f"Returning result for zip input: {json.dumps(result, indent=2)[:500]}...")
-            return jsonify(result)
-        except zipfile.BadZipFile:
-            return jsonify({
-                "results": {
-                    "status": "error",
-                    "message": "Le fichier ZIP est invalide",
-                    "passed_checks": [],
-                    "failed_checks": [],
-                    "summary": {"passed": 0, "failed": 0}
-                }
-            }), 400
-        except UnicodeDecodeError as e:
-            logger.error(f"Failed to decode file in ZIP: {str(e)}")
-            return jsonify({
-                "results": {
-                    "status": "error",
-                    "message": "Erreur de décodage du fichier dans l’archive",
-                    "passed_checks": [],
-                    "failed_checks": [],
-                    "summary": {"passed": 0, "failed": 0}
-                }
-            }), 400
-        finally:
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        file.save(zip_path)
+        return _dispatch(
+            user_id, _scan_zip, temp_dir, zip_path, scan_mode=get_scan_mode(), defer=defer,
+            cleanup=partial(discard_path, temp_dir)
+        )
 
     elif input_type == "repo":
         repo_url = request.form.get("repo_url") or (request.json and request.json.get("repo_url"))
         if not repo_url:
             return jsonify({"error": "repo_url est requis"}), 400
 
+        return _dispatch(
+            user_id, _scan_repo, repo_url,
+            scan_mode=get_scan_mode(), defer=defer, incremental=get_request_flag("incremental"),
+            checkout_mode=get_checkout_mode(), force=get_request_flag("force")
+        )
+
+    return jsonify({"error": "Type d'entrée invalide. Utilisez 'file', 'zip', 'repo' ou 'content'"}), 400
+
+@checkov_bp.route("/checkov/suggestion-cache", methods=["GET"])
+def suggestion_cache_stats():
+    return jsonify(suggestion_cache.snapshot())
+
+def _suggestion_entry(check):
+    return {
+        "finding_id": check.get("finding_id"),
+        "check_id": check.get("check_id"),
+        "file_path": check.get("file_path"),
+        "resource": check.get("resource"),
+        "suggestion": check.get("suggestion"),
+        "suggestion_status": check.get("suggestion_status", "ready")
+    }
+
+@checkov_bp.route("/checkov/<int:scan_id>/suggestions", methods=["GET"])
+@checkov_bp.route("/checkov/<int:scan_id>/suggestions/<int:finding_id>", methods=["GET"])
+def get_scan_suggestions(scan_id, finding_id=None):
+    user_id = request.headers.get("X-User-ID")
+    if not user_id:
+        return jsonify({"error": "user_id is required"}), 400
+
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT scan_result FROM scan_history WHERE id = %s AND user_id = %s AND scan_type = 'checkov'",
+                    (scan_id, user_id)
+                )
+                row = cursor.fetchone()
+    except DatabaseUnavailable:
+        return jsonify({"error": "Erreur connexion DB"}), 500
+    except Exception as e:
+        logger.error(f"Failed to fetch suggestions for scan_id {scan_id}: {str(e)}")
+        return jsonify({"error": "Failed to fetch suggestions"}), 500
+
+    if not row:
+        return jsonify({"error": "Scan introuvable"}), 404
+
+    failed_checks = expand_result(row[0]).get("results", {}).get("failed_checks", [])
+    if finding_id is not None:
+        if finding_id >= len(failed_checks):
+            return jsonify({"error": "Finding introuvable"}), 404
+        return jsonify({"scan_id": scan_id, **_suggestion_entry(failed_checks[finding_id])})
+
+    suggestions = [_suggestion_entry(check) for check in failed_checks]
+    pending = any(entry["suggestion_status"] == "pending" for entry in suggestions)
+    return jsonify({
+        "scan_id": scan_id,
+        "status": "pending" if pending else "ready",
+        "suggestions": suggestions
+    })
+
+@checkov_bp.route("/checkov/scan-cache", methods=["GET"])
+def scan_cache_stats():
+    return jsonify(scan_cache.snapshot())
+
+@checkov_bp.route("/checkov/repo-cache", methods=["GET"])
+def repo_cache_stats():
+    return jsonify(repo_cache.snapshot())
+
+@checkov_bp.route("/checkov/stream", methods=["POST"])
+def validate_stream():
+    """Streaming variant of /checkov for zip and repo inputs (SSE or NDJSON)."""
+    input_type = request.form.get("input_type")
+    user_id = request.headers.get("X-User-ID") or (request.is_json and request.get_json().get("user_id"))
+    if not user_id:
+        return jsonify({"error": "user_id is required"}), 400
+
+    if not input_type and request.is_json and "repo_url" in request.get_json():
+        input_type = "repo"
+
+    scan_scheduler.check_admission(user_id)
+
+    if input_type == "zip" and "file" in request.files:
+        file = request.files["file"]
         temp_dir = tempfile.mkdtemp()
-        try:
-            logger.debug(f"Cloning repository {repo_url} to {temp_dir}")
-            clone_cmd = ["git", "clone", "--depth", "1", repo_url, temp_dir]
-            subprocess.run(clone_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-
-            git_dir = os.path.join(temp_dir, ".git")
-            if os.path.exists(git_dir):
-                def remove_readonly(func, path, _):
-                    os.chmod(path, stat.S_IWRITE)
-                    func(path)
-                shutil.rmtree(git_dir, onerror=remove_readonly)
-
-            if not any(f.endswith(('.tf', '.yaml', '.yml')) or f == "Dockerfile" for _, _, files in os.walk(temp_dir) for f in files):
-                return jsonify({
-                    "results": {
-                        "status": "error",
-                        "message": "Aucun fichier scannable trouvé dans le dépôt",
-                        "passed_checks": [],
-                        "failed_checks": [],
-                        "summary": {"passed": 0, "failed": 0}
-                    }
-                }), 400
-
-            result = run_checkov_on_dir(temp_dir, is_file=False)
-            save_scan_history(user_id, result, input_type="repo", repo_url=repo_url)
-
-            logger.debug(f"Returning result for repo input: {json.dumps(result, indent=2)[:1000]}...")
-            return jsonify(result)
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to clone repository: {e.stderr}")
-            return jsonify({"error": "Échec du clonage du dépôt GitHub", "details": e.stderr}), 400
-        finally:
-            shutil.rmtree(temp_dir, ignore_errors=True)
-
-    return jsonify({"error": "Type d'entrée invalide. Utilisez 'file', 'zip', 'repo' ou 'content'"}), 400
\ No newline at end of file
+        zip_path = os.path.join(temp_dir, file.filename)
+        file.save(zip_path)
+        return event_stream_response(scheduled_events(
+            user_id, _stream_scan(user_id, "zip", temp_dir, zip_path=zip_path, scan_mode=get_scan_mode()),
+            cleanup=partial(discard_path, temp_dir)
+        ))
+
+    if input_type == "repo":
+        repo_url = get_request_option("repo_url")
+        if not repo_url:
+            return jsonify({"error": "repo_url est requis"}), 400
+        temp_dir = tempfile.mkdtemp()
+        return event_stream_response(scheduled_events(user_id, _stream_scan(
+            user_id, "repo", temp_dir, repo_url=repo_url, scan_mode=get_scan_mode(),
+            checkout_mode=get_checkout_mode(), force=get_request_flag("force")
+        ), cleanup=partial(discard_path, temp_dir)))
+
+    return jsonify({"error": "Type d'entrée invalide. Utilisez 'zip' ou 'repo'"}), 400
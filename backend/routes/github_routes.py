@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, redirect
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
-from utils.db import get_db_connection
+from utils.db import db_connection, db_cursor, DatabaseUnavailable
+from utils.http_cache import bump_version, conditional
 import requests
 import os
 from dotenv import load_dotenv
@@ -13,6 +14,8 @@ github_bp = Blueprint("github", __name__)
 
 GITHUB_CLIENT_ID = os.getenv("GITHUB_CLIENT_ID")
 GITHUB_CLIENT_SECRET = os.getenv("GITHUB_CLIENT_SECRET")
+# Config files are read from GitHub: revalidate cached copies at least this often
+REPO_CONFIGS_MAX_AGE = int(os.getenv("REPO_CONFIGS_MAX_AGE", "300"))
 
 @github_bp.route("/auth/github")
 def github_login():
@@ -65,61 +68,57 @@ def github_callback():
         name = user_data.get("name", user_data.get("login", "GitHub User"))
         github_id = str(user_data["id"])
 
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Erreur connexion DB"}), 500
-
         try:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT id, name, email, password FROM users_test WHERE email = %s",
-                    (email,)
-                )
-                user = cur.fetchone()
-
-                if user:
-                    user_id = user[0]
-                    needs_password = user[3] is None
-                else:
+            with db_connection() as conn:
+                with conn.cursor() as cur:
                     cur.execute(
-                        "INSERT INTO users_test (name, email, created_at) VALUES (%s, %s, CURRENT_TIMESTAMP) RETURNING id",
-                        (name, email)
+                        "SELECT id, name, email, password FROM users_test WHERE email = %s",
+                        (email,)
                     )
-                    user_id = cur.fetchone()[0]
-                    needs_password = True
-
-                cur.execute(
-                    "SELECT user_id FROM github_users WHERE github_id = %s",
-                    (github_id,)
-                )
-                github_user = cur.fetchone()
+                    user = cur.fetchone()
+
+                    if user:
+                        user_id = user[0]
+                        needs_password = user[3] is None
+                    else:
+                        cur.execute(
+                            "INSERT INTO users_test (name, email, created_at) VALUES (%s, %s, CURRENT_TIMESTAMP) RETURNING id",
+                            (name, email)
+                        )
+                        user_id = cur.fetchone()[0]
+                        needs_password = True
 
-                if not github_user:
                     cur.execute(
-                        "INSERT INTO github_users (user_id, github_id, access_token, created_at) "
-                        "VALUES (%s, %s, %s, CURRENT_TIMESTAMP)",
-                        (user_id, github_id, access_token)
+                        "SELECT user_id FROM github_users WHERE github_id = %s",
+                        (github_id,)
                     )
-
-                conn.commit()
-
-                frontend_url = (
-                    f"http://localhost:3000/auth/github/callback"
-                    f"?access_token={create_access_token(identity=str(user_id))}"
-                    f"&refresh_token={create_refresh_token(identity=str(user_id))}"
-                    f"&user_id={user_id}"
-                    f"&name={name}"
-                    f"&email={email}"
-                    f"&needs_password={str(needs_password).lower()}"
-                )
-                return redirect(frontend_url)
-
+                    github_user = cur.fetchone()
+
+                    if not github_user:
+                        cur.execute(
+                            "INSERT INTO github_users (user_id, github_id, access_token, created_at) "
+                            "VALUES (%s, %s, %s, CURRENT_TIMESTAMP)",
+                            (user_id, github_id, access_token)
+                        )
+                        bump_version(cur, user_id, "configs")
+
+                    conn.commit()
+
+                    frontend_url = (
+                        f"http://localhost:3000/auth/github/callback"
+                        f"?access_token={create_access_token(identity=str(user_id))}"
+                        f"&refresh_token={create_refresh_token(identity=str(user_id))}"
+                        f"&user_id={user_id}"
+                        f"&name={name}"
+                        f"&email={email}"
+                        f"&needs_password={str(needs_password).lower()}"
+                    )
+                    return redirect(frontend_url)
+        except DatabaseUnavailable:
+            return jsonify({"error": "Erreur connexion DB"}), 500
         except Exception as e:
             print("❌ Erreur PostgreSQL:", e)
-            conn.rollback()
             return jsonify({"error": "Erreur base de données"}), 500
-        finally:
-            conn.close()
 
     except Exception as e:
         print("❌ Erreur GitHub OAuth:", e)
@@ -129,12 +128,8 @@ def github_callback():
 @jwt_required()
 def get_github_repos():
     user_id = get_jwt_identity()
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({"error": "Erreur connexion DB"}), 500
-
     try:
-        with conn.cursor() as cur:
+        with db_cursor() as cur:
             cur.execute(
                 "SELECT access_token FROM github_users WHERE user_id = %s",
                 (user_id,)
@@ -144,6 +139,13 @@ def get_github_repos():
                 return jsonify({"error": "Compte GitHub non lié"}), 404
             access_token = result[0]
 
+            cur.execute(
+                "SELECT full_name FROM selected_repos WHERE user_id = %s",
+                (user_id,)
+            )
+            selected = {row[0] for row in cur.fetchall()}
+
+        # The pooled connection is back in the pool while GitHub answers
         headers = {"Authorization": f"Bearer {access_token}"}
         response = requests.get("https://api.github.com/user/repos", headers=headers)
         if response.status_code != 200:
@@ -156,26 +158,17 @@ def get_github_repos():
                 "full_name": repo["full_name"],
                 "description": repo.get("description", ""),
                 "html_url": repo["html_url"],
-                "has_dependabot": False
+                "has_dependabot": False,
+                "is_selected": repo["full_name"] in selected
             }
             for repo in repos
         ]
-        # Check selected repos
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT full_name FROM selected_repos WHERE user_id = %s",
-                (user_id,)
-            )
-            selected = [row[0] for row in cur.fetchall()]
-            for repo in repo_data:
-                repo["is_selected"] = repo["full_name"] in selected
         return jsonify(repo_data)
-
+    except DatabaseUnavailable:
+        return jsonify({"error": "Erreur connexion DB"}), 500
     except Exception as e:
         print("❌ Erreur PostgreSQL:", e)
         return jsonify({"error": "Erreur base de données"}), 500
-    finally:
-        conn.close()
 
 @github_bp.route("/github/validate-token", methods=["POST"])
 @jwt_required()
@@ -212,36 +205,33 @@ def validate_github_token():
         if not selected_repos or repo["full_name"] in selected_repos
     ]
 
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({"error": "Erreur connexion DB"}), 500
-
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT user_id FROM github_users WHERE user_id = %s",
-                (user_id,)
-            )
-            exists = cur.fetchone()
-            if exists:
-                cur.execute(
-                    "UPDATE github_users SET access_token = %s, github_id = %s WHERE user_id = %s",
-                    (token, github_id, user_id)
-                )
-            else:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
                 cur.execute(
-                    "INSERT INTO github_users (user_id, github_id, access_token, created_at) "
-                    "VALUES (%s, %s, %s, CURRENT_TIMESTAMP)",
-                    (user_id, github_id, token)
+                    "SELECT user_id FROM github_users WHERE user_id = %s",
+                    (user_id,)
                 )
-            conn.commit()
-        return jsonify({"message": "Jeton validé", "repos": repo_data})
+                exists = cur.fetchone()
+                if exists:
+                    cur.execute(
+                        "UPDATE github_users SET access_token = %s, github_id = %s WHERE user_id = %s",
+                        (token, github_id, user_id)
+                    )
+                else:
+                    cur.execute(
+                        "INSERT INTO github_users (user_id, github_id, access_token, created_at) "
+                        "VALUES (%s, %s, %s, CURRENT_TIMESTAMP)",
+                        (user_id, github_id, token)
+                    )
+                bump_version(cur, user_id, "configs")
+                conn.commit()
+            return jsonify({"message": "Jeton validé", "repos": repo_data})
+    except DatabaseUnavailable:
+        return jsonify({"error": "Erreur connexion DB"}), 500
     except Exception as e:
         print("❌ Erreur PostgreSQL:", e)
-        conn.rollback()
         return jsonify({"error": "Erreur base de données"}), 500
-    finally:
-        conn.close()
 
 @github_bp.route("/github/save-repos", methods=["POST"])
 @jwt_required()
@@ -250,46 +240,40 @@ def save_selected_repos():
     data = request.get_json()
     selected_repos = data.get("selected_repos", [])
 
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({"error": "Erreur connexion DB"}), 500
-
     try:
-        with conn.cursor() as cur:
-            # Clear existing selections
-            cur.execute(
-                "DELETE FROM selected_repos WHERE user_id = %s",
-                (user_id,)
-            )
-
-            # Insert new selections
-            for repo in selected_repos:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                # Clear existing selections
                 cur.execute(
-                    "INSERT INTO selected_repos (user_id, full_name, name, html_url, created_at) "
-                    "VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP) ON CONFLICT (full_name) DO NOTHING",
-                    (user_id, repo["full_name"], repo["name"], repo["html_url"])
+                    "DELETE FROM selected_repos WHERE user_id = %s",
+                    (user_id,)
                 )
 
-            conn.commit()
-        return jsonify({"message": "Dépôts enregistrés"})
+                # Insert new selections
+                for repo in selected_repos:
+                    cur.execute(
+                        "INSERT INTO selected_repos (user_id, full_name, name, html_url, created_at) "
+                        "VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP) ON CONFLICT (full_name) DO NOTHING",
+                        (user_id, repo["full_name"], repo["name"], repo["html_url"])
+                    )
+                bump_version(cur, user_id, "configs")
+
+                conn.commit()
+            return jsonify({"message": "Dépôts enregistrés"})
+    except DatabaseUnavailable:
+        return jsonify({"error": "Erreur connexion DB"}), 500
     except Exception as e:
         print("❌ Erreur PostgreSQL:", e)
-        conn.rollback()
         return jsonify({"error": "Erreur base de données"}), 500
-    finally:
-        conn.close()
 
 # github.py (Flask Blueprint)
 @github_bp.route("/github/repo-configs", methods=["GET"])
 @jwt_required()
+@conditional("configs", identity=get_jwt_identity, max_age=REPO_CONFIGS_MAX_AGE)
 def get_repo_configs():
     user_id = get_jwt_identity()
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({"error": "Erreur connexion DB"}), 500
-
     try:
-        with conn.cursor() as cur:
+        with db_cursor() as cur:
             cur.execute(
                 "SELECT access_token FROM github_users WHERE user_id = %s",
                 (user_id,)
@@ -305,6 +289,7 @@ def get_repo_configs():
             )
             repos = [{"id": row[0], "full_name": row[1], "html_url": row[2]} for row in cur.fetchall()]
 
+        # GitHub is walked without holding a pooled connection; one is borrowed again to write
         headers = {"Authorization": f"Bearer {access_token}"}
         config_files = []
 
@@ -346,11 +331,11 @@ def get_repo_configs():
                         files.extend(fetch_contents(item["path"]))
                 return files
 
-            repo_configs = fetch_contents()
-            config_files.extend(repo_configs)
+            config_files.extend(fetch_contents())
 
+        with db_connection() as conn:
             with conn.cursor() as cur:
-                for config in repo_configs:
+                for config in config_files:
                     content_bytes = config["content"].encode("utf-8")
                     cur.execute(
                         "INSERT INTO repo_configs (repo_id, file_path, file_name, content, sha, framework, created_at) "
@@ -360,34 +345,32 @@ def get_repo_configs():
                     )
                 conn.commit()
 
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT rc.id, rc.file_path, rc.file_name, rc.content, rc.sha, sr.full_name, sr.html_url, rc.framework
-                FROM repo_configs rc
-                JOIN selected_repos sr ON rc.repo_id = sr.id
-                WHERE sr.user_id = %s
-                """,
-                (user_id,)
-            )
-            configs = [
-                {
-                    "id": row[0],
-                    "file_path": row[1],
-                    "file_name": row[2],
-                    "content": bytes(row[3]).decode("utf-8", errors="ignore"),  # Convert memoryview to bytes first
-                    "sha": row[4],
-                    "repo_full_name": row[5],
-                    "repo_html_url": row[6],
-                    "framework": row[7]
-                }
-                for row in cur.fetchall()
-            ]
+                cur.execute(
+                    """
+                    SELECT rc.id, rc.file_path, rc.file_name, rc.content, rc.sha, sr.full_name, sr.html_url, rc.framework
+                    FROM repo_configs rc
+                    JOIN selected_repos sr ON rc.repo_id = sr.id
+                    WHERE sr.user_id = %s
+                    """,
+                    (user_id,)
+                )
+                configs = [
+                    {
+                        "id": row[0],
+                        "file_path": row[1],
+                        "file_name": row[2],
+                        "content": bytes(row[3]).decode("utf-8", errors="ignore"),  # Convert memoryview to bytes first
+                        "sha": row[4],
+                        "repo_full_name": row[5],
+                        "repo_html_url": row[6],
+                        "framework": row[7]
+                    }
+                    for row in cur.fetchall()
+                ]
 
         return jsonify(configs)
-
+    except DatabaseUnavailable:
+        return jsonify({"error": "Erreur connexion DB"}), 500
     except Exception as e:
         print("❌ Erreur:", e)
-        return jsonify({"error": "Erreur serveur"}), 500
-    finally:
-        conn.close()
\ No newline at end of file
+        return jsonify({"error": "Erreur serveur"}), 500
\ No newline at end of file
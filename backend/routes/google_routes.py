@@ -3,7 +3,7 @@ from flask_jwt_extended import create_access_token, create_refresh_token
 from google_auth_oauthlib.flow import Flow
 from google.oauth2 import id_token
 from google.auth.transport.requests import Request
-from utils.db import get_db_connection
+from utils.db import db_connection, DatabaseUnavailable
 import os
 from dotenv import load_dotenv
 
@@ -68,46 +68,42 @@ def google_callback():
         email = id_info.get("email")
         name = id_info.get("name", "Utilisateur Google")
 
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Erreur de connexion à la base de données"}), 500
-
         try:
-            with conn.cursor() as cur:
-                cur.execute("SELECT id, name, email, password FROM users_test WHERE email = %s", (email,))
-                user = cur.fetchone()
-
-                if user:
-                    user_id = user[0]
-                    needs_password = user[3] is None
-                else:
-                    cur.execute(
-                        "INSERT INTO users_test (name, email) VALUES (%s, %s) RETURNING id",
-                        (name, email)
-                    )
-                    user_id = cur.fetchone()[0]
-                    conn.commit()
-                    needs_password = True
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT id, name, email, password FROM users_test WHERE email = %s", (email,))
+                    user = cur.fetchone()
 
-                access_token = create_access_token(identity=str(user_id))
-                refresh_token = create_refresh_token(identity=str(user_id))
+                    if user:
+                        user_id = user[0]
+                        needs_password = user[3] is None
+                    else:
+                        cur.execute(
+                            "INSERT INTO users_test (name, email) VALUES (%s, %s) RETURNING id",
+                            (name, email)
+                        )
+                        user_id = cur.fetchone()[0]
+                        conn.commit()
+                        needs_password = True
 
-                frontend_url = (
-                    f"http://localhost:3000/auth/google/callback"
-                    f"?access_token={access_token}"
-                    f"&refresh_token={refresh_token}"
-                    f"&user_id={user_id}"
-                    f"&name={name}"
-                    f"&email={email}"
-                    f"&needs_password={str(needs_password).lower()}"
-                )
-                return redirect(frontend_url)
+                    access_token = create_access_token(identity=str(user_id))
+                    refresh_token = create_refresh_token(identity=str(user_id))
 
+                    frontend_url = (
+                        f"http://localhost:3000/auth/google/callback"
+                        f"?access_token={access_token}"
+                        f"&refresh_token={refresh_token}"
+                        f"&user_id={user_id}"
+                        f"&name={name}"
+                        f"&email={email}"
+                        f"&needs_password={str(needs_password).lower()}"
+                    )
+                    return redirect(frontend_url)
+        except DatabaseUnavailable:
+            return jsonify({"error": "Erreur de connexion à la base de données"}), 500
         except Exception as e:
             print("❌ Erreur lors de l'authentification Google :", e)
             return jsonify({"error": "Erreur lors de l'authentification"}), 500
-        finally:
-            conn.close()
 
     except Exception as e:
         print("❌ Erreur Google OAuth :", e)
@@ -0,0 +1,41 @@
+from flask import Blueprint, request, jsonify
+from datetime import datetime, timezone
+
+from utils.jobs import scan_jobs
+from utils.scheduler import scan_scheduler
+from utils.db import db_pool
+from utils.result_codec import render_result
+
+jobs_bp = Blueprint("jobs", __name__)
+
+
+@jobs_bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    user_id = request.headers.get("X-User-ID")
+    if not user_id:
+        return jsonify({"error": "user_id is required"}), 400
+
+    job = scan_jobs.get(job_id)
+    if not job or job["user_id"] != str(user_id):
+        return jsonify({"error": "Job introuvable"}), 404
+
+    return jsonify({
+        "job_id": job["id"],
+        "scan_type": job["scan_type"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "result": render_result(job["result"]),
+        "created_at": datetime.fromtimestamp(job["created_at"], timezone.utc).isoformat(),
+        "updated_at": datetime.fromtimestamp(job["updated_at"], timezone.utc).isoformat()
+    })
+
+
+@jobs_bp.route("/scheduler/stats", methods=["GET"])
+def scheduler_stats():
+    return jsonify(scan_scheduler.snapshot())
+
+
+@jobs_bp.route("/db/stats", methods=["GET"])
+def db_pool_stats():
+    return jsonify(db_pool.snapshot())
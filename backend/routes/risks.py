@@ -1,58 +1,118 @@
 from flask import Blueprint, request, jsonify
-from utils.db import get_db_connection
+from utils.db import db_cursor
+from utils.http_cache import conditional
 import logging
+import os
 
 risks_bp = Blueprint('risks', __name__)
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s %(levelname)s:%(name)s: %(message)s',
-    handlers=[logging.FileHandler('risks_app.log'), logging.StreamHandler()]
-)
 logger = logging.getLogger(__name__)
 
+# Without a time window, /risks covers the user's latest scans, as it always has
+RISKS_DEFAULT_SCANS = 10
+RISKS_DEFAULT_LIMIT = 100
+RISKS_MAX_LIMIT = 500
+# With ?days=, findings age out of the window without any write: cached copies expire this often
+RISKS_WINDOW_MAX_AGE = int(os.getenv("RISKS_WINDOW_MAX_AGE", "3600"))
+
+RISKS_COUNT_QUERY = "SELECT f.severity, COUNT(*) FROM findings f WHERE {where} GROUP BY f.severity"
+
+RISKS_DETAILS_QUERY = """
+    SELECT f.id, f.severity, f.check_id, f.file_path, f.message, f.suggestion, f.scan_type,
+           f.scan_id, f.fingerprint
+    FROM findings f
+    WHERE {where} {after}
+    ORDER BY f.id DESC
+    LIMIT %s
+"""
+
+
+def _window_max_age():
+    return RISKS_WINDOW_MAX_AGE if request.args.get("days") else None
+
+
+def _risks_scope(user_id, args):
+    """WHERE clause and params selecting the findings /risks reports on."""
+    clauses, params = ["f.user_id = %s"], [str(user_id)]
+    scan_type = args.get("scan_type")
+    if scan_type:
+        clauses.append("f.scan_type = %s")
+        params.append(scan_type)
+    severities = [s.strip().upper() for s in args.get("severity", "").split(",") if s.strip()]
+    if severities:
+        clauses.append("f.severity = ANY(%s)")
+        params.append(severities)
+
+    days = args.get("days")
+    if days:
+        clauses.append("f.created_at >= NOW() - make_interval(days => %s)")
+        params.append(min(max(int(days), 1), 3650))
+    else:
+        scans = min(max(int(args.get("scans", RISKS_DEFAULT_SCANS)), 1), 1000)
+        clauses.append(
+            "f.scan_id IN (SELECT id FROM scan_history WHERE user_id = %s"
+            + (" AND scan_type = %s" if scan_type else "")
+            + " ORDER BY created_at DESC LIMIT %s)"
+        )
+        params.extend([user_id, scan_type, scans] if scan_type else [user_id, scans])
+    return " AND ".join(clauses), params
+
+
+def risks_queries(user_id, args, limit=RISKS_DEFAULT_LIMIT, cursor_id=None):
+    """SQL and params of the severity counts and of one page of details (plus one row)."""
+    where, params = _risks_scope(user_id, args)
+    return (
+        (RISKS_COUNT_QUERY.format(where=where), params),
+        (
+            RISKS_DETAILS_QUERY.format(where=where, after="AND f.id < %s" if cursor_id else ""),
+            params + ([cursor_id] if cursor_id else []) + [limit + 1]
+        ),
+    )
+
 
 @risks_bp.route("/risks", methods=["GET"])
+@conditional("scans", max_age=_window_max_age)
 def get_risks():
+    """Severity counts and one page of findings.
+
+    Filters: severity (comma-separated), scan_type, days (time window; the
+    latest `scans` scans otherwise). Details are paged with limit and the
+    next_cursor of the previous page.
+    """
     user_id = request.headers.get("X-User-ID")
     if not user_id:
         return jsonify({"error": "user_id is required"}), 400
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Fetch scan history
-        query = """
-            SELECT scan_result, scan_type
-            FROM scan_history
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-            LIMIT 10
-        """
-        cursor.execute(query, (user_id,))
-        rows = cursor.fetchall()
-
-        # Aggregate risks by severity
-        severity_counts = {"ERROR": 0, "WARNING": 0, "INFO": 0}
-        detailed_risks = []
-
-        for row in rows:
-            scan_result = row[0]
-            scan_type = row[1]
-            failed_checks = scan_result.get("results", {}).get("failed_checks", [])
-
-            for check in failed_checks:
-                severity = check.get("severity", "INFO")
-                severity_counts[severity] = severity_counts.get(severity, 0) + 1
-                detailed_risks.append({
-                    "severity": severity,
-                    "check_id": check.get("check_id"),
-                    "file_path": check.get("file_path"),
-                    "message": check.get("message"),
-                    "suggestion": check.get("suggestion"),
-                    "scan_type": scan_type
-                })
+        limit = min(max(int(request.args.get("limit", RISKS_DEFAULT_LIMIT)), 1), RISKS_MAX_LIMIT)
+        cursor_id = int(request.args["cursor"]) if request.args.get("cursor") else None
+        count_query, details_query = risks_queries(user_id, request.args, limit, cursor_id)
+    except ValueError:
+        return jsonify({"error": "Invalid filter or cursor"}), 400
+
+    try:
+        with db_cursor() as cursor:
+            # Aggregate risks by severity
+            cursor.execute(*count_query)
+            severity_counts = {"ERROR": 0, "WARNING": 0, "INFO": 0}
+            severity_counts.update({severity: count for severity, count in cursor.fetchall()})
+
+            cursor.execute(*details_query)
+            rows = cursor.fetchall()
+
+        detailed_risks = [
+            {
+                "severity": row[1],
+                "check_id": row[2],
+                "file_path": row[3],
+                "message": row[4],
+                "suggestion": row[5],
+                "scan_type": row[6],
+                "scan_id": row[7],
+                "fingerprint": row[8]
+            }
+            for row in rows[:limit]
+        ]
 
         # Format risks for dashboard
         risks = [
@@ -63,11 +123,10 @@ def get_risks():
 
         return jsonify({
             "risks": risks,
-            "details": detailed_risks
+            "severity_counts": severity_counts,
+            "details": detailed_risks,
+            "next_cursor": str(rows[limit - 1][0]) if len(rows) > limit else None
         })
     except Exception as e:
         logger.error(f"Failed to fetch risks for user_id {user_id}: {str(e)}")
         return jsonify({"error": "Failed to fetch risks"}), 500
-    finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
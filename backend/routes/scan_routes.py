@@ -1,11 +1,35 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required
+from flask_jwt_extended import jwt_required, get_jwt_identity
+import logging
 import subprocess
 import tempfile
 import json
 
+from utils.git_utils import head_commit, remote_head
+from utils.repo_cache import clone_repo
+from utils.commit_cache import cached_repo_scan, cache_repo_scan
+from utils.scheduler import scan_scheduler, SchedulerBusy
+
+logger = logging.getLogger(__name__)
+
 scan_bp = Blueprint("scan", __name__)
 
+_semgrep_version = None
+
+
+def semgrep_scanner_version():
+    """Version string stored with /scan results; results are only reused for the same one."""
+    global _semgrep_version
+    if not _semgrep_version:
+        try:
+            process = subprocess.run(['semgrep', '--version'], capture_output=True, text=True, timeout=60)
+            _semgrep_version = process.stdout.strip() or "unknown"
+        except (subprocess.TimeoutExpired, OSError) as e:
+            logger.warning(f"Could not read the Semgrep version: {str(e)}")
+            _semgrep_version = "unknown"
+    return f"semgrep {_semgrep_version} (--config=auto)"
+
+
 @scan_bp.route('/scan', methods=['POST'])
 @jwt_required()
 def scan_repo():
@@ -16,8 +40,16 @@ def scan_repo():
         if not repo_url:
             return jsonify({"status": "failed", "error": "Le champ 'repo_url' est requis"}), 400
 
-        with tempfile.TemporaryDirectory() as temp_dir:
-            subprocess.run(['git', 'clone', repo_url, temp_dir], check=True)
+        user_id = get_jwt_identity()
+        if not data.get('force'):
+            commit_sha = remote_head(repo_url)
+            cached = commit_sha and cached_repo_scan(user_id, repo_url, commit_sha, semgrep_scanner_version())
+            if cached:
+                return jsonify({**cached, "from_commit_cache": True}), 200
+
+        with scan_scheduler.slot(user_id), tempfile.TemporaryDirectory() as temp_dir:
+            clone_repo(repo_url, temp_dir)
+            commit_sha = head_commit(temp_dir)
             semgrep_result = subprocess.run(
                 ['semgrep', 'scan', temp_dir, '--config=auto', '--json'],
                 capture_output=True, text=True
@@ -31,12 +63,17 @@ def scan_repo():
             exit_code = 1 if findings else 0
             status = "failed" if findings else "success"
 
-            return jsonify({
+            payload = {
                 "status": status,
                 "exit_code": exit_code,
                 "findings": findings
-            }), 200
+            }
+            # Not a history entry: callers such as the /semgrep proxy record the scan themselves
+            cache_repo_scan(user_id, repo_url, commit_sha, semgrep_scanner_version(), payload)
+            return jsonify({**payload, "from_commit_cache": False}), 200
 
+    except SchedulerBusy:
+        raise
     except Exception as e:
         print(f"Erreur serveur: {e}")
-        return jsonify({"status": "failed", "error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"status": "failed", "error": str(e)}), 500
@@ -3,12 +3,17 @@ import os
 import tempfile
 import zipfile
 import requests
-import json
 import logging
 import shutil
+from functools import partial
 from pathlib import Path
-from psycopg2.extras import Json
-from utils.db import get_db_connection
+from utils.jobs import scan_jobs, report_progress
+from utils.scheduler import scan_scheduler, run_scheduled, scheduled_events, discard_path
+from utils.streaming import event_stream_response
+from utils.zip_ingest import ingest_zip, is_semgrep_file, ZipLimitError
+from utils.log_config import log_payload
+from utils.result_codec import render_result
+from utils.scan_store import save_scan
 
 semgrep_bp = Blueprint('semgrep', __name__)
 
@@ -16,15 +21,6 @@ semgrep_bp = Blueprint('semgrep', __name__)
 UPLOAD_FOLDER = "Uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s %(levelname)s:%(name)s: %(message)s',
-    handlers=[
-        logging.FileHandler('semgrep_app.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
@@ -48,35 +44,9 @@ def clean_path(full_path):
         return str(full_path)
 
 
-def save_file_contents(scan_id, files, input_type):
-    """Save the content of files to the file_contents table."""
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        for file_path, content in files:
-            cursor.execute(
-                """
-                INSERT INTO file_contents (scan_id, file_path, content, input_type)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (scan_id, clean_path(file_path), content, input_type)
-            )
-        conn.commit()
-        logger.info(f"Saved {len(files)} file contents for scan_id {scan_id}")
-    except Exception as e:
-        logger.error(f"Failed to save file contents for scan_id {scan_id}: {str(e)}")
-        conn.rollback()
-    finally:
-        cursor.close()
-        conn.close()
-
-
 def save_scan_history(user_id, result, input_type, repo_url=None, files_to_save=None):
     """Save the scan result and associated file contents to the database."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        print(repo_url)
         # Normalize paths in files_found
         if result.get("results", {}).get("files_found"):
             result["results"]["files_found"] = [clean_path(f) for f in result["results"]["files_found"]]
@@ -94,40 +64,201 @@ def save_scan_history(user_id, result, input_type, repo_url=None, files_to_save=
         if not result.get("results", {}).get("path_scanned"):
             result["results"]["path_scanned"] = clean_path(tempfile.gettempdir())
 
-        # Insert scan history
-        cursor.execute(
-            """
-            INSERT INTO scan_history (user_id, scan_result, repo_url, status, score, compliant, input_type , scan_type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s , %s)
-            RETURNING id
-            """,
-            (
-                user_id,
-                Json(result),
-                repo_url,
-                result.get("status", "unknown"),
-                score,
-                compliant,
-                input_type,
-                'semgrep'  # Set scan_type to semgrep
-            )
+        scan_id = save_scan(
+            user_id, "semgrep", result, input_type,
+            status=result.get("status", "unknown"),
+            score=score,
+            compliant=compliant,
+            repo_url=repo_url,
+            files=[(clean_path(entry[0]), *entry[1:]) for entry in files_to_save or []]
         )
-        scan_id = cursor.fetchone()[0]
-        conn.commit()
-
-        # Save file contents if provided
-        if files_to_save:
-            save_file_contents(scan_id, files_to_save, input_type)
-
         logger.info(f"Scan history saved for user_id {user_id} with scan_id {scan_id}")
         return scan_id
     except Exception as e:
         logger.error(f"Failed to save scan history: {str(e)}")
-        conn.rollback()
         raise
+
+
+def _semgrep_content(user_id, semgrep_endpoint, content, extension, progress=None):
+    """Send raw code content to Semgrep; returns (payload, status)."""
+    # Prepare form data for Semgrep endpoint
+    form_data = {
+        "input_type": "file",
+        "content": content,
+        "extension": extension
+    }
+
+    # Send as multipart/form-data
+    report_progress(progress, "scanning", 0, 1)
+    response = requests.post(
+        semgrep_endpoint,
+        data=form_data
+    )
+
+    if response.status_code != 200:
+        error_data = response.json()
+        raise Exception(error_data.get("error", "Failed to scan content"))
+
+    result = response.json()
+    # Store content with appropriate file extension
+    report_progress(progress, "saving")
+    files_to_save = [(f"input.{extension}", content)]
+    save_scan_history(user_id, result, input_type="content", files_to_save=files_to_save)
+
+    log_payload(logger, "Returning result for content input", result)
+    return result, 200
+
+
+def _semgrep_file(user_id, semgrep_endpoint, file_path, filename, progress=None):
+    """Send an uploaded file to Semgrep; returns (payload, status)."""
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            file_content = f.read()
+
+        # Prepare form data: separate fields and file
+        data = {
+            "input_type": "file" if not filename.endswith(".zip") else "zip"
+        }
+        files = {
+            "file": (filename, open(file_path, "rb"), "application/octet-stream")
+        }
+        report_progress(progress, "scanning", 0, 1)
+        response = requests.post(semgrep_endpoint, data=data, files=files)
+
+        # Close the file after the request
+        files["file"][1].close()
+
+        if response.status_code != 200:
+            error_data = response.json()
+            raise Exception(error_data.get("error", "Failed to scan file"))
+
+        result = response.json()
+        report_progress(progress, "saving")
+        files_to_save = [(filename, file_content)]
+        save_scan_history(user_id, result, input_type="file", files_to_save=files_to_save)
+
+        log_payload(logger, "Returning result for file input", result)
+        return result, 200
+    finally:
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        except PermissionError as e:
+            logger.warning(f"Could not delete {file_path}: {str(e)}. File may still be in use.")
+        except Exception as e:
+            logger.error(f"Failed to delete {file_path}: {str(e)}")
+
+
+def _semgrep_zip(user_id, semgrep_endpoint, temp_dir, zip_path, filename, progress=None):
+    """Send an uploaded ZIP saved in temp_dir to Semgrep; returns (payload, status)."""
+    try:
+        # Semgrep scans the uploaded archive itself; only read back the source files to store
+        report_progress(progress, "extracting")
+        files_to_save = []
+        for entry in ingest_zip(zip_path, is_semgrep_file):
+            if entry["content"] is None:
+                logger.warning(f"Skipping non-text file {entry['path']}")
+                continue
+            files_to_save.append((entry["path"], entry["content"], entry["sha256"]))
+
+        data = {"input_type": "zip"}
+        files = {"file": (filename, open(zip_path, "rb"), "application/zip")}
+        report_progress(progress, "scanning", 0, len(files_to_save))
+        response = requests.post(semgrep_endpoint, data=data, files=files)
+
+        files["file"][1].close()
+
+        if response.status_code != 200:
+            error_data = response.json()
+            raise Exception(error_data.get("error", "Failed to scan zip"))
+
+        result = response.json()
+        report_progress(progress, "saving")
+        save_scan_history(user_id, result, input_type="zip", files_to_save=files_to_save)
+
+        log_payload(logger, "Returning result for zip input", result)
+        return result, 200
+    except zipfile.BadZipFile:
+        return {"error": "Invalid ZIP file"}, 400
+    except ZipLimitError as e:
+        logger.warning(f"Rejected ZIP upload: {str(e)}")
+        return {"error": "ZIP file exceeds the allowed size or member count"}, 400
     finally:
-        cursor.close()
-        conn.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def _semgrep_repo(user_id, semgrep_endpoint, repo_url, progress=None):
+    """Ask Semgrep to clone and scan a repository; returns (payload, status)."""
+    form_data = {
+        "input_type": "repo",
+        "repo_url": repo_url
+    }
+    report_progress(progress, "scanning")
+    response = requests.post(semgrep_endpoint, data=form_data)
+
+    if response.status_code != 200:
+        error_data = response.json()
+        raise Exception(error_data.get("error", "Failed to scan repository"))
+
+    result = response.json()
+    report_progress(progress, "saving")
+    save_scan_history(user_id, result, input_type="repo", repo_url=repo_url)
+
+    log_payload(logger, "Returning result for repo input", result)
+    return result, 200
+
+
+def _stream_semgrep_repo(user_id, semgrep_endpoint, repo_url):
+    """Yield (event, data) pairs for a repo scan: per-file findings, then a summary.
+
+    The Semgrep service answers with one report, so files are emitted as soon
+    as that report arrives rather than one by one during the scan.
+    """
+    try:
+        yield "start", {"repo_url": repo_url}
+        response = requests.post(semgrep_endpoint, data={"input_type": "repo", "repo_url": repo_url})
+        if response.status_code != 200:
+            yield "error", {"error": response.json().get("error", "Failed to scan repository")}
+            return
+
+        result = response.json()
+        results = result.get("results", {})
+        by_file = {}
+        for key in ("failed_checks", "passed_checks"):
+            for check in results.get(key, []):
+                file_checks = by_file.setdefault(clean_path(check.get("file_path") or ""), {"failed_checks": [], "passed_checks": []})
+                file_checks[key].append(check)
+
+        for done, (file_path, checks) in enumerate(by_file.items(), 1):
+            yield "file", {
+                "file_path": file_path,
+                "done": done,
+                "total": len(by_file),
+                "results": {
+                    **checks,
+                    "summary": {"passed": len(checks["passed_checks"]), "failed": len(checks["failed_checks"])}
+                }
+            }
+
+        scan_id = save_scan_history(user_id, result, input_type="repo", repo_url=repo_url)
+        summary = {k: v for k, v in result["results"].items() if k not in ("passed_checks", "failed_checks")}
+        yield "summary", {"scan_id": scan_id, "results": summary}
+    except Exception as e:
+        logger.error(f"Streaming Semgrep scan failed for {repo_url}: {str(e)}")
+        yield "error", {"error": str(e)}
+
+
+def _dispatch(user_id, func, *args, cleanup=None, **kwargs):
+    """Run a scan in the request, or as a background job when async is requested.
+
+    Either way the scan waits for a slot from the scan scheduler. cleanup()
+    removes the scan's input files if the scan is refused or times out.
+    """
+    if str(request.form.get("async")).lower() in ("1", "true", "yes"):
+        job_id = scan_jobs.submit(user_id, "semgrep", func, user_id, *args, cleanup=cleanup, **kwargs)
+        return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}), 202
+    payload, status = run_scheduled(user_id, func, user_id, *args, cleanup=cleanup, **kwargs)
+    return jsonify(render_result(payload)), status
 
 
 @semgrep_bp.route("/semgrep", methods=["POST"])
@@ -137,6 +268,8 @@ def validate():
     if not user_id:
         return jsonify({"error": "user_id is required"}), 400
 
+    # Refuse before anything is written to disk when the scan queues are full
+    scan_scheduler.check_admission(user_id)
     SEMGREP_ENDPOINT = "http://" +os.getenv("MACHINE_IP")+":5000/scan"
 
     if input_type == "file":
@@ -148,70 +281,17 @@ def validate():
             if not content.strip():
                 return jsonify({"error": "Content cannot be empty"}), 400
 
-            # Prepare form data for Semgrep endpoint
-            form_data = {
-                "input_type": "file",
-                "content": content,
-                "extension": extension
-            }
-
-            # Send as multipart/form-data
-            response = requests.post(
-                SEMGREP_ENDPOINT,
-                data=form_data
-            )
-
-            if response.status_code != 200:
-                error_data = response.json()
-                raise Exception(error_data.get("error", "Failed to scan content"))
-
-            result = response.json()
-            # Store content with appropriate file extension
-            files_to_save = [(f"input.{extension}", content)]
-            save_scan_history(user_id, result, input_type="content", files_to_save=files_to_save)
-
-            logger.debug(f"Returning result for content input: {json.dumps(result, indent=2)[:500]}...")
-            return jsonify(result)
+            return _dispatch(user_id, _semgrep_content, SEMGREP_ENDPOINT, content, extension)
 
         elif "file" in request.files:
             # Handle file upload
             file = request.files["file"]
             file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-            try:
-                file.save(file_path)
-                with open(file_path, "r", encoding="utf-8") as f:
-                    file_content = f.read()
-
-                # Prepare form data: separate fields and file
-                data = {
-                    "input_type": "file" if not file.filename.endswith(".zip") else "zip"
-                }
-                files = {
-                    "file": (file.filename, open(file_path, "rb"), "application/octet-stream")
-                }
-                response = requests.post(SEMGREP_ENDPOINT, data=data, files=files)
-
-                # Close the file after the request
-                files["file"][1].close()
-
-                if response.status_code != 200:
-                    error_data = response.json()
-                    raise Exception(error_data.get("error", "Failed to scan file"))
-
-                result = response.json()
-                files_to_save = [(file.filename, file_content)]
-                save_scan_history(user_id, result, input_type="file", files_to_save=files_to_save)
-
-                logger.debug(f"Returning result for file input: {json.dumps(result, indent=2)[:500]}...")
-                return jsonify(result)
-            finally:
-                try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                except PermissionError as e:
-                    logger.warning(f"Could not delete {file_path}: {str(e)}. File may still be in use.")
-                except Exception as e:
-                    logger.error(f"Failed to delete {file_path}: {str(e)}")
+            file.save(file_path)
+            return _dispatch(
+                user_id, _semgrep_file, SEMGREP_ENDPOINT, file_path, file.filename,
+                cleanup=partial(discard_path, file_path)
+            )
 
         else:
             return jsonify({"error": "No file or content provided"}), 400
@@ -220,64 +300,33 @@ def validate():
         file = request.files["file"]
         temp_dir = tempfile.mkdtemp()
         zip_path = os.path.join(temp_dir, file.filename)
-        try:
-            file.save(zip_path)
-            extract_dir = os.path.join(temp_dir, "extracted")
-            os.makedirs(extract_dir)
-            with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                zip_ref.extractall(extract_dir)
-
-            files_to_save = []
-            for root, _, files in os.walk(extract_dir):
-                for file_name in files:
-                    file_path = os.path.join(root, file_name)
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            content = f.read()
-                        files_to_save.append((file_path, content))
-                    except UnicodeDecodeError:
-                        logger.warning(f"Skipping non-text file {file_path}")
-                        continue
-
-            data = {"input_type": "zip"}
-            files = {"file": (file.filename, open(zip_path, "rb"), "application/zip")}
-            response = requests.post(SEMGREP_ENDPOINT, data=data, files=files)
-
-            files["file"][1].close()
-
-            if response.status_code != 200:
-                error_data = response.json()
-                raise Exception(error_data.get("error", "Failed to scan zip"))
-
-            result = response.json()
-            save_scan_history(user_id, result, input_type="zip", files_to_save=files_to_save)
-
-            logger.debug(f"Returning result for zip input: {json.dumps(result, indent=2)[:500]}...")
-            return jsonify(result)
-        except zipfile.BadZipFile:
-            return jsonify({"error": "Invalid ZIP file"}), 400
-        finally:
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        file.save(zip_path)
+        return _dispatch(
+            user_id, _semgrep_zip, SEMGREP_ENDPOINT, temp_dir, zip_path, file.filename,
+            cleanup=partial(discard_path, temp_dir)
+        )
 
     elif input_type == "repo":
         repo_url = request.form.get("repo_url")
         if not repo_url:
             return jsonify({"error": "repo_url is required"}), 400
 
-        form_data = {
-            "input_type": "repo",
-            "repo_url": repo_url
-        }
-        response = requests.post(SEMGREP_ENDPOINT, data=form_data)
+        return _dispatch(user_id, _semgrep_repo, SEMGREP_ENDPOINT, repo_url)
 
-        if response.status_code != 200:
-            error_data = response.json()
-            raise Exception(error_data.get("error", "Failed to scan repository"))
+    return jsonify({"error": "Invalid input type. Use 'file', 'zip', 'repo'"}), 400
 
-        result = response.json()
-        save_scan_history(user_id, result, input_type="repo", repo_url=repo_url)
 
-        logger.debug(f"Returning result for repo input: {json.dumps(result, indent=2)[:500]}...")
-        return jsonify(result)
+@semgrep_bp.route("/semgrep/stream", methods=["POST"])
+def validate_stream():
+    """Streaming variant of the /semgrep repo path (SSE or NDJSON)."""
+    user_id = request.headers.get("X-User-ID")
+    if not user_id:
+        return jsonify({"error": "user_id is required"}), 400
+
+    repo_url = request.form.get("repo_url")
+    if not repo_url:
+        return jsonify({"error": "repo_url is required"}), 400
 
-    return jsonify({"error": "Invalid input type. Use 'file', 'zip', 'repo'"}), 400
\ No newline at end of file
+    scan_scheduler.check_admission(user_id)
+    SEMGREP_ENDPOINT = "http://" + os.getenv("MACHINE_IP") + ":5000/scan"
+    return event_stream_response(scheduled_events(user_id, _stream_semgrep_repo(user_id, SEMGREP_ENDPOINT, repo_url)))
@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
-from utils.db import get_db_connection
+from utils.db import db_connection, DatabaseUnavailable
 import re
 from datetime import datetime, timedelta, timezone
 
@@ -31,31 +31,26 @@ def register():
     name = name.strip()
     hashed_password = bcrypt.generate_password_hash(password).decode("utf-8")
 
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({"error": "Impossible de se connecter à la base de données"}), 500
-
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM users_test WHERE email = %s OR name = %s", (email, name))
-            if cur.fetchone():
-                return jsonify({"error": "Un compte avec cet email existe déjà"}), 409
-
-            cur.execute(
-                "INSERT INTO users_test (name, email, password) VALUES (%s, %s, %s) RETURNING id",
-                (name, email, hashed_password)
-            )
-            user_id = cur.fetchone()[0]
-            conn.commit()
-            return jsonify({"message": "Inscription réussie", "user_id": user_id}), 201
-
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id FROM users_test WHERE email = %s OR name = %s", (email, name))
+                if cur.fetchone():
+                    return jsonify({"error": "Un compte avec cet email existe déjà"}), 409
+
+                cur.execute(
+                    "INSERT INTO users_test (name, email, password) VALUES (%s, %s, %s) RETURNING id",
+                    (name, email, hashed_password)
+                )
+                user_id = cur.fetchone()[0]
+                conn.commit()
+                return jsonify({"message": "Inscription réussie", "user_id": user_id}), 201
+    except DatabaseUnavailable:
+        return jsonify({"error": "Impossible de se connecter à la base de données"}), 500
     except Exception as e:
         print("❌ Erreur lors de l'inscription :", e)
         return jsonify({"error": "Erreur lors de l'inscription"}), 500
 
-    finally:
-        conn.close()
-
 @user_bp.route("/login", methods=["POST"])
 def login():
     ip = request.remote_addr
@@ -81,40 +76,35 @@ def login():
     if len(password) < 5:
         return jsonify({"error": "Le mot de passe doit contenir au moins 6 caractères."}), 400
 
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({"error": "Erreur de connexion à la base de données"}), 500
-
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, name, email, password FROM users_test WHERE email = %s", (email,))
-            user = cur.fetchone()
-
-            if user and bcrypt.check_password_hash(user[3], password):
-                login_attempts[ip] = {"count": 0, "last_attempt": None, "blocked_until": None}
-                access_token = create_access_token(identity=str(user[0]))
-                refresh_token = create_refresh_token(identity=str(user[0]))
-                return jsonify({
-                    "message": "Connexion réussie",
-                    "access_token": access_token,
-                    "refresh_token": refresh_token,
-                    "user": {"id": user[0], "name": user[1], "email": user[2]}
-                })
-            else:
-                attempt["count"] += 1
-                attempt["last_attempt"] = now
-                if attempt["count"] >= MAX_ATTEMPTS:
-                    attempt["blocked_until"] = now + BLOCK_DURATION
-                    return jsonify({"error": "Trop de tentatives. Compte bloqué temporairement."}), 429
-                return jsonify({"error": "Identifiants incorrects"}), 401
-
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id, name, email, password FROM users_test WHERE email = %s", (email,))
+                user = cur.fetchone()
+
+                if user and bcrypt.check_password_hash(user[3], password):
+                    login_attempts[ip] = {"count": 0, "last_attempt": None, "blocked_until": None}
+                    access_token = create_access_token(identity=str(user[0]))
+                    refresh_token = create_refresh_token(identity=str(user[0]))
+                    return jsonify({
+                        "message": "Connexion réussie",
+                        "access_token": access_token,
+                        "refresh_token": refresh_token,
+                        "user": {"id": user[0], "name": user[1], "email": user[2]}
+                    })
+                else:
+                    attempt["count"] += 1
+                    attempt["last_attempt"] = now
+                    if attempt["count"] >= MAX_ATTEMPTS:
+                        attempt["blocked_until"] = now + BLOCK_DURATION
+                        return jsonify({"error": "Trop de tentatives. Compte bloqué temporairement."}), 429
+                    return jsonify({"error": "Identifiants incorrects"}), 401
+    except DatabaseUnavailable:
+        return jsonify({"error": "Erreur de connexion à la base de données"}), 500
     except Exception as e:
         print("❌ Erreur lors de la connexion :", e)
         return jsonify({"error": "Erreur interne"}), 500
 
-    finally:
-        conn.close()
-
 @user_bp.route("/set-password", methods=["POST"])
 @jwt_required()
 def set_password():
@@ -130,25 +120,22 @@ def set_password():
 
     hashed_password = bcrypt.generate_password_hash(password).decode("utf-8")
 
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({"error": "Erreur de connexion à la base de données"}), 500
-
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                "UPDATE users_test SET password = %s WHERE id = %s",
-                (hashed_password, user_id)
-            )
-            if cur.rowcount == 0:
-                return jsonify({"error": "Utilisateur non trouvé"}), 404
-            conn.commit()
-            return jsonify({"message": "Mot de passe défini avec succès"}), 200
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE users_test SET password = %s WHERE id = %s",
+                    (hashed_password, user_id)
+                )
+                if cur.rowcount == 0:
+                    return jsonify({"error": "Utilisateur non trouvé"}), 404
+                conn.commit()
+                return jsonify({"message": "Mot de passe défini avec succès"}), 200
+    except DatabaseUnavailable:
+        return jsonify({"error": "Erreur de connexion à la base de données"}), 500
     except Exception as e:
         print("❌ Erreur lors de la définition du mot de passe :", e)
         return jsonify({"error": "Erreur lors de la définition du mot de passe"}), 500
-    finally:
-        conn.close()
 
 @user_bp.route("/refresh", methods=["POST"])
 @jwt_required(refresh=True)
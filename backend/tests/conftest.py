@@ -0,0 +1,69 @@
+"""Shared fixtures for the backend tests.
+
+Tests that need PostgreSQL use the migrated fixture: it runs against a
+throwaway database named by TEST_DATABASE_URL, for example
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/plancheck python -m pytest tests
+
+and skips when it is not set. Without a PostgreSQL server at hand, pgserver
+(requirements-dev.txt) runs one from a data directory:
+
+    python -c "import pgserver; print(pgserver.get_server('/tmp/pgdata', cleanup_mode=None).get_uri('plancheck'))"
+"""
+import os
+
+import pytest
+from psycopg2.extensions import parse_dsn
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture(scope="session")
+def migrated():
+    """Point utils.db at the test database and bring it to the latest schema."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    settings = parse_dsn(TEST_DATABASE_URL)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        for name, key in (("DB_NAME", "dbname"), ("DB_USER", "user"), ("DB_PASSWORD", "password"),
+                          ("DB_HOST", "host"), ("DB_PORT", "port")):
+            if key in settings:
+                monkeypatch.setenv(name, settings[key])
+            else:
+                monkeypatch.delenv(name, raising=False)
+
+        from utils import migrations
+        migrations.upgrade()
+        yield migrations
+
+
+@pytest.fixture
+def checkov(monkeypatch):
+    """routes.checkov with a memory-only scan cache, no worker pool and a fixed Checkov binary.
+
+    Tests replace subprocess.run on the module to play Checkov's part.
+    """
+    pytest.importorskip("google.generativeai")
+    monkeypatch.setenv("GEMINI_API_KEY", os.getenv("GEMINI_API_KEY", "test"))
+    from routes import checkov
+    from utils.scan_cache import ScanResultCache
+
+    cache = ScanResultCache(64, 0)
+    monkeypatch.setattr(cache, "_db_get", lambda key: None)
+    monkeypatch.setattr(cache, "_db_set", lambda key, entry: None)
+    monkeypatch.setattr(checkov, "scan_cache", cache)
+    monkeypatch.setattr(checkov.checkov_pool, "enabled", lambda: False)
+    monkeypatch.setattr(checkov, "get_checkov_path", lambda: "/opt/checkov/bin/checkov")
+    monkeypatch.setattr(checkov, "get_checkov_version", lambda: "3.0.0")
+    return checkov
+
+
+@pytest.fixture
+def tf_tree(tmp_path):
+    """A directory holding two Terraform files; returns (root, [paths])."""
+    files = []
+    for name in ("a.tf", "b.tf"):
+        path = tmp_path / name
+        path.write_text(f'resource "aws_s3_bucket" "{name[0]}" {{}}\n')
+        files.append(str(path))
+    return str(tmp_path), files
@@ -0,0 +1,120 @@
+"""Batched Checkov directory scans (CHECKOV_SCAN_MODE=batch)."""
+import json
+import subprocess
+
+
+def check(file_path, check_id, result):
+    return {
+        "check_id": check_id,
+        "check_name": f"{check_id} name",
+        "file_path": "/" + file_path.rsplit("/", 1)[-1],
+        "file_abs_path": file_path,
+        "file_line_range": [1, 1],
+        "resource": "aws_s3_bucket.a",
+        "severity": None,
+        "check_result": {"result": result},
+    }
+
+
+def report(failed=(), passed=()):
+    return json.dumps({"check_type": "terraform", "results": {"failed_checks": list(failed), "passed_checks": list(passed)}})
+
+
+class FakeCheckov:
+    """Stands in for subprocess.run: batched runs (several targets or -d) and single-file runs."""
+
+    def __init__(self, batch, single=None):
+        self.batch = batch
+        self.single = single or {}
+        self.commands = []
+
+    def __call__(self, cmd, **kwargs):
+        self.commands.append(cmd)
+        if "-d" in cmd or cmd.count("-f") > 1:
+            returncode, stdout = self.batch
+        else:
+            returncode, stdout = self.single.get(cmd[cmd.index("-f") + 1], (0, report()))
+        return subprocess.CompletedProcess(cmd, returncode, stdout=stdout, stderr="")
+
+
+def test_batch_splits_the_report_per_file(checkov, monkeypatch, tf_tree):
+    root, (a, b) = tf_tree
+    fake = FakeCheckov((1, report(failed=[check(a, "CKV_AWS_1", "FAILED")], passed=[check(b, "CKV_AWS_2", "PASSED")])))
+    monkeypatch.setattr(checkov.subprocess, "run", fake)
+
+    result_a, result_b = checkov.run_checkov_batched(root, [a, b])
+
+    assert len(fake.commands) == 1
+    assert [c["check_id"] for c in result_a["results"]["failed_checks"]] == ["CKV_AWS_1"]
+    assert [c["check_id"] for c in result_b["results"]["passed_checks"]] == ["CKV_AWS_2"]
+    assert checkov.scan_cache.snapshot()["memory_entries"] == 2
+
+
+def test_empty_batch_output_is_a_failure_and_is_not_cached(checkov, monkeypatch, tf_tree):
+    root, (a, b) = tf_tree
+    fake = FakeCheckov((0, ""), single={a: (0, ""), b: (0, "")})
+    monkeypatch.setattr(checkov.subprocess, "run", fake)
+
+    results = checkov.run_checkov_batched(root, [a, b])
+
+    # One batched run, then each file on its own
+    assert len(fake.commands) == 3
+    assert [r["results"]["status"] for r in results] == ["no_output", "no_output"]
+    assert checkov.scan_cache.snapshot()["memory_entries"] == 0
+
+
+def test_crashed_batch_falls_back_to_single_file_scans(checkov, monkeypatch, tf_tree):
+    root, (a, b) = tf_tree
+    fake = FakeCheckov(
+        (2, "Traceback (most recent call last):\n  ..."),
+        single={a: (1, report(failed=[check(a, "CKV_AWS_1", "FAILED")])), b: (0, report(passed=[check(b, "CKV_AWS_2", "PASSED")]))},
+    )
+    monkeypatch.setattr(checkov.subprocess, "run", fake)
+
+    result_a, result_b = checkov.run_checkov_batched(root, [a, b])
+
+    assert result_a["results"]["summary"] == {"passed": 0, "failed": 1}
+    assert result_b["results"]["summary"] == {"passed": 1, "failed": 0}
+    # Only the successful single-file scans were cached
+    assert checkov.scan_cache.snapshot()["memory_entries"] == 2
+    monkeypatch.setattr(checkov.subprocess, "run", FakeCheckov((0, "")))
+    assert checkov.run_checkov_batched(root, [a, b])[0]["results"]["summary"] == {"passed": 0, "failed": 1}
+
+
+def test_whole_tree_is_scanned_with_one_directory_run(checkov, monkeypatch, tf_tree):
+    root, files = tf_tree
+    fake = FakeCheckov((0, report()))
+    monkeypatch.setattr(checkov.subprocess, "run", fake)
+
+    checkov.run_checkov_batched(root, files)
+
+    (cmd,) = fake.commands
+    assert cmd[cmd.index("-d") + 1] == root
+
+
+def test_subset_of_the_tree_names_its_files(checkov, monkeypatch, tf_tree):
+    root, (a, b) = tf_tree
+    fake = FakeCheckov((0, report()), single={a: (0, report(failed=[check(a, "CKV_AWS_1", "FAILED")]))})
+    monkeypatch.setattr(checkov.subprocess, "run", fake)
+
+    # An incremental rescan of a single changed file
+    result = checkov.run_checkov_on_dir(root, mode="batch", enrich=False, files=[a])
+
+    (cmd,) = fake.commands
+    assert "-d" not in cmd
+    assert cmd[cmd.index("-f") + 1] == a
+    assert result["results"]["files_found"] == [checkov.clean_path(a)]
+
+
+def test_cached_files_are_left_out_of_the_batch(checkov, monkeypatch, tf_tree):
+    root, (a, b) = tf_tree
+    monkeypatch.setattr(checkov.subprocess, "run", FakeCheckov((0, report())))
+    checkov.scan_single_file(a)
+    fake = FakeCheckov((0, report()))
+    monkeypatch.setattr(checkov.subprocess, "run", fake)
+
+    checkov.run_checkov_batched(root, [a, b])
+
+    (cmd,) = fake.commands
+    assert "-d" not in cmd
+    assert cmd[cmd.index("-f") + 1] == b
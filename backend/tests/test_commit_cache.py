@@ -0,0 +1,93 @@
+"""Reuse of /scan results by commit (repo_scan_cache).
+
+Needs a throwaway PostgreSQL database (see conftest.py); skipped otherwise.
+"""
+import json
+import subprocess
+
+import pytest
+
+USER = "990014"
+REPO = "https://github.com/acme/infra"
+
+
+@pytest.fixture
+def commit_cache(migrated):
+    from utils import commit_cache
+    from utils.db import db_cursor
+
+    def clear():
+        with db_cursor(commit=True) as cursor:
+            cursor.execute("DELETE FROM repo_scan_cache WHERE user_id = %s", (USER,))
+    clear()
+    yield commit_cache
+    clear()
+
+
+def history_rows():
+    from utils.db import db_cursor
+
+    with db_cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM scan_history WHERE user_id = %s", (USER,))
+        return cursor.fetchone()[0]
+
+
+def test_payload_is_reused_for_the_same_commit_and_scanner_only(commit_cache):
+    payload = {"status": "failed", "exit_code": 1, "findings": [{"check_id": "python.lang.eval"}]}
+    commit_cache.cache_repo_scan(USER, REPO, "abc123", "semgrep 1.0", payload)
+
+    assert commit_cache.cached_repo_scan(USER, REPO, "abc123", "semgrep 1.0") == payload
+    assert commit_cache.cached_repo_scan(USER, REPO, "def456", "semgrep 1.0") is None
+    assert commit_cache.cached_repo_scan(USER, REPO, "abc123", "semgrep 1.1") is None
+    assert commit_cache.cached_repo_scan("someone-else", REPO, "abc123", "semgrep 1.0") is None
+
+
+def test_rescan_replaces_the_payload(commit_cache):
+    commit_cache.cache_repo_scan(USER, REPO, "abc123", "semgrep 1.0", {"status": "failed", "findings": [1]})
+    commit_cache.cache_repo_scan(USER, REPO, "abc123", "semgrep 1.0", {"status": "success", "findings": []})
+
+    assert commit_cache.cached_repo_scan(USER, REPO, "abc123", "semgrep 1.0")["status"] == "success"
+
+
+def test_old_payloads_are_not_reused(commit_cache, monkeypatch):
+    commit_cache.cache_repo_scan(USER, REPO, "abc123", "semgrep 1.0", {"status": "success", "findings": []})
+    monkeypatch.setattr(commit_cache, "COMMIT_CACHE_MAX_AGE", 0)
+
+    assert commit_cache.cached_repo_scan(USER, REPO, "abc123", "semgrep 1.0") is None
+
+
+def test_scan_route_answers_an_unchanged_head_without_writing_history(commit_cache, monkeypatch):
+    pytest.importorskip("flask_jwt_extended")
+    from flask import Flask
+    from flask_jwt_extended import JWTManager, create_access_token
+    from routes import scan_routes
+
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = "test-secret-key-of-at-least-32-bytes"
+    JWTManager(app)
+    app.register_blueprint(scan_routes.scan_bp, url_prefix="/")
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity=USER)}"}
+
+    semgrep_runs = []
+
+    def semgrep(cmd, **kwargs):
+        semgrep_runs.append(cmd)
+        return subprocess.CompletedProcess(cmd, 1, stdout=json.dumps({"results": [{"check_id": "python.lang.eval"}]}), stderr="")
+
+    monkeypatch.setattr(scan_routes, "_semgrep_version", "1.0")
+    monkeypatch.setattr(scan_routes, "remote_head", lambda repo_url: "abc123")
+    monkeypatch.setattr(scan_routes, "head_commit", lambda path: "abc123")
+    monkeypatch.setattr(scan_routes, "clone_repo", lambda repo_url, path: None)
+    monkeypatch.setattr(scan_routes.subprocess, "run", semgrep)
+    before = history_rows()
+
+    with app.test_client() as client:
+        first = client.post("/scan", json={"repo_url": REPO}, headers=headers).get_json()
+        second = client.post("/scan", json={"repo_url": REPO}, headers=headers).get_json()
+
+    assert len(semgrep_runs) == 1
+    assert first["from_commit_cache"] is False and second["from_commit_cache"] is True
+    assert first["findings"] == second["findings"] == [{"check_id": "python.lang.eval"}]
+    assert "scan_id" not in second
+    assert history_rows() == before
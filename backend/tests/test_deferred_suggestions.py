@@ -0,0 +1,69 @@
+"""Suggestions of findings reused from, or carried forward from, a deferred scan."""
+
+
+def pending_check():
+    return {
+        "check_id": "CKV_AWS_18",
+        "check_name": "Ensure access logging is enabled",
+        "file_path": "/tmp/repo/main.tf",
+        "file_line_range": [1, 4],
+        "resource": "aws_s3_bucket.logs",
+        "severity": None,
+        "suggestion": None,
+        "suggestion_status": "pending",
+    }
+
+
+def scan_result(*failed):
+    return {"results": {"status": "completed", "failed_checks": list(failed), "passed_checks": []}}
+
+
+class Executor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, func, *args):
+        self.submitted.append((func, args))
+
+
+def test_carried_forward_pending_findings_are_resolved_without_defer(checkov, monkeypatch):
+    def enrich(checks):
+        for check in checks:
+            check["suggestion"] = "enable access logging"
+
+    saved = []
+    monkeypatch.setattr(checkov, "enrich_suggestions", enrich)
+    monkeypatch.setattr(checkov, "save_scan_history", lambda user_id, result, *args, **kwargs: saved.append(result) or 7)
+    result = scan_result(pending_check())
+
+    checkov.save_checkov_scan("1", result, "repo", defer=False)
+
+    (check,) = saved[0]["results"]["failed_checks"]
+    assert check["suggestion"] == "enable access logging"
+    assert check["suggestion_status"] == "ready"
+
+
+def test_reused_scan_with_pending_suggestions_is_queued_for_the_copy(checkov, monkeypatch):
+    executor = Executor()
+    monkeypatch.setattr(checkov, "_suggestion_executor", executor)
+    monkeypatch.setattr(checkov, "remote_head", lambda repo_url: "abc123")
+    monkeypatch.setattr(checkov, "reuse_scan", lambda *args: (42, scan_result(pending_check())))
+
+    result = checkov._reuse_repo_scan("1", "https://github.com/acme/infra")
+
+    assert result["scan_id"] == 42
+    ((func, (scan_id, queued)),) = executor.submitted
+    assert func is checkov.complete_deferred_suggestions
+    assert scan_id == 42
+    assert "from_commit_cache" not in queued["results"]
+
+
+def test_reused_scan_with_ready_suggestions_queues_nothing(checkov, monkeypatch):
+    executor = Executor()
+    ready = {**pending_check(), "suggestion": "enable access logging", "suggestion_status": "ready"}
+    monkeypatch.setattr(checkov, "_suggestion_executor", executor)
+    monkeypatch.setattr(checkov, "remote_head", lambda repo_url: "abc123")
+    monkeypatch.setattr(checkov, "reuse_scan", lambda *args: (42, scan_result(ready)))
+
+    assert checkov._reuse_repo_scan("1", "https://github.com/acme/infra")["results"]["from_commit_cache"]
+    assert executor.submitted == []
@@ -0,0 +1,14 @@
+"""Migrations apply cleanly and the hot queries plan index scans.
+
+Needs a throwaway PostgreSQL database (see conftest.py); skipped otherwise.
+"""
+
+
+def test_upgrade_is_idempotent(migrated):
+    assert migrated.upgrade() == []
+    assert all(state == "applied" for _, _, state in migrated.status())
+
+
+def test_hot_queries_do_not_seq_scan(migrated):
+    seq_scans = {name: tables for name, tables in migrated.check_plans().items() if tables}
+    assert seq_scans == {}
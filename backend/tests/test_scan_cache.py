@@ -0,0 +1,76 @@
+"""Content-addressed cache of per-file Checkov results."""
+import json
+import subprocess
+
+from utils.scan_cache import ScanResultCache, content_hash, scan_cache_key
+
+
+def checkov_run(returncode, stdout, calls):
+    def run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, returncode, stdout=stdout, stderr="")
+    return run
+
+
+def failed_report(resource="aws_s3_bucket.a"):
+    return json.dumps({"results": {"failed_checks": [{
+        "check_id": "CKV_AWS_18",
+        "check_name": "Ensure access logging is enabled",
+        "file_line_range": [1, 1],
+        "resource": resource,
+        "severity": None,
+    }], "passed_checks": []}})
+
+
+def write(path, text='resource "aws_s3_bucket" "a" {}\n'):
+    path.write_text(text)
+    return str(path)
+
+
+def test_entries_drop_per_scan_fields():
+    cache = ScanResultCache(8, 0)
+    cache._db_set = lambda key, entry: None
+    cache.set("k", [{"check_id": "CKV_1", "file_path": "/tmp/x/main.tf", "suggestion": "s",
+                     "suggestion_status": "ready", "finding_id": 3}],
+              [{"check_id": "CKV_2", "file_path": "/tmp/x/main.tf"}])
+
+    assert cache.get("k") == {"failed_checks": [{"check_id": "CKV_1"}], "passed_checks": [{"check_id": "CKV_2"}]}
+
+
+def test_key_changes_with_content_framework_and_version(tmp_path):
+    a = write(tmp_path / "a.tf")
+    b = write(tmp_path / "b.tf", 'resource "aws_s3_bucket" "b" {}\n')
+    base = scan_cache_key(content_hash(a), "terraform", "3.0.0")
+
+    assert scan_cache_key(content_hash(write(tmp_path / "copy.tf")), "terraform", "3.0.0") == base
+    assert scan_cache_key(content_hash(b), "terraform", "3.0.0") != base
+    assert scan_cache_key(content_hash(a), "cloudformation", "3.0.0") != base
+    assert scan_cache_key(content_hash(a), "terraform", "3.0.1") != base
+
+
+def test_identical_file_is_scanned_once_and_reported_at_its_own_path(checkov, monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(checkov.subprocess, "run", checkov_run(1, failed_report(), calls))
+    first = checkov.scan_single_file(write(tmp_path / "a.tf"))
+    second = checkov.scan_single_file(write(tmp_path / "copy.tf"))
+
+    assert len(calls) == 1
+    assert first["results"]["summary"] == second["results"]["summary"] == {"passed": 0, "failed": 1}
+    assert second["results"]["failed_checks"][0]["file_path"].endswith("copy.tf")
+
+
+def test_failed_runs_are_not_cached(checkov, monkeypatch, tmp_path):
+    file_path = write(tmp_path / "a.tf")
+    calls = []
+    for returncode, stdout in ((0, ""), (2, "Traceback (most recent call last):")):
+        monkeypatch.setattr(checkov.subprocess, "run", checkov_run(returncode, stdout, calls))
+        assert checkov.scan_single_file(file_path)["results"]["status"] in ("no_output", "json_error")
+
+    def timeout(cmd, **kwargs):
+        raise subprocess.TimeoutExpired(cmd, 60)
+    monkeypatch.setattr(checkov.subprocess, "run", timeout)
+    assert checkov.scan_single_file(file_path)["results"]["status"] == "timeout"
+
+    assert checkov.scan_cache.snapshot()["memory_entries"] == 0
+    monkeypatch.setattr(checkov.subprocess, "run", checkov_run(1, failed_report(), calls))
+    assert checkov.scan_single_file(file_path)["results"]["summary"]["failed"] == 1
@@ -0,0 +1,66 @@
+"""One-transaction scan writes (utils.scan_store).
+
+Needs a throwaway PostgreSQL database (see conftest.py); skipped otherwise.
+"""
+import pytest
+
+USER = "990021"
+RESULT = {
+    "status": "failed",
+    "results": {
+        "passed_checks": [],
+        "failed_checks": [{"check_id": "CKV_AWS_20", "file_path": "/main.tf", "resource": "aws_s3_bucket.logs"}],
+        "summary": {"passed": 0, "failed": 1},
+    },
+}
+FILES = [("main.tf", 'resource "aws_s3_bucket" "logs" {}\n')]
+
+
+def rows(cursor, table):
+    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE user_id = %s", (USER,))
+    return cursor.fetchone()[0]
+
+
+@pytest.fixture
+def scan_store(migrated):
+    from utils import scan_store
+    from utils.blob_store import release_scan_files
+    from utils.db import db_cursor
+
+    def clear():
+        with db_cursor(commit=True) as cursor:
+            cursor.execute("SELECT id FROM scan_history WHERE user_id = %s", (USER,))
+            for (scan_id,) in cursor.fetchall():
+                release_scan_files(cursor, scan_id)
+            for table in ("findings", "user_scan_stats", "scan_history"):
+                cursor.execute(f"DELETE FROM {table} WHERE user_id = %s", (USER,))
+    clear()
+    yield scan_store
+    clear()
+
+
+def test_scan_is_saved_with_its_files(scan_store):
+    from utils.blob_store import load_file_contents
+    from utils.db import db_cursor
+
+    scan_id = scan_store.save_scan(USER, "checkov", RESULT, "file", "failed", files=FILES)
+
+    with db_cursor() as cursor:
+        assert load_file_contents(cursor, scan_id) == FILES
+        assert rows(cursor, "findings") == 1
+
+
+def test_failed_file_insert_rolls_back_the_whole_scan(scan_store, monkeypatch):
+    from utils.db import db_cursor
+
+    def broken_store(cursor, contents, hashes=None):
+        cursor.execute("SELECT 1 / 0")
+    monkeypatch.setattr(scan_store, "store_blobs", broken_store)
+
+    with pytest.raises(Exception):
+        scan_store.save_scan(USER, "checkov", RESULT, "file", "failed", files=FILES)
+
+    with db_cursor() as cursor:
+        assert rows(cursor, "scan_history") == 0
+        assert rows(cursor, "findings") == 0
+        assert rows(cursor, "user_scan_stats") == 0
@@ -0,0 +1,70 @@
+"""Batched Gemini suggestions (enrich_suggestions / _suggest_batch)."""
+import json
+
+import pytest
+
+
+@pytest.fixture
+def gemini(checkov, monkeypatch):
+    """Record Gemini prompts; replies come from the list set on the returned object."""
+    from utils.suggestion_cache import SuggestionCache
+
+    cache = SuggestionCache(64, 3600, 0)
+    monkeypatch.setattr(cache, "_db_get", lambda key: None)
+    monkeypatch.setattr(cache, "_db_set", lambda key, suggestion: None)
+    monkeypatch.setattr(checkov, "suggestion_cache", cache)
+
+    class Gemini:
+        def __init__(self):
+            self.prompts = []
+            self.replies = []
+
+        def __call__(self, prompt, label, *args, **kwargs):
+            self.prompts.append(prompt)
+            return self.replies.pop(0) if self.replies else None
+
+    fake = Gemini()
+    monkeypatch.setattr(checkov, "_call_gemini", fake)
+    return fake
+
+
+def failed_check(file_path, resource="aws_s3_bucket.logs"):
+    return {
+        "check_id": "CKV_AWS_18",
+        "check_name": "Ensure access logging is enabled",
+        "file_path": file_path,
+        "file_line_range": [1, 4],
+        "resource": resource,
+        "severity": None,
+        "suggestion": None,
+    }
+
+
+def test_batch_ids_keep_the_framework_apart(checkov, gemini):
+    key_tf = ("CKV_AWS_18", "aws_s3_bucket", "terraform")
+    key_cf = ("CKV_AWS_18", "aws_s3_bucket", "cloudformation")
+    gemini.replies = [json.dumps({":".join(key_tf): "terraform advice", ":".join(key_cf): "cloudformation advice"})]
+
+    suggestions = checkov._suggest_batch([(key_tf, failed_check("/main.tf")), (key_cf, failed_check("/stack.yaml"))])
+
+    assert suggestions == {key_tf: "terraform advice", key_cf: "cloudformation advice"}
+    assert len(gemini.prompts) == 1
+
+
+def test_failed_batch_call_is_not_retried_check_by_check(checkov, gemini):
+    checks = [failed_check("/main.tf"), failed_check("/other.tf", resource="aws_instance.web")]
+
+    checkov.enrich_suggestions(checks)
+
+    assert len(gemini.prompts) == 1
+    assert all(c["suggestion"] == checkov.fallback_suggestion(c) for c in checks)
+
+
+def test_checks_missing_from_a_reply_are_asked_one_by_one(checkov, gemini):
+    checks = [failed_check("/main.tf"), failed_check("/other.tf", resource="aws_instance.web")]
+    gemini.replies = [json.dumps({"CKV_AWS_18:aws_s3_bucket:terraform": "bucket advice"}), "instance advice"]
+
+    checkov.enrich_suggestions(checks)
+
+    assert len(gemini.prompts) == 2
+    assert [c["suggestion"] for c in checks] == ["bucket advice", "instance advice"]
@@ -0,0 +1,68 @@
+"""Selective ZIP ingestion and the Checkov ZIP scan built on it."""
+import hashlib
+import json
+import subprocess
+import zipfile
+
+import pytest
+
+from utils.zip_ingest import ZipLimitError, ingest_zip
+
+TF = 'resource "aws_s3_bucket" "a" {}\n'
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+def test_manifest_holds_wanted_members_with_their_hash(tmp_path):
+    zip_path = make_zip(tmp_path / "in.zip", {"a/main.tf": TF, "README.md": "# doc", "../evil.tf": TF})
+
+    manifest = ingest_zip(zip_path, lambda name: name.endswith(".tf"), dest_dir=str(tmp_path / "out"))
+
+    (entry,) = manifest
+    assert entry["path"] == "a/main.tf"
+    assert entry["sha256"] == hashlib.sha256(TF.encode()).hexdigest()
+    assert entry["size"] == len(TF)
+    with open(entry["abs_path"]) as f:
+        assert f.read() == TF
+
+
+def test_decompressed_size_is_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.zip_ingest.ZIP_MAX_TOTAL_SIZE", 100)
+    zip_path = make_zip(tmp_path / "in.zip", {"a.tf": "x" * 80, "b.tf": "y" * 80})
+
+    with pytest.raises(ZipLimitError):
+        ingest_zip(zip_path, lambda name: True)
+
+
+def test_zip_scan_reuses_manifest_hashes_and_saves_files_under_finding_paths(checkov, monkeypatch, tmp_path):
+    zip_path = make_zip(tmp_path / "upload.zip", {"a/main.tf": TF})
+    temp_dir = tmp_path / "extract"
+    temp_dir.mkdir()
+    report = {"results": {"failed_checks": [{"check_id": "CKV_AWS_18", "check_name": "Logging",
+                                             "file_line_range": [1, 1], "resource": "aws_s3_bucket.a"}],
+                          "passed_checks": []}}
+    saved = {}
+
+    def save(user_id, result, input_type, defer=False, files_to_save=None, **kwargs):
+        saved.update(result=result, files=files_to_save)
+
+    def rehash(file_path):
+        raise AssertionError(f"{file_path} hashed again")
+
+    monkeypatch.setattr(checkov, "content_hash", rehash)
+    monkeypatch.setattr(checkov, "save_checkov_scan", save)
+    monkeypatch.setattr(checkov.subprocess, "run",
+                        lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 1, stdout=json.dumps(report), stderr=""))
+
+    result, status = checkov._scan_zip("1", str(temp_dir), zip_path, defer=True)
+
+    assert status == 200
+    ((file_path, content, digest),) = saved["files"]
+    assert file_path == result["results"]["failed_checks"][0]["file_path"]
+    assert file_path.endswith("a/main.tf")
+    assert (content, digest) == (TF, hashlib.sha256(TF.encode()).hexdigest())
@@ -0,0 +1,271 @@
+"""Content-addressed, compressed storage of scanned files.
+
+file_contents rows no longer carry the text of the file: they reference a
+row of file_blobs by the SHA-256 of the content. A blob is stored once,
+compressed with zstd when the zstandard package is installed (zlib
+otherwise), and counts the file_contents rows pointing at it. Reads go
+through load_file_contents(), which decompresses transparently and still
+understands rows written before the blob store (inline content).
+
+Maintenance commands:
+
+    python -m utils.blob_store migrate   # move inline content into blobs
+    python -m utils.blob_store gc        # fix refcounts, drop unreferenced blobs
+    python -m utils.blob_store report    # storage saved
+"""
+import hashlib
+import logging
+import os
+import sys
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zlib only
+    zstandard = None
+
+from psycopg2.extras import execute_values
+
+from utils.db import db_connection
+
+logger = logging.getLogger(__name__)
+
+BLOB_CODEC = os.getenv("BLOB_CODEC", "zstd" if zstandard else "zlib")
+BLOB_COMPRESSION_LEVEL = int(os.getenv("BLOB_COMPRESSION_LEVEL", "6"))
+# One INSERT of blobs carries at most this many compressed bytes
+BLOB_BATCH_BYTES = 8 * 1024 * 1024
+MIGRATE_BATCH_SIZE = 500
+
+FILE_CONTENTS_QUERY = """
+    SELECT fc.file_path, fc.content, b.codec, b.data
+    FROM file_contents fc
+    LEFT JOIN file_blobs b ON b.hash = fc.blob_hash
+    WHERE fc.scan_id = %s
+    ORDER BY fc.id
+"""
+
+def content_bytes(content):
+    if isinstance(content, bytes):
+        return content
+    return (content or "").encode("utf-8", errors="surrogateescape")
+
+
+def compress(raw):
+    """Return (codec, data), keeping raw bytes when compression does not pay off."""
+    if BLOB_CODEC == "zstd" and zstandard:
+        codec, data = "zstd", zstandard.ZstdCompressor(level=BLOB_COMPRESSION_LEVEL).compress(raw)
+    else:
+        codec, data = "zlib", zlib.compress(raw, BLOB_COMPRESSION_LEVEL)
+    return (codec, data) if len(data) < len(raw) else ("raw", raw)
+
+
+def decompress(codec, data):
+    data = bytes(data)
+    if codec == "zstd":
+        if not zstandard:
+            raise RuntimeError("file blob is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    return data
+
+
+def _byte_batches(rows, size_of):
+    batch, size = [], 0
+    for row in rows:
+        if batch and size + size_of(row) > BLOB_BATCH_BYTES:
+            yield batch
+            batch, size = [], 0
+        batch.append(row)
+        size += size_of(row)
+    if batch:
+        yield batch
+
+
+def store_blobs(cursor, contents, hashes=None):
+    """Store each content once and take one reference per item; returns the hashes, in order.
+
+    hashes optionally holds the SHA-256 of each content already known to the
+    caller (None where it is not). Only contents whose blob does not exist
+    yet are compressed. Blobs are locked and inserted in hash order, the same
+    for every writer, so scans sharing files cannot deadlock each other.
+    """
+    raws = [content_bytes(content) for content in contents]
+    hashes = [
+        known or hashlib.sha256(raw).hexdigest()
+        for raw, known in zip(raws, hashes or [None] * len(raws))
+    ]
+    refs = {}
+    for digest, raw in zip(hashes, raws):
+        count, _ = refs.get(digest, (0, raw))
+        refs[digest] = (count + 1, raw)
+    if not refs:
+        return hashes
+    refs = dict(sorted(refs.items()))
+
+    # Existing blobs only gain references
+    cursor.execute("SELECT hash FROM file_blobs WHERE hash = ANY(%s) ORDER BY hash FOR UPDATE", (list(refs),))
+    updated = execute_values(
+        cursor,
+        """
+        UPDATE file_blobs b SET refcount = b.refcount + v.refs
+        FROM (VALUES %s) AS v (hash, refs)
+        WHERE b.hash = v.hash
+        RETURNING b.hash
+        """,
+        [(digest, count) for digest, (count, _) in refs.items()],
+        fetch=True
+    )
+    existing = {row[0] for row in updated}
+
+    new_blobs = []
+    for digest, (count, raw) in refs.items():
+        if digest not in existing:
+            codec, data = compress(raw)
+            new_blobs.append((digest, codec, data, len(raw), len(data), count))
+    for batch in _byte_batches(new_blobs, lambda blob: blob[4]):
+        # A concurrent writer may have stored the same blob meanwhile
+        execute_values(
+            cursor,
+            """
+            INSERT INTO file_blobs (hash, codec, data, raw_size, stored_size, refcount) VALUES %s
+            ON CONFLICT (hash) DO UPDATE SET refcount = file_blobs.refcount + EXCLUDED.refcount
+            """,
+            batch,
+            page_size=len(batch)
+        )
+    return hashes
+
+
+def release_scan_files(cursor, scan_id):
+    """Delete the file_contents of a scan and drop its blob references."""
+    cursor.execute(
+        """
+        WITH deleted AS (
+            DELETE FROM file_contents WHERE scan_id = %s RETURNING blob_hash
+        )
+        UPDATE file_blobs b SET refcount = b.refcount - d.refs
+        FROM (SELECT blob_hash, COUNT(*) AS refs FROM deleted WHERE blob_hash IS NOT NULL GROUP BY blob_hash) d
+        WHERE b.hash = d.blob_hash
+        """,
+        (scan_id,)
+    )
+
+
+def load_file_contents(cursor, scan_id):
+    """(file_path, content) pairs of a scan, decompressed."""
+    cursor.execute(FILE_CONTENTS_QUERY, (scan_id,))
+    files = []
+    for file_path, content, codec, data in cursor.fetchall():
+        if codec is not None:
+            content = decompress(codec, data).decode("utf-8", errors="surrogateescape")
+        files.append((file_path, content))
+    return files
+
+
+def migrate():
+    """Move inline file_contents.content into blobs, one committed batch at a time."""
+    last_id, moved = 0, 0
+    while True:
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT id, content FROM file_contents
+                    WHERE id > %s AND blob_hash IS NULL AND content IS NOT NULL
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE
+                    """,
+                    (last_id, MIGRATE_BATCH_SIZE)
+                )
+                rows = cursor.fetchall()
+                if rows:
+                    hashes = store_blobs(cursor, [row[1] for row in rows])
+                    execute_values(
+                        cursor,
+                        """
+                        UPDATE file_contents fc SET blob_hash = v.hash, content = NULL
+                        FROM (VALUES %s) AS v (id, hash)
+                        WHERE fc.id = v.id
+                        """,
+                        [(row[0], digest) for row, digest in zip(rows, hashes)],
+                        page_size=len(rows)
+                    )
+            conn.commit()
+        if not rows:
+            return moved
+        last_id = rows[-1][0]
+        moved += len(rows)
+        logger.info(f"file_contents migration: {moved} rows moved to blobs")
+
+
+def gc():
+    """Recount references from file_contents and delete unreferenced blobs.
+
+    Writers are blocked for the duration so no reference is taken mid-count.
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("LOCK TABLE file_blobs IN SHARE ROW EXCLUSIVE MODE")
+            cursor.execute(
+                """
+                WITH counts AS (
+                    SELECT b.hash, COUNT(fc.id) AS refs
+                    FROM file_blobs b LEFT JOIN file_contents fc ON fc.blob_hash = b.hash
+                    GROUP BY b.hash
+                )
+                UPDATE file_blobs b SET refcount = c.refs
+                FROM counts c
+                WHERE b.hash = c.hash AND b.refcount <> c.refs
+                """
+            )
+            fixed = cursor.rowcount
+            cursor.execute("DELETE FROM file_blobs WHERE refcount <= 0")
+            deleted = cursor.rowcount
+        conn.commit()
+    logger.info(f"file_blobs gc: {fixed} refcounts fixed, {deleted} blobs deleted")
+    return fixed, deleted
+
+
+def report():
+    """Bytes the scanned files would take inline against what is stored."""
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT COUNT(*), COALESCE(SUM(refcount), 0), COALESCE(SUM(raw_size::bigint * refcount), 0),
+                       COALESCE(SUM(raw_size), 0), COALESCE(SUM(stored_size), 0)
+                FROM file_blobs
+                """
+            )
+            blobs, references, logical_bytes, unique_bytes, stored_bytes = cursor.fetchone()
+            cursor.execute(
+                "SELECT COUNT(*), COALESCE(SUM(octet_length(content)), 0) FROM file_contents WHERE blob_hash IS NULL"
+            )
+            inline_rows, inline_bytes = cursor.fetchone()
+        conn.commit()
+    return {
+        "blobs": blobs,
+        "references": int(references),
+        "logical_bytes": int(logical_bytes),
+        "unique_bytes": int(unique_bytes),
+        "stored_bytes": int(stored_bytes),
+        "saved_bytes": int(logical_bytes) - int(stored_bytes),
+        "ratio": round(int(logical_bytes) / int(stored_bytes), 2) if stored_bytes else 0.0,
+        "inline_rows": inline_rows,
+        "inline_bytes": int(inline_bytes),
+    }
+
+
+if __name__ == "__main__":
+    commands = {"migrate": migrate, "gc": gc, "report": report}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        sys.exit("usage: python -m utils.blob_store migrate|gc|report")
+    logging.basicConfig(level=logging.INFO)
+    outcome = commands[sys.argv[1]]()
+    if isinstance(outcome, dict):
+        for name, value in outcome.items():
+            print(f"{name:>14}: {value}")
+    else:
+        print(outcome)
@@ -0,0 +1,255 @@
+"""Pool of long-lived Checkov worker processes.
+
+Each worker imports Checkov as a library once and then serves scan jobs
+(file path + framework) as JSON lines over its stdin/stdout pipes, so a scan
+no longer pays the interpreter start and policy-registry load of the CLI.
+Callers get the raw Checkov report dict, or None when the pool is disabled or
+a job fails, in which case they fall back to the CLI.
+
+Run with ``python -m utils.checkov_pool`` to start a single worker by hand.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Number of warm workers (0 disables the pool and always uses the CLI)
+CHECKOV_POOL_SIZE = int(os.getenv("CHECKOV_POOL_SIZE", "0"))
+# Recycle a worker after this many jobs to cap memory growth
+CHECKOV_POOL_MAX_JOBS = int(os.getenv("CHECKOV_POOL_MAX_JOBS", "200"))
+CHECKOV_POOL_JOB_TIMEOUT = int(os.getenv("CHECKOV_POOL_JOB_TIMEOUT", "60"))
+CHECKOV_POOL_START_TIMEOUT = int(os.getenv("CHECKOV_POOL_START_TIMEOUT", "120"))
+CHECKOV_POOL_PING_TIMEOUT = 5
+
+_RUNNER_MODULES = {
+    "terraform": "checkov.terraform.runner",
+    "kubernetes": "checkov.kubernetes.runner",
+    "dockerfile": "checkov.dockerfile.runner",
+}
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _worker_main():
+    """Worker loop: load Checkov once, then answer ping/scan messages."""
+    import importlib
+
+    # Keep the protocol on the original stdout; anything Checkov prints goes to stderr
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    def reply(kind, payload=None):
+        channel.write(json.dumps({"kind": kind, "payload": payload}, default=str) + "\n")
+        channel.flush()
+
+    from checkov.runner_filter import RunnerFilter
+    runners = {framework: importlib.import_module(module).Runner for framework, module in _RUNNER_MODULES.items()}
+    reply("ready")
+
+    for line in sys.stdin:
+        message = json.loads(line)
+        if message["kind"] == "ping":
+            reply("pong")
+        elif message["kind"] == "stop":
+            break
+        elif message["kind"] == "scan":
+            file_path, framework = message["payload"]
+            try:
+                reports = runners[framework]().run(
+                    root_folder=None,
+                    files=[file_path],
+                    runner_filter=RunnerFilter(framework=[framework])
+                )
+                if not isinstance(reports, list):
+                    reports = [reports]
+                # is_quiet mirrors the --quiet flag the CLI path passes
+                output = [report.get_dict(is_quiet=True) for report in reports]
+                reply("ok", output[0] if len(output) == 1 else output)
+            except Exception as e:
+                reply("error", str(e))
+
+
+class _Worker:
+    """Handle on one worker process and its reply stream."""
+
+    def __init__(self):
+        env = dict(os.environ, LOG_LEVEL="WARNING")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "utils.checkov_pool"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=BACKEND_DIR,
+            env=env,
+            text=True,
+            encoding="utf-8",
+        )
+        self.jobs = 0
+        self._replies = queue.Queue()
+        threading.Thread(target=self._read_replies, daemon=True).start()
+
+    def _read_replies(self):
+        for line in self.process.stdout:
+            try:
+                self._replies.put(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"Ignoring malformed line from Checkov worker {self.process.pid}")
+        self._replies.put(None)
+
+    def _request(self, kind, payload, timeout):
+        self.process.stdin.write(json.dumps({"kind": kind, "payload": payload}) + "\n")
+        self.process.stdin.flush()
+        return self._receive(timeout)
+
+    def _receive(self, timeout):
+        reply = self._replies.get(timeout=timeout)
+        if reply is None:
+            raise EOFError("Checkov worker exited")
+        return reply
+
+    def wait_ready(self, timeout):
+        try:
+            return self._receive(timeout)["kind"] == "ready"
+        except (queue.Empty, EOFError):
+            return False
+
+    def healthy(self):
+        if self.process.poll() is not None:
+            return False
+        try:
+            return self._request("ping", None, CHECKOV_POOL_PING_TIMEOUT)["kind"] == "pong"
+        except (queue.Empty, EOFError, OSError):
+            return False
+
+    def scan(self, file_path, framework, timeout):
+        self.jobs += 1
+        return self._request("scan", [file_path, framework], timeout)
+
+    def stop(self):
+        try:
+            self.process.stdin.write(json.dumps({"kind": "stop"}) + "\n")
+            self.process.stdin.flush()
+            self.process.wait(timeout=5)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+class CheckovPool:
+    """Fixed-size pool of warm Checkov workers with health checks and recycling."""
+
+    def __init__(self, size, max_jobs, job_timeout):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.job_timeout = job_timeout
+        self._idle = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._started = False
+        self._disabled = size <= 0
+        self.stats = {"jobs": 0, "failures": 0, "recycled": 0, "fallbacks": 0}
+
+    def enabled(self):
+        return not self._disabled
+
+    def _spawn(self):
+        """Start a worker and add it to the idle queue once Checkov is loaded."""
+        worker = _Worker()
+        if not worker.wait_ready(CHECKOV_POOL_START_TIMEOUT):
+            worker.stop()
+            with self._lock:
+                if not self._workers:
+                    # Not a single worker ever came up: Checkov is not importable here
+                    logger.warning("Checkov worker failed to start, disabling the pool and using the CLI")
+                    self._disabled = True
+            return
+        with self._lock:
+            self._workers.add(worker)
+        self._idle.put(worker)
+        logger.info(f"Checkov worker {worker.process.pid} ready")
+
+    def _spawn_async(self):
+        threading.Thread(target=self._spawn, daemon=True).start()
+
+    def _retire(self, worker):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.stop()
+        if not self._disabled:
+            self._spawn_async()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.size):
+            self._spawn_async()
+
+    def scan(self, file_path, framework):
+        """Scan one file on a warm worker; return the Checkov report dict or None."""
+        if self._disabled:
+            return None
+        self._ensure_started()
+        worker = None
+        deadline = time.monotonic() + self.job_timeout
+        while worker is None and not self._disabled and time.monotonic() < deadline:
+            try:
+                worker = self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+        if worker is None:
+            logger.warning(f"No Checkov worker available for {file_path}, falling back to the CLI")
+            self.stats["fallbacks"] += 1
+            return None
+
+        if not worker.healthy():
+            logger.warning(f"Checkov worker {worker.process.pid} failed its health check, replacing it")
+            self.stats["failures"] += 1
+            self._retire(worker)
+            self.stats["fallbacks"] += 1
+            return None
+
+        try:
+            reply = worker.scan(file_path, framework, self.job_timeout)
+        except (queue.Empty, EOFError, OSError) as e:
+            logger.error(f"Checkov worker {worker.process.pid} failed on {file_path}: {e!r}")
+            self.stats["failures"] += 1
+            self._retire(worker)
+            self.stats["fallbacks"] += 1
+            return None
+
+        self.stats["jobs"] += 1
+        if worker.jobs >= self.max_jobs:
+            self.stats["recycled"] += 1
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+
+        if reply["kind"] != "ok":
+            logger.error(f"Checkov worker error on {file_path}: {reply['payload']}")
+            self.stats["fallbacks"] += 1
+            return None
+        return reply["payload"]
+
+    def shutdown(self):
+        self._disabled = True
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
+
+
+checkov_pool = CheckovPool(CHECKOV_POOL_SIZE, CHECKOV_POOL_MAX_JOBS, CHECKOV_POOL_JOB_TIMEOUT)
+atexit.register(checkov_pool.shutdown)
+
+
+if __name__ == "__main__":
+    _worker_main()
@@ -0,0 +1,116 @@
+"""Reuse of repository scans by commit.
+
+Repository scans record the commit SHA they scanned and the scanner version
+in scan_history. When the remote HEAD (read with `git ls-remote`) still points
+to a commit the user already scanned with the same scanner, the stored result
+is copied to a new history row instead of cloning and scanning again.
+
+The raw Semgrep results of /scan are not scans of the history: they are kept
+in repo_scan_cache (cached_repo_scan / cache_repo_scan), out of /history and
+/stats, and only answer the same commit again.
+"""
+import logging
+import os
+
+from psycopg2.extras import Json
+
+from utils.db import db_connection, db_cursor, DatabaseUnavailable
+from utils.findings import copy_findings
+from utils.http_cache import bump_version
+from utils.result_codec import expand_result
+from utils.scan_stats import record_scan
+
+logger = logging.getLogger(__name__)
+
+# Stored results older than this are not reused (rule sets can change under the same version)
+COMMIT_CACHE_MAX_AGE = int(os.getenv("COMMIT_CACHE_MAX_AGE", "86400"))
+
+REUSE_SCAN_QUERY = """
+    SELECT id, scan_result
+    FROM scan_history
+    WHERE user_id = %s AND repo_url = %s AND commit_sha = %s AND scan_type = %s
+      AND scanner_version = %s AND status IN ('completed', 'success', 'failed')
+      AND created_at > NOW() - make_interval(secs => %s)
+    ORDER BY created_at DESC
+    LIMIT 1
+"""
+
+
+def reuse_scan(user_id, repo_url, commit_sha, scan_type, scanner_version):
+    """Copy the user's latest matching scan into a new history row.
+
+    Returns (new_scan_id, scan_result), or None when there is nothing to reuse.
+    """
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    REUSE_SCAN_QUERY, (user_id, repo_url, commit_sha, scan_type, scanner_version, COMMIT_CACHE_MAX_AGE)
+                )
+                row = cursor.fetchone()
+                if not row:
+                    conn.commit()
+                    return None
+                cursor.execute(
+                    """
+                    INSERT INTO scan_history (user_id, repo_id, scan_result, repo_url, status, score, compliant,
+                                              input_type, scan_type, commit_sha, scanner_version)
+                    SELECT user_id, repo_id, scan_result, repo_url, status, score, compliant,
+                           input_type, scan_type, commit_sha, scanner_version
+                    FROM scan_history WHERE id = %s
+                    RETURNING id
+                    """,
+                    (row[0],)
+                )
+                scan_id = cursor.fetchone()[0]
+                record_scan(cursor, user_id, scan_type, row[1])
+                copy_findings(cursor, row[0], scan_id)
+                bump_version(cursor, user_id, "scans")
+            conn.commit()
+            logger.info(f"Reused scan {row[0]} of {repo_url}@{commit_sha} as scan {scan_id}")
+            return scan_id, expand_result(row[1])
+    except DatabaseUnavailable:
+        return None
+    except Exception as e:
+        logger.warning(f"Commit cache lookup failed for {repo_url}: {str(e)}")
+        return None
+
+
+def cached_repo_scan(user_id, repo_url, commit_sha, scanner_version):
+    """The cached /scan payload of this commit, or None."""
+    try:
+        with db_cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT result FROM repo_scan_cache
+                WHERE user_id = %s AND repo_url = %s AND commit_sha = %s AND scanner_version = %s
+                  AND created_at > NOW() - make_interval(secs => %s)
+                """,
+                (str(user_id), repo_url, commit_sha, scanner_version, COMMIT_CACHE_MAX_AGE)
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+    except DatabaseUnavailable:
+        return None
+    except Exception as e:
+        logger.warning(f"Repo scan cache lookup failed for {repo_url}: {str(e)}")
+        return None
+
+
+def cache_repo_scan(user_id, repo_url, commit_sha, scanner_version, payload):
+    """Keep a /scan payload for later scans of the same commit."""
+    try:
+        with db_cursor(commit=True) as cursor:
+            cursor.execute(
+                """
+                INSERT INTO repo_scan_cache (user_id, repo_url, commit_sha, scanner_version, result)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (user_id, repo_url, commit_sha, scanner_version)
+                DO UPDATE SET result = EXCLUDED.result, created_at = NOW()
+                """,
+                (str(user_id), repo_url, commit_sha, scanner_version, Json(payload))
+            )
+    except DatabaseUnavailable:
+        return
+    except Exception as e:
+        logger.warning(f"Failed to cache /scan result for {repo_url}: {str(e)}")
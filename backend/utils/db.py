@@ -1,10 +1,38 @@
-import psycopg2
+"""Pooled PostgreSQL connections.
+
+Connections are borrowed with the db_connection() / db_cursor() context
+managers and handed back to a process-wide pool instead of being closed, so
+a request no longer pays a TCP and auth handshake per query. At most
+DB_POOL_MAX connections exist; a borrower waits up to DB_POOL_TIMEOUT
+seconds for one, then gets DatabaseUnavailable. A connection that sat idle
+longer than DB_POOL_HEALTHCHECK_IDLE seconds is pinged before being handed
+out, and broken ones are replaced.
+"""
+import logging
 import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_db_connection():
+logger = logging.getLogger(__name__)
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))
+
+
+class DatabaseUnavailable(Exception):
+    """No database connection could be obtained."""
+
+
+def _connect():
     try:
         return psycopg2.connect(
             dbname=os.getenv("DB_NAME"),
@@ -14,5 +42,157 @@ def get_db_connection():
             port=os.getenv("DB_PORT"),
         )
     except psycopg2.Error as e:
-        print("❌ Erreur de connexion à la base de données :", e)
-        return None
\ No newline at end of file
+        logger.error(f"❌ Erreur de connexion à la base de données : {e}")
+        raise DatabaseUnavailable(str(e)) from e
+
+
+class ConnectionPool:
+    def __init__(self, min_size, max_size, timeout, healthcheck_idle):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self.stats = {
+            "checkouts": 0, "waits": 0, "timeouts": 0, "total_wait_seconds": 0.0, "max_wait_seconds": 0.0,
+            "created": 0, "discarded": 0, "healthcheck_failures": 0,
+        }
+
+    def _healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.healthcheck_idle:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self.stats["discarded"] += 1
+            self._cond.notify()
+
+    def getconn(self):
+        started = time.monotonic()
+        waited = False
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    waited = True
+                    remaining = started + self.timeout - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["timeouts"] += 1
+                        raise DatabaseUnavailable(f"no connection free after {self.timeout}s ({self.max_size} in use)")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                else:
+                    conn, idle_since = None, None
+                    self._size += 1
+                wait = time.monotonic() - started
+                self.stats["checkouts"] += 1
+                self.stats["waits"] += waited
+                self.stats["total_wait_seconds"] += wait
+                self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], wait)
+
+            if conn is None:
+                try:
+                    conn = _connect()
+                except DatabaseUnavailable:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.stats["created"] += 1
+                return conn
+            if self._healthy(conn, idle_since):
+                return conn
+            with self._cond:
+                self.stats["healthcheck_failures"] += 1
+            self._discard(conn)
+
+    def putconn(self, conn, broken=False):
+        if broken or conn.closed:
+            self._discard(conn)
+            return
+        # Never hand out a connection with a transaction left open
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._discard(conn)
+                return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def warm_up(self):
+        """Open min_size connections ahead of the first requests."""
+        conns = []
+        try:
+            for _ in range(self.min_size):
+                conns.append(self.getconn())
+        except DatabaseUnavailable as e:
+            logger.warning(f"Could not pre-open database connections: {str(e)}")
+        for conn in conns:
+            self.putconn(conn)
+
+    def snapshot(self):
+        with self._cond:
+            checkouts = self.stats["checkouts"]
+            return {
+                **self.stats,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "avg_wait_seconds": round(self.stats["total_wait_seconds"] / checkouts, 6) if checkouts else 0.0,
+            }
+
+
+db_pool = ConnectionPool(DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_IDLE)
+
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection; it is rolled back on error and always returned.
+
+    Raises DatabaseUnavailable when no connection can be obtained.
+    """
+    conn = db_pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except Exception as e:
+        broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        raise
+    finally:
+        db_pool.putconn(conn, broken=broken)
+
+
+@contextmanager
+def db_cursor(commit=False):
+    """Borrow a pooled connection and yield a cursor on it, committing on success if asked."""
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            yield cursor
+        if commit:
+            conn.commit()
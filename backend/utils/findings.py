@@ -0,0 +1,147 @@
+"""Normalized scan findings.
+
+Each failed check of a saved scan becomes one row in the findings table,
+written by record_findings() in the transaction that inserts the scan, so
+/risks can count and page findings with indexed SQL instead of loading
+scan_result blobs. The fingerprint identifies a finding across scans: the
+same check on the same resource of the same file hashes to the same value,
+whatever temporary directory the scan ran in.
+
+Findings of scans saved before this table existed are filled in with:
+
+    python -m utils.findings backfill
+"""
+import hashlib
+import logging
+import sys
+
+from psycopg2.extras import execute_values
+
+from utils.db import db_connection
+from utils.result_codec import expand_result
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 500
+
+def normalize_severity(severity):
+    return str(severity).upper() if severity else "INFO"
+
+
+def fingerprint(scan_type, check, path_scanned=None):
+    """Stable hash of a finding: scan type, check, path relative to the scan root, resource and lines."""
+    file_path = (check.get("file_path") or "").replace("\\", "/")
+    if path_scanned and file_path.startswith(path_scanned.rstrip("/") + "/"):
+        file_path = file_path[len(path_scanned.rstrip("/")) + 1:]
+    parts = (scan_type, check.get("check_id") or "", file_path.lstrip("/"),
+             check.get("resource") or "", str(check.get("file_line_range") or ""))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def finding_rows(scan_id, user_id, scan_type, scan_result):
+    """One findings row per failed check of a scan_result."""
+    results = (scan_result or {}).get("results")
+    if not isinstance(results, dict):
+        return []
+    path_scanned = results.get("path_scanned")
+    return [
+        (
+            scan_id,
+            str(user_id),
+            scan_type,
+            check.get("check_id"),
+            normalize_severity(check.get("severity")),
+            check.get("file_path"),
+            fingerprint(scan_type, check, path_scanned),
+            check.get("message"),
+            check.get("suggestion"),
+        )
+        for check in results.get("failed_checks") or []
+        if isinstance(check, dict)
+    ]
+
+
+def record_findings(cursor, scan_id, user_id, scan_type, scan_result):
+    """Insert the failed checks of a scan, inside the caller's transaction."""
+    rows = finding_rows(scan_id, user_id, scan_type, scan_result)
+    if rows:
+        execute_values(
+            cursor,
+            """
+            INSERT INTO findings (scan_id, user_id, scan_type, check_id, severity, file_path, fingerprint,
+                                  message, suggestion)
+            VALUES %s
+            """,
+            rows
+        )
+    return len(rows)
+
+
+def replace_findings(cursor, scan_id, user_id, scan_type, scan_result):
+    """Rewrite the findings of a scan whose scan_result changed (deferred suggestions)."""
+    cursor.execute("DELETE FROM findings WHERE scan_id = %s", (scan_id,))
+    return record_findings(cursor, scan_id, user_id, scan_type, scan_result)
+
+
+def copy_findings(cursor, from_scan_id, to_scan_id):
+    """Give a copied scan (commit cache reuse) the findings of its source."""
+    cursor.execute(
+        """
+        INSERT INTO findings (scan_id, user_id, scan_type, check_id, severity, file_path, fingerprint,
+                              message, suggestion)
+        SELECT %s, user_id, scan_type, check_id, severity, file_path, fingerprint, message, suggestion
+        FROM findings WHERE scan_id = %s
+        ORDER BY id
+        """,
+        (to_scan_id, from_scan_id)
+    )
+
+
+def backfill():
+    """Record findings for every scan that has none yet, in batches."""
+    last_id, scans, total = 0, 0, 0
+    while True:
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT sh.id, sh.user_id, sh.scan_type, sh.scan_result, sh.created_at
+                    FROM scan_history sh
+                    WHERE sh.id > %s AND NOT EXISTS (SELECT 1 FROM findings f WHERE f.scan_id = sh.id)
+                    ORDER BY sh.id
+                    LIMIT %s
+                    """,
+                    (last_id, BACKFILL_BATCH_SIZE)
+                )
+                batch = cursor.fetchall()
+                rows = []
+                for scan_id, user_id, scan_type, scan_result, created_at in batch:
+                    rows.extend(
+                        (*row, created_at) for row in finding_rows(scan_id, user_id, scan_type or "unknown", expand_result(scan_result))
+                    )
+                if rows:
+                    execute_values(
+                        cursor,
+                        """
+                        INSERT INTO findings (scan_id, user_id, scan_type, check_id, severity, file_path,
+                                              fingerprint, message, suggestion, created_at)
+                        VALUES %s
+                        """,
+                        rows
+                    )
+            conn.commit()
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        scans += len(batch)
+        total += len(rows)
+        logger.info(f"findings backfill: {scans} scans, {total} findings so far")
+    return scans, total
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        sys.exit("usage: python -m utils.findings backfill")
+    logging.basicConfig(level=logging.INFO)
+    scans, total = backfill()
+    print(f"{total} findings recorded for {scans} scans")
@@ -0,0 +1,88 @@
+"""Small helpers around the git CLI used by the repository scans."""
+import logging
+import os
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+GIT_TIMEOUT = 300
+
+
+def run_git(args, cwd=None, timeout=GIT_TIMEOUT):
+    """Run a git command and return its stdout; raises CalledProcessError on failure."""
+    process = subprocess.run(
+        ["git", *args], cwd=cwd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout
+    )
+    return process.stdout
+
+
+def head_commit(repo_dir):
+    return run_git(["rev-parse", "HEAD"], cwd=repo_dir).strip()
+
+
+def changed_files(repo_dir, base_sha, head_sha="HEAD"):
+    """Return (changed, deleted) repo-relative paths between two commits, or None.
+
+    A shallow clone does not have base_sha, so it is fetched first; None means
+    the diff could not be computed (unknown commit, force-pushed history...).
+    """
+    try:
+        try:
+            run_git(["cat-file", "-e", f"{base_sha}^{{commit}}"], cwd=repo_dir)
+        except subprocess.CalledProcessError:
+            run_git(["fetch", "--depth", "1", "origin", base_sha], cwd=repo_dir)
+        output = run_git(["diff", "--name-status", "--no-renames", base_sha, head_sha], cwd=repo_dir)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"Could not diff {base_sha}..{head_sha}: {getattr(e, 'stderr', None) or str(e)}")
+        return None
+
+    changed, deleted = [], []
+    for line in output.splitlines():
+        status, _, path = line.partition("\t")
+        if not path:
+            continue
+        (deleted if status.startswith("D") else changed).append(path)
+    return changed, deleted
+
+
+def _pack_bytes(repo_dir):
+    """Bytes of objects stored in the repository (loose and packed)."""
+    stats = dict(line.split(": ", 1) for line in run_git(["count-objects", "-v"], cwd=repo_dir).splitlines())
+    return (int(stats.get("size", 0)) + int(stats.get("size-pack", 0))) * 1024
+
+
+def sparse_clone(repo_url, dest_dir, patterns):
+    """Blob-less shallow clone of repo_url that only materializes files matching patterns.
+
+    patterns are gitignore-style (non-cone sparse-checkout). Returns what was
+    fetched compared with the full tree.
+    """
+    run_git(["clone", "--depth", "1", "--filter=blob:none", "--no-checkout", "--quiet", repo_url, dest_dir])
+    run_git(["sparse-checkout", "set", "--no-cone", *patterns], cwd=dest_dir)
+    run_git(["checkout", "--quiet"], cwd=dest_dir)
+
+    tree_files = len(run_git(["ls-tree", "-r", "--name-only", "HEAD"], cwd=dest_dir).splitlines())
+    checked_out = [
+        os.path.join(root, name)
+        for root, dirs, files in os.walk(dest_dir)
+        if ".git" not in os.path.relpath(root, dest_dir).split(os.sep)
+        for name in files
+    ]
+    return {
+        "mode": "sparse",
+        "tree_files": tree_files,
+        "files_fetched": len(checked_out),
+        "bytes_fetched": _pack_bytes(dest_dir),
+        "bytes_checked_out": sum(os.path.getsize(path) for path in checked_out),
+    }
+
+
+def remote_head(repo_url):
+    """Return the commit SHA the remote HEAD points to (one round trip, no clone), or None."""
+    try:
+        output = run_git(["ls-remote", repo_url, "HEAD"], timeout=60)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"ls-remote failed for {repo_url}: {getattr(e, 'stderr', None) or str(e)}")
+        return None
+    sha, _, _ = output.partition("\t")
+    return sha.strip() or None
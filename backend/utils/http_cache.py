@@ -0,0 +1,145 @@
+"""Conditional GET and response compression for the heavy read endpoints.
+
+Every write that changes what a user's dashboards show bumps a per-user,
+per-scope version in user_data_versions, in the writer's transaction
+(bump_version). Views decorated with @conditional(scope) derive a weak ETag
+from that version, the request path and query, and the result format, and a
+Last-Modified from the time of the change. A request whose If-None-Match or
+If-Modified-Since still matches gets a 304 before the view runs, so neither
+the queries nor the serialization happen.
+
+init_compression(app) gzip- or brotli-compresses (brotli when the Brotli
+package is installed) buffered text/JSON responses above
+COMPRESS_MIN_BYTES, as negotiated by Accept-Encoding.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import time
+from functools import wraps
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+from flask import request, make_response
+
+from utils.db import db_cursor
+from utils.result_codec import wants_compact
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+COMPRESSIBLE_MIMETYPES = ("application/json", "application/javascript", "text/")
+DATA_VERSION_QUERY = (
+    "SELECT version, EXTRACT(EPOCH FROM changed_at) FROM user_data_versions WHERE user_id = %s AND scope = %s"
+)
+
+def bump_version(cursor, user_id, scope):
+    """Mark the user's data in scope ("scans" or "configs") as changed, inside the caller's transaction."""
+    cursor.execute(
+        """
+        INSERT INTO user_data_versions AS v (user_id, scope, version) VALUES (%s, %s, 1)
+        ON CONFLICT (user_id, scope) DO UPDATE SET version = v.version + 1, changed_at = NOW()
+        """,
+        (str(user_id), scope)
+    )
+
+
+def data_version(user_id, scope):
+    """(version, changed_at) of the user's data in scope; (0, None) if it never changed."""
+    with db_cursor() as cursor:
+        cursor.execute(DATA_VERSION_QUERY, (str(user_id), scope))
+        row = cursor.fetchone()
+    return (row[0], float(row[1])) if row else (0, None)
+
+
+def _not_modified(etag, changed_at):
+    if request.if_none_match:
+        # Weak comparison, as GET allows
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and changed_at is not None:
+        return int(changed_at) <= request.if_modified_since.timestamp()
+    return False
+
+
+def conditional(scope, identity=None, max_age=None):
+    """Answer 304 when the user's data in scope did not change since the client's copy.
+
+    identity returns the user id (default: the X-User-ID header). With
+    max_age, the ETag also rolls over every max_age seconds, for views whose
+    data partly lives outside the database or depends on the current time.
+    max_age may be a callable returning the value (or None) for the request.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = identity() if identity else request.headers.get("X-User-ID")
+            if not user_id:
+                return view(*args, **kwargs)
+            try:
+                version, changed_at = data_version(user_id, scope)
+            except Exception as e:
+                logger.warning(f"Could not read the {scope} version of user_id {user_id}: {str(e)}")
+                return view(*args, **kwargs)
+
+            request_max_age = max_age() if callable(max_age) else max_age
+            epoch = int(time.time() // request_max_age) if request_max_age else 0
+            key = f"{user_id}|{scope}|{version}|{epoch}|{request.full_path}|{wants_compact()}"
+            etag = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+            if _not_modified(etag, None if request_max_age else changed_at):
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if changed_at is not None and not request_max_age:
+                response.last_modified = changed_at
+            response.headers["Cache-Control"] = "private, no-cache"
+            response.vary.update(("X-User-ID", "Authorization", "Accept"))
+            return response
+        return wrapper
+    return decorator
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress_response(response):
+    """after_request hook: compress buffered text/JSON bodies the client accepts."""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or not (response.mimetype or "").startswith(COMPRESSIBLE_MIMETYPES)):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = _choose_encoding()
+    body = response.get_data()
+    if not encoding or len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=min(COMPRESS_LEVEL, 11))
+    else:
+        compressed = gzip.compress(body, compresslevel=COMPRESS_LEVEL)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    # The ETag names the representation: a compressed one can only be a weak match
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
@@ -0,0 +1,123 @@
+"""Background scan jobs.
+
+A scan submitted in async mode waits for its turn in the scan scheduler's
+queues without holding a thread, then runs on a shared executor, while the
+request returns a job id at once. Only admitted jobs reach the executor, which
+has one thread per scheduler slot. The job function receives a progress callback and
+reports the stage it is in (cloning, scanning n/m files, enriching, saving);
+GET /jobs/<id> reads the job back until it is completed or failed.
+Jobs live in memory and are dropped JOB_TTL seconds after they finish.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.scheduler import scan_scheduler, SCAN_MAX_CONCURRENT, SchedulerBusy
+
+logger = logging.getLogger(__name__)
+
+JOB_TTL = int(os.getenv("JOB_TTL", "3600"))
+
+FINISHED_STATES = ("completed", "failed")
+
+
+class JobRegistry:
+    def __init__(self, scheduler, max_workers, ttl):
+        self.scheduler = scheduler
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scan-jobs")
+
+    def submit(self, user_id, scan_type, func, *args, cleanup=None, **kwargs):
+        """Queue func(*args, progress=..., **kwargs) in a scan slot of user_id and return the new job id.
+
+        func returns a (payload, http_status) pair, like the synchronous handlers.
+        cleanup() runs after func, or instead of it when the scan is refused or
+        times out in the queue. Raises SchedulerBusy when the queues are full.
+        """
+        self._drop_expired()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                "id": job_id,
+                "user_id": str(user_id),
+                "scan_type": scan_type,
+                "status": "queued",
+                "progress": None,
+                "result": None,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+
+        def start(release):
+            self._executor.submit(self._run, job_id, func, args, kwargs, cleanup, release)
+
+        def refuse(error):
+            self._update(job_id, status="failed", error=str(error))
+            if cleanup:
+                cleanup()
+
+        try:
+            self.scheduler.submit(user_id, start, refuse)
+        except SchedulerBusy:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+            if cleanup:
+                cleanup()
+            raise
+        return job_id
+
+    def _run(self, job_id, func, args, kwargs, cleanup, release):
+        def progress(state, done=None, total=None):
+            self._update(job_id, status=state, progress={"done": done, "total": total} if total is not None else None)
+
+        try:
+            payload, http_status = func(*args, progress=progress, **kwargs)
+        except Exception as e:
+            logger.error(f"Scan job {job_id} failed: {str(e)}")
+            self._update(job_id, status="failed", error=str(e))
+            return
+        finally:
+            release()
+            if cleanup:
+                cleanup()
+        if http_status >= 400:
+            self._update(job_id, status="failed", error=payload.get("error") or payload.get("results", {}).get("message"), result=payload)
+        else:
+            self._update(job_id, status="completed", result=payload, progress=None)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(fields, updated_at=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _drop_expired(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] in FINISHED_STATES and job["updated_at"] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+scan_jobs = JobRegistry(scan_scheduler, SCAN_MAX_CONCURRENT, JOB_TTL)
+
+
+def report_progress(progress, state, done=None, total=None):
+    """Call a job progress callback if one was given."""
+    if progress:
+        progress(state, done, total)
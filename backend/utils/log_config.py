@@ -0,0 +1,86 @@
+"""Process-wide logging setup.
+
+configure_logging() installs one QueueHandler on the root logger; a
+QueueListener thread does the formatting hand-off and the console/file I/O,
+so request threads never block on a disk write. LOG_LEVEL sets the default
+level and LOG_LEVELS overrides it per module, e.g.
+"routes.checkov=DEBUG,utils.repo_cache=WARNING".
+
+Large payloads (scan results, Checkov output) go through log_payload(): it
+returns at once unless DEBUG is enabled for the logger and the call is
+sampled (LOG_PAYLOAD_SAMPLE_RATE), and even then only the first
+LOG_PAYLOAD_MAX_CHARS of compact JSON are encoded, never the whole result.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_FORMAT = "%(asctime)s %(levelname)s:%(name)s: %(message)s"
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.1"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "500"))
+
+_listener = None
+_payload_encoder = json.JSONEncoder(default=str)
+
+
+def parse_levels(value):
+    """Parse "module=LEVEL,..." into a dict, skipping malformed entries."""
+    levels = {}
+    for item in value.split(","):
+        name, _, level = item.strip().partition("=")
+        if name and level.upper() in logging._nameToLevel:
+            levels[name] = level.upper()
+    return levels
+
+
+def configure_logging():
+    """Route all logging through a background listener; safe to call more than once."""
+    global _listener
+    if _listener:
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if LOG_FILE:
+        handlers.append(logging.FileHandler(LOG_FILE))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+
+def payload_preview(payload, limit=LOG_PAYLOAD_MAX_CHARS):
+    """Compact JSON of payload, cut at limit characters without encoding the rest."""
+    chunks = []
+    size = 0
+    for chunk in _payload_encoder.iterencode(payload):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            return "".join(chunks)[:limit] + "..."
+    return "".join(chunks)
+
+
+def log_payload(logger, message, payload):
+    """Log message with a preview of payload at DEBUG, if enabled and sampled."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if LOG_PAYLOAD_SAMPLE_RATE < 1.0 and random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    logger.debug("%s: %s", message, payload_preview(payload))
@@ -0,0 +1,297 @@
+"""Versioned schema migrations.
+
+The schema lives in backend/migrations as numbered SQL files
+(NNNN_description.sql), applied in order, each in its own transaction, and
+recorded in schema_migrations with a checksum. Applying is serialized across
+processes by an advisory lock, so every worker may call it at startup
+(MIGRATIONS_AUTO_APPLY, on by default).
+
+    python -m utils.migrations upgrade       # apply pending migrations
+    python -m utils.migrations status        # applied / pending
+    python -m utils.migrations check-plans   # EXPLAIN the hot queries on seeded data
+
+check-plans seeds users, scans, files, findings and GitHub configs in a
+transaction it rolls back, ANALYZEs the tables, and exits non-zero when a
+hot query plans a sequential scan. tests/test_migrations.py runs the same
+check under pytest when TEST_DATABASE_URL names a throwaway database.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+
+from utils.db import db_connection, DatabaseUnavailable
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+MIGRATIONS_AUTO_APPLY = os.getenv("MIGRATIONS_AUTO_APPLY", "true").lower() in ("1", "true", "yes")
+# Arbitrary key of the advisory lock held while migrating
+MIGRATIONS_LOCK_ID = 72_041_531
+
+MIGRATION_FILE_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+    )
+"""
+
+
+def discover():
+    """[(version, name, sql)] of the migration files, in version order."""
+    migrations = []
+    for file_name in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = MIGRATION_FILE_RE.match(file_name)
+        if match:
+            with open(os.path.join(MIGRATIONS_DIR, file_name), encoding="utf-8") as f:
+                migrations.append((int(match.group(1)), match.group(2), f.read()))
+    return migrations
+
+
+def checksum(sql):
+    return hashlib.sha256(sql.encode("utf-8")).hexdigest()
+
+
+def _applied(cursor):
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return dict(cursor.fetchall())
+
+
+def upgrade():
+    """Apply the pending migrations; returns the versions applied."""
+    applied_now = []
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK_ID,))
+            try:
+                cursor.execute(CREATE_TABLE_SQL)
+                conn.commit()
+                applied = _applied(cursor)
+                for version, name, sql in discover():
+                    if version in applied:
+                        if applied[version] != checksum(sql):
+                            logger.warning(f"Migration {version:04d}_{name} changed after it was applied")
+                        continue
+                    cursor.execute(sql)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                        (version, name, checksum(sql))
+                    )
+                    conn.commit()
+                    applied_now.append(version)
+                    logger.info(f"Applied migration {version:04d}_{name}")
+            finally:
+                conn.rollback()
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_ID,))
+                conn.commit()
+    return applied_now
+
+
+def upgrade_on_startup():
+    """Apply pending migrations when the app starts, unless disabled."""
+    if not MIGRATIONS_AUTO_APPLY:
+        return
+    try:
+        upgrade()
+    except DatabaseUnavailable as e:
+        logger.warning(f"Migrations not applied, database unavailable: {str(e)}")
+
+
+def status():
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(CREATE_TABLE_SQL)
+            applied = _applied(cursor)
+        conn.commit()
+    return [
+        (version, name, "applied" if version in applied else "pending")
+        for version, name, _ in discover()
+    ]
+
+
+SEED_USERS = 1000
+SEED_SCANS_PER_USER = 20
+SEED_EMAIL = "plancheck-%@example.invalid"
+
+SEED_SQL = (
+    """
+    INSERT INTO users_test (name, email)
+    SELECT 'plancheck-' || g, 'plancheck-' || g || '@example.invalid' FROM generate_series(1, %(users)s) g
+    """,
+    """
+    INSERT INTO github_users (user_id, github_id, access_token)
+    SELECT id, 900000000 + id, 'token' FROM users_test WHERE email LIKE %(email)s
+    """,
+    """
+    INSERT INTO selected_repos (user_id, full_name, name, html_url)
+    SELECT u.id, 'plancheck-' || u.id || '/repo-' || r, 'repo-' || r,
+           'https://github.com/plancheck-' || u.id || '/repo-' || r
+    FROM users_test u, generate_series(1, 3) r WHERE u.email LIKE %(email)s
+    """,
+    """
+    INSERT INTO repo_configs (repo_id, file_path, file_name, content, sha, framework)
+    SELECT sr.id, 'infra/main' || c || '.tf', 'main' || c || '.tf', 'resource {}'::bytea, md5(sr.id || '-' || c), 'terraform'
+    FROM selected_repos sr, generate_series(1, 4) c WHERE sr.full_name LIKE 'plancheck-%%'
+    """,
+    """
+    INSERT INTO scan_history (user_id, scan_result, repo_url, status, score, compliant, input_type, scan_type,
+                              created_at, commit_sha, scanner_version)
+    SELECT u.id, '{"results": {"summary": {"passed": 3, "failed": 1}, "score": 75}}',
+           'https://github.com/plancheck-' || u.id || '/repo-' || (s %% 3 + 1), 'completed', 75, false, 'repo',
+           CASE WHEN s %% 2 = 0 THEN 'checkov' ELSE 'semgrep' END, NOW() - s * INTERVAL '1 hour',
+           md5(u.id || '-' || s), 'plancheck'
+    FROM users_test u, generate_series(1, %(scans)s) s WHERE u.email LIKE %(email)s
+    """,
+    """
+    INSERT INTO file_blobs (hash, codec, data, raw_size, stored_size, refcount)
+    SELECT 'plancheck-' || md5(sh.id || '-' || f), 'raw', 'resource {}'::bytea, 11, 11, 1
+    FROM scan_history sh, generate_series(1, 2) f WHERE sh.scanner_version = 'plancheck'
+    """,
+    """
+    INSERT INTO file_contents (scan_id, file_path, input_type, blob_hash)
+    SELECT sh.id, 'infra/main' || f || '.tf', 'repo', 'plancheck-' || md5(sh.id || '-' || f)
+    FROM scan_history sh, generate_series(1, 2) f WHERE sh.scanner_version = 'plancheck'
+    """,
+    """
+    INSERT INTO findings (scan_id, user_id, scan_type, check_id, severity, file_path, fingerprint, created_at)
+    SELECT sh.id, sh.user_id::text, sh.scan_type, 'CKV_' || k, (ARRAY['ERROR', 'WARNING', 'INFO'])[k],
+           'infra/main.tf', md5(sh.id || '-' || k), sh.created_at
+    FROM scan_history sh, generate_series(1, 3) k WHERE sh.scanner_version = 'plancheck'
+    """,
+    """
+    INSERT INTO user_scan_stats (user_id, scan_type, total_scans, passed, failed, score_sum, score_count)
+    SELECT id::text, t, 10, 30, 10, 750, 10 FROM users_test, unnest(ARRAY['checkov', 'semgrep']) t
+    WHERE email LIKE %(email)s
+    """,
+    """
+    INSERT INTO user_data_versions (user_id, scope, version)
+    SELECT id::text, s, 1 FROM users_test, unnest(ARRAY['scans', 'configs']) s WHERE email LIKE %(email)s
+    """,
+)
+
+SEEDED_TABLES = (
+    "users_test", "github_users", "selected_repos", "repo_configs", "scan_history", "file_blobs",
+    "file_contents", "findings", "user_scan_stats", "user_data_versions",
+)
+
+def hot_queries(probe):
+    """{name: (sql, params)} of the hot read queries, with the probe user's values bound.
+
+    The SQL is the routes' own (History.py, risks.py, dashboard_routes.py
+    through utils.scan_stats, the commit cache and the HTTP cache), so a
+    change to a route query is what check-plans explains.
+    """
+    from routes.History import HISTORY_DETAIL_QUERY, history_page_query
+    from routes.risks import risks_queries
+    from utils.blob_store import FILE_CONTENTS_QUERY
+    from utils.commit_cache import COMMIT_CACHE_MAX_AGE, REUSE_SCAN_QUERY
+    from utils.http_cache import DATA_VERSION_QUERY
+    from utils.scan_stats import USER_STATS_QUERY
+
+    user_id = probe["user_id"]
+    risks_count, risks_details = risks_queries(user_id, {})
+    window_count, window_details = risks_queries(user_id, {"days": "30"})
+    return {
+        "history list": history_page_query(user_id),
+        "history list by scan type, next page": history_page_query(
+            user_id, "checkov", (probe["created_at"], probe["scan_id"])
+        ),
+        "history detail": (HISTORY_DETAIL_QUERY, (probe["scan_id"], user_id)),
+        "history files": (FILE_CONTENTS_QUERY, (probe["scan_id"],)),
+        "stats": (USER_STATS_QUERY, (user_id,)),
+        "risks, latest scans": risks_count,
+        "risks details, latest scans": risks_details,
+        "risks, time window": window_count,
+        "risks details, time window": window_details,
+        "commit cache reuse": (
+            REUSE_SCAN_QUERY,
+            (user_id, probe["repo_url"], probe["commit_sha"], "checkov", "plancheck", COMMIT_CACHE_MAX_AGE)
+        ),
+        "data version": (DATA_VERSION_QUERY, (user_id, "scans")),
+        # github_routes.py
+        "github token": ("SELECT access_token FROM github_users WHERE user_id = %s", (user_id,)),
+        "github user by github id": ("SELECT user_id FROM github_users WHERE github_id = %s", (probe["github_id"],)),
+        "selected repos": ("SELECT id, full_name, html_url FROM selected_repos WHERE user_id = %s", (user_id,)),
+        "repo configs": (
+            """
+            SELECT rc.id, rc.file_path, rc.file_name, rc.content, rc.sha, sr.full_name, sr.html_url, rc.framework
+            FROM repo_configs rc
+            JOIN selected_repos sr ON rc.repo_id = sr.id
+            WHERE sr.user_id = %s
+            """,
+            (user_id,)
+        ),
+    }
+
+
+def _seq_scans(plan, tables):
+    """Relations read by a sequential scan anywhere in an EXPLAIN (FORMAT JSON) plan node."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in tables:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child, tables))
+    return found
+
+
+def check_plans():
+    """EXPLAIN every hot query on seeded data; returns {query name: [seq-scanned tables]}."""
+    results = {}
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            params = {"users": SEED_USERS, "scans": SEED_SCANS_PER_USER, "email": SEED_EMAIL}
+            for statement in SEED_SQL:
+                cursor.execute(statement, params)
+            for table in SEEDED_TABLES:
+                cursor.execute(f"ANALYZE {table}")
+
+            cursor.execute(
+                """
+                SELECT u.id, sh.id, sh.created_at, sh.repo_url, sh.commit_sha, gu.github_id
+                FROM users_test u
+                JOIN scan_history sh ON sh.user_id = u.id
+                JOIN github_users gu ON gu.user_id = u.id
+                WHERE u.email = %s
+                ORDER BY sh.id
+                LIMIT 1
+                """,
+                (SEED_EMAIL.replace("%", str(SEED_USERS // 2)),)
+            )
+            user_id, scan_id, created_at, repo_url, commit_sha, github_id = cursor.fetchone()
+            probe = {
+                "user_id": str(user_id), "scan_id": scan_id, "created_at": created_at, "repo_url": repo_url,
+                "commit_sha": commit_sha, "github_id": github_id,
+            }
+            for name, (sql, params) in hot_queries(probe).items():
+                cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                results[name] = _seq_scans(plan[0]["Plan"], SEEDED_TABLES)
+        conn.rollback()
+    return results
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) == 2 else None
+    logging.basicConfig(level=logging.INFO)
+    if command == "upgrade":
+        applied = upgrade()
+        print(f"{len(applied)} migration(s) applied" + (f": {applied}" if applied else ""))
+    elif command == "status":
+        for version, name, state in status():
+            print(f"{version:04d}_{name}: {state}")
+    elif command == "check-plans":
+        failures = 0
+        for name, tables in check_plans().items():
+            print(f"{'SEQ SCAN' if tables else 'ok':>8}  {name}" + (f" ({', '.join(tables)})" if tables else ""))
+            failures += bool(tables)
+        sys.exit(1 if failures else 0)
+    else:
+        sys.exit("usage: python -m utils.migrations upgrade|status|check-plans")
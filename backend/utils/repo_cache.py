@@ -0,0 +1,195 @@
+"""On-disk cache of bare repository mirrors.
+
+The first scan of a repository runs `git clone --mirror` into the cache; later
+scans only `fetch` the new objects. Each request then gets its own checkout
+cloned from the local mirror (objects are hard-linked, so this is cheap and
+independent of the mirror afterwards). Requests for the same repository are
+serialized by a per-mirror lock, across processes too where fcntl exists.
+Mirrors are evicted least-recently-used first once the cache exceeds
+REPO_CACHE_MAX_BYTES.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+from utils.git_utils import run_git, sparse_clone
+
+logger = logging.getLogger(__name__)
+
+REPO_CACHE_ENABLED = os.getenv("REPO_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+REPO_CACHE_DIR = os.getenv("REPO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "iac-repo-mirrors"))
+REPO_CACHE_MAX_BYTES = int(os.getenv("REPO_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class RepoMirrorCache:
+    def __init__(self, root, max_bytes, enabled=True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "fetch_errors": 0, "evictions": 0, "evicted_bytes": 0}
+
+    def _count(self, name, amount=1):
+        with self._locks_guard:
+            self.stats[name] += amount
+
+    def _mirror_dir(self, repo_url):
+        return os.path.join(self.root, hashlib.sha256(repo_url.encode("utf-8")).hexdigest()[:32] + ".git")
+
+    def _thread_lock(self, mirror_dir):
+        with self._locks_guard:
+            return self._locks.setdefault(mirror_dir, threading.Lock())
+
+    def _acquire(self, mirror_dir, blocking=True):
+        """Take the in-process and on-disk locks of a mirror; returns the lock file handle or None."""
+        lock = self._thread_lock(mirror_dir)
+        if not lock.acquire(blocking):
+            return None
+        handle = open(mirror_dir + ".lock", "a")
+        if fcntl:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except OSError:
+                handle.close()
+                lock.release()
+                return None
+        return handle
+
+    def _release(self, mirror_dir, handle):
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+        self._thread_lock(mirror_dir).release()
+
+    def _update_mirror(self, repo_url, mirror_dir):
+        if os.path.isdir(mirror_dir):
+            try:
+                run_git(["--git-dir", mirror_dir, "remote", "update", "--prune"])
+                self._count("hits")
+                return
+            except subprocess.CalledProcessError as e:
+                # A broken mirror is rebuilt rather than trusted
+                logger.warning(f"Fetch into mirror of {repo_url} failed, recloning: {e.stderr}")
+                self._count("fetch_errors")
+                shutil.rmtree(mirror_dir, ignore_errors=True)
+
+        self._count("misses")
+        partial_dir = mirror_dir + ".partial"
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        run_git(["clone", "--mirror", repo_url, partial_dir])
+        os.replace(partial_dir, mirror_dir)
+
+    def checkout(self, repo_url, dest_dir):
+        """Check out the default branch of repo_url into dest_dir (new or empty) through the mirror.
+
+        Raises subprocess.CalledProcessError if the repository cannot be fetched.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        mirror_dir = self._mirror_dir(repo_url)
+        handle = self._acquire(mirror_dir)
+        try:
+            self._update_mirror(repo_url, mirror_dir)
+            run_git(["clone", "--local", "--quiet", mirror_dir, dest_dir])
+            os.utime(mirror_dir + ".lock")
+        finally:
+            self._release(mirror_dir, handle)
+        # Later fetches from the checkout (e.g. an older base commit) go to the real remote
+        run_git(["remote", "set-url", "origin", repo_url], cwd=dest_dir)
+        self.evict()
+
+    def _mirrors(self):
+        """Return (last_used, size, mirror_dir) for every cached mirror."""
+        mirrors = []
+        if not os.path.isdir(self.root):
+            return mirrors
+        for name in os.listdir(self.root):
+            mirror_dir = os.path.join(self.root, name)
+            if not name.endswith(".git") or not os.path.isdir(mirror_dir):
+                continue
+            try:
+                last_used = os.path.getmtime(mirror_dir + ".lock")
+            except OSError:
+                last_used = 0
+            mirrors.append((last_used, _dir_size(mirror_dir), mirror_dir))
+        return mirrors
+
+    def evict(self):
+        """Remove least recently used mirrors until the cache fits in max_bytes; busy mirrors are skipped."""
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            mirrors = sorted(self._mirrors())
+            total = sum(size for _, size, _ in mirrors)
+            for _, size, mirror_dir in mirrors:
+                if total <= self.max_bytes:
+                    break
+                handle = self._acquire(mirror_dir, blocking=False)
+                if handle is None:
+                    continue
+                try:
+                    shutil.rmtree(mirror_dir, ignore_errors=True)
+                    os.remove(mirror_dir + ".lock")
+                finally:
+                    self._release(mirror_dir, handle)
+                with self._locks_guard:
+                    self._locks.pop(mirror_dir, None)
+                total -= size
+                self._count("evictions")
+                self._count("evicted_bytes", size)
+                logger.info(f"Evicted repository mirror {mirror_dir} ({size} bytes)")
+        finally:
+            self._evict_lock.release()
+
+    def snapshot(self):
+        mirrors = self._mirrors()
+        with self._locks_guard:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "enabled": self.enabled,
+                "mirrors": len(mirrors),
+                "size_bytes": sum(size for _, size, _ in mirrors),
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            }
+
+
+repo_cache = RepoMirrorCache(REPO_CACHE_DIR, REPO_CACHE_MAX_BYTES, REPO_CACHE_ENABLED)
+
+
+def clone_repo(repo_url, dest_dir, sparse_patterns=None):
+    """Check out repo_url into dest_dir and return how it was checked out.
+
+    With sparse_patterns a blob-less sparse clone is made straight from the
+    remote (the mirror holds every blob, so it would not save anything);
+    otherwise the mirror cache is used when it is enabled.
+    """
+    if sparse_patterns:
+        return sparse_clone(repo_url, dest_dir, sparse_patterns)
+    if repo_cache.enabled:
+        repo_cache.checkout(repo_url, dest_dir)
+        return {"mode": "mirror"}
+    run_git(["clone", "--depth", "1", repo_url, dest_dir])
+    return {"mode": "shallow"}
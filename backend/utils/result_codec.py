@@ -0,0 +1,137 @@
+"""Compact, lossless encoding of scan results.
+
+In a full result every entry of results.passed_checks / results.failed_checks
+repeats its file path, check name and guideline. The compact form groups the
+checks by file, stores each distinct string once in results.strings, and
+writes each check as a row of values in the order of results.columns[kind],
+with string columns (results.interned[kind]) replaced by string indexes.
+Passed checks thus shrink to a few integers plus their line range. Each
+file group records where its checks sat in the original lists as
+[start, length] runs, so expand_result() restores them in order; a check that
+does not fit the columns is kept as {"raw": check}.
+
+Clients opt in with ?format=compact or an Accept header naming
+COMPACT_MEDIA_TYPE. Stored scan_result rows are compacted when
+SCAN_RESULT_FORMAT=compact; readers call expand_result(), which leaves full
+results untouched.
+"""
+import os
+
+from flask import request
+
+COMPACT_FORMAT = "compact/1"
+COMPACT_MEDIA_TYPE = "application/vnd.scan-result.compact+json"
+SCAN_RESULT_FORMAT = os.getenv("SCAN_RESULT_FORMAT", "full")
+
+CHECK_KINDS = ("failed_checks", "passed_checks")
+_COMPACT_KEYS = ("format", "strings", "columns", "interned", "files")
+
+
+def is_compact(result):
+    results = result.get("results") if isinstance(result, dict) else None
+    return isinstance(results, dict) and results.get("format") == COMPACT_FORMAT
+
+
+def _add_position(runs, position):
+    if runs and runs[-1][0] + runs[-1][1] == position:
+        runs[-1][1] += 1
+    else:
+        runs.append([position, 1])
+
+
+def compact_result(result):
+    """Return the compact form of a result dict; other values are returned as is."""
+    results = result.get("results") if isinstance(result, dict) else None
+    if (not isinstance(results, dict) or any(key in results for key in _COMPACT_KEYS)
+            or not any(isinstance(results.get(kind), list) for kind in CHECK_KINDS)):
+        return result
+
+    strings, string_ids = [], {}
+
+    def intern(value):
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    compacted = {key: value for key, value in results.items() if key not in CHECK_KINDS}
+    columns, interned, files, groups = {}, {}, [], {}
+    for kind in CHECK_KINDS:
+        checks = results.get(kind)
+        if not isinstance(checks, list):
+            continue
+        dict_checks = [check for check in checks if isinstance(check, dict)]
+        kind_columns = list(dict.fromkeys(key for check in dict_checks for key in check if key != "file_path"))
+        kind_interned = [
+            column for column in kind_columns
+            if all(isinstance(check[column], str) or check[column] is None for check in dict_checks if column in check)
+        ]
+        columns[kind], interned[kind] = kind_columns, kind_interned
+        expected_keys = set(kind_columns) | {"file_path"}
+
+        for position, check in enumerate(checks):
+            as_row = (isinstance(check, dict) and isinstance(check.get("file_path"), str)
+                      and check.keys() == expected_keys)
+            file_path = check["file_path"] if as_row else None
+            group = groups.get(file_path)
+            if group is None:
+                group = groups[file_path] = {"file": intern(file_path) if file_path is not None else None}
+                files.append(group)
+            entry = group.setdefault(kind, {"order": [], "rows": []})
+            _add_position(entry["order"], position)
+            if as_row:
+                entry["rows"].append([
+                    intern(check[column]) if column in kind_interned and check[column] is not None else check[column]
+                    for column in kind_columns
+                ])
+            else:
+                entry["rows"].append({"raw": check})
+
+    compacted.update({
+        "format": COMPACT_FORMAT, "strings": strings, "columns": columns, "interned": interned, "files": files,
+    })
+    return {**result, "results": compacted}
+
+
+def expand_result(result):
+    """Return the full form of a compact result; full results are returned as is."""
+    if not is_compact(result):
+        return result
+    results = result["results"]
+    strings = results["strings"]
+    expanded = {key: value for key, value in results.items() if key not in _COMPACT_KEYS}
+    for kind, kind_columns in results["columns"].items():
+        kind_interned = set(results["interned"].get(kind, ()))
+        total = sum(length for group in results["files"] for _, length in group.get(kind, {}).get("order", ()))
+        checks = [None] * total
+        for group in results["files"]:
+            entry = group.get(kind)
+            if not entry:
+                continue
+            positions = (start + offset for start, length in entry["order"] for offset in range(length))
+            for position, row in zip(positions, entry["rows"]):
+                if isinstance(row, dict):
+                    checks[position] = row["raw"]
+                    continue
+                check = {"file_path": strings[group["file"]]}
+                for column, value in zip(kind_columns, row):
+                    check[column] = strings[value] if column in kind_interned and value is not None else value
+                checks[position] = check
+        expanded[kind] = checks
+    return {**result, "results": expanded}
+
+
+def stored_result(result):
+    """The form a result is written to scan_history in, per SCAN_RESULT_FORMAT."""
+    return compact_result(result) if SCAN_RESULT_FORMAT == "compact" else result
+
+
+def wants_compact():
+    """Whether the current request asked for compact results."""
+    return (request.args.get("format") == "compact"
+            or COMPACT_MEDIA_TYPE in request.headers.get("Accept", ""))
+
+
+def render_result(payload):
+    """A scan payload in the format the current request asked for."""
+    return compact_result(payload) if wants_compact() else expand_result(payload)
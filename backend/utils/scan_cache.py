@@ -0,0 +1,159 @@
+"""Content-addressed cache of per-file Checkov results.
+
+Entries are keyed by a hash of the file bytes, the detected framework and the
+Checkov version/ruleset, so an identical file is never scanned twice by the
+same Checkov. Stored results are path-independent (the caller re-attaches the
+file path). The first tier is an in-process LRU, the second a Postgres table
+shared by all workers and trimmed by last use.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from psycopg2.extras import Json
+
+from utils.db import db_connection, DatabaseUnavailable
+
+logger = logging.getLogger(__name__)
+
+SCAN_CACHE_ENABLED = os.getenv("SCAN_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SCAN_CACHE_SIZE = int(os.getenv("SCAN_CACHE_SIZE", "1024"))
+SCAN_CACHE_DB_MAX_ROWS = int(os.getenv("SCAN_CACHE_DB_MAX_ROWS", "20000"))
+# Bump to invalidate every entry when custom policies change
+CHECKOV_RULESET_VERSION = os.getenv("CHECKOV_RULESET_VERSION", "default")
+SCAN_CACHE_PRUNE_EVERY = 100
+
+
+def content_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_cache_key(file_hash, framework, checkov_version):
+    return hashlib.sha256(
+        f"{file_hash}:{framework}:{checkov_version}:{CHECKOV_RULESET_VERSION}".encode("utf-8")
+    ).hexdigest()
+
+
+class ScanResultCache:
+    def __init__(self, max_entries, db_max_rows, enabled=True):
+        self.max_entries = max_entries
+        self.db_max_rows = db_max_rows
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "evictions": 0, "db_errors": 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get(self, key):
+        """Return the cached {"failed_checks", "passed_checks"} entry, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry
+
+        entry = self._db_get(key)
+        if entry is not None:
+            self._count("db_hits")
+            self._remember(key, entry)
+            return entry
+        self._count("misses")
+        return None
+
+    def set(self, key, failed_checks, passed_checks):
+        if not self.enabled:
+            return
+        # Drop the per-scan fields so the entry can be reused for any path
+        entry = {
+            "failed_checks": [
+                {k: v for k, v in check.items() if k not in ("file_path", "suggestion", "suggestion_status", "finding_id")}
+                for check in failed_checks
+            ],
+            "passed_checks": [{k: v for k, v in check.items() if k != "file_path"} for check in passed_checks],
+        }
+        self._remember(key, entry)
+        self._db_set(key, entry)
+
+    def _db_get(self, key):
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "UPDATE checkov_result_cache SET last_used_at = NOW() WHERE cache_key = %s RETURNING result",
+                        (key,)
+                    )
+                    row = cursor.fetchone()
+                conn.commit()
+                return row[0] if row else None
+        except DatabaseUnavailable:
+            return None
+        except Exception as e:
+            logger.warning(f"Scan cache lookup failed for {key}: {str(e)}")
+            self._count("db_errors")
+            return None
+
+    def _db_set(self, key, entry):
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        INSERT INTO checkov_result_cache (cache_key, result) VALUES (%s, %s)
+                        ON CONFLICT (cache_key) DO UPDATE SET result = EXCLUDED.result, last_used_at = NOW()
+                        """,
+                        (key, Json(entry))
+                    )
+                    with self._lock:
+                        self._writes += 1
+                        prune = self._writes % SCAN_CACHE_PRUNE_EVERY == 0
+                    if prune:
+                        cursor.execute(
+                            """
+                            DELETE FROM checkov_result_cache WHERE cache_key IN (
+                                SELECT cache_key FROM checkov_result_cache ORDER BY last_used_at DESC OFFSET %s
+                            )
+                            """,
+                            (self.db_max_rows,)
+                        )
+                        self._count("evictions", cursor.rowcount)
+                conn.commit()
+        except DatabaseUnavailable:
+            return
+        except Exception as e:
+            logger.warning(f"Scan cache write failed for {key}: {str(e)}")
+            self._count("db_errors")
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats["memory_hits"] + self.stats["db_hits"] + self.stats["misses"]
+            hits = self.stats["memory_hits"] + self.stats["db_hits"]
+            return {
+                **self.stats,
+                "enabled": self.enabled,
+                "memory_entries": len(self._entries),
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+scan_cache = ScanResultCache(SCAN_CACHE_SIZE, SCAN_CACHE_DB_MAX_ROWS, SCAN_CACHE_ENABLED)
@@ -0,0 +1,104 @@
+"""Per-user scan statistics rollup.
+
+user_scan_stats keeps, per (user_id, scan_type), the running totals behind
+/stats: number of scans, passed and failed checks, and the sum and count of
+scores. Every code path that inserts into scan_history calls record_scan()
+with the same cursor, so the rollup commits or rolls back with the scan.
+
+Existing history is folded in with:
+
+    python -m utils.scan_stats backfill
+"""
+import logging
+import sys
+
+from utils.db import db_connection
+
+logger = logging.getLogger(__name__)
+
+def _as_int(value):
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def scan_counts(scan_result):
+    """(passed, failed, score) of a stored scan_result, as /stats has always read them."""
+    results = (scan_result or {}).get("results")
+    if not isinstance(results, dict):
+        return 0, 0, None
+    summary = results.get("summary") if isinstance(results.get("summary"), dict) else {}
+    return _as_int(summary.get("passed")) or 0, _as_int(summary.get("failed")) or 0, _as_int(results.get("score"))
+
+
+def record_scan(cursor, user_id, scan_type, scan_result):
+    """Add one scan to the user's rollup, inside the caller's transaction."""
+    passed, failed, score = scan_counts(scan_result)
+    cursor.execute(
+        """
+        INSERT INTO user_scan_stats AS s (user_id, scan_type, total_scans, passed, failed, score_sum, score_count)
+        VALUES (%s, %s, 1, %s, %s, %s, %s)
+        ON CONFLICT (user_id, scan_type) DO UPDATE SET
+            total_scans = s.total_scans + 1,
+            passed = s.passed + EXCLUDED.passed,
+            failed = s.failed + EXCLUDED.failed,
+            score_sum = s.score_sum + EXCLUDED.score_sum,
+            score_count = s.score_count + EXCLUDED.score_count,
+            updated_at = NOW()
+        """,
+        (str(user_id), scan_type or "unknown", passed, failed, score or 0, int(score is not None))
+    )
+
+
+USER_STATS_QUERY = """
+    SELECT COALESCE(SUM(total_scans), 0), COALESCE(SUM(passed), 0), COALESCE(SUM(failed), 0),
+           COALESCE(SUM(score_sum), 0), COALESCE(SUM(score_count), 0)
+    FROM user_scan_stats
+    WHERE user_id = %s
+"""
+
+
+def user_stats(cursor, user_id):
+    """Totals over all scan types for one user: (total_scans, passed, failed, score_sum, score_count)."""
+    cursor.execute(USER_STATS_QUERY, (str(user_id),))
+    return tuple(int(value) for value in cursor.fetchone())
+
+
+def backfill():
+    """Rebuild user_scan_stats from scan_history in one transaction."""
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            # Block record_scan() until the rebuild commits, so no increment is lost or counted twice
+            cursor.execute("LOCK TABLE user_scan_stats IN SHARE ROW EXCLUSIVE MODE")
+            cursor.execute("DELETE FROM user_scan_stats")
+            cursor.execute(
+                r"""
+                INSERT INTO user_scan_stats (user_id, scan_type, total_scans, passed, failed, score_sum, score_count)
+                SELECT user_id::text, COALESCE(scan_type, 'unknown'), COUNT(*),
+                       COALESCE(SUM(passed), 0), COALESCE(SUM(failed), 0),
+                       COALESCE(SUM(score), 0), COUNT(score)
+                FROM (
+                    SELECT user_id, scan_type,
+                           CASE WHEN scan_result->'results'->'summary'->>'passed' ~ '^-?\d+$'
+                                THEN (scan_result->'results'->'summary'->>'passed')::bigint END AS passed,
+                           CASE WHEN scan_result->'results'->'summary'->>'failed' ~ '^-?\d+$'
+                                THEN (scan_result->'results'->'summary'->>'failed')::bigint END AS failed,
+                           CASE WHEN scan_result->'results'->>'score' ~ '^-?\d+$'
+                                THEN (scan_result->'results'->>'score')::bigint END AS score
+                    FROM scan_history
+                ) scans
+                GROUP BY user_id, scan_type
+                """
+            )
+            rows = cursor.rowcount
+        conn.commit()
+    logger.info(f"user_scan_stats rebuilt: {rows} (user, scan_type) rows")
+    return rows
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        sys.exit("usage: python -m utils.scan_stats backfill")
+    logging.basicConfig(level=logging.INFO)
+    print(f"{backfill()} rows written to user_scan_stats")
@@ -0,0 +1,142 @@
+"""Persistence of scans, shared by the Checkov and Semgrep routes.
+
+save_scan() writes everything belonging to one scan in a single transaction:
+the selected_repos link, the scan_history row, the per-user stats rollup,
+the normalized findings and the scanned files. File contents go to the
+deduplicated blob store (utils.blob_store) and file_contents rows, which only
+reference blobs, go out as multi-row INSERTs instead of one round trip per
+file.
+
+Measure the file_contents write path against a database with:
+
+    python -m utils.scan_store bench <user_id> [files] [bytes_per_file]
+
+The benchmark runs in a transaction that is rolled back.
+"""
+import logging
+import sys
+import time
+
+from psycopg2.extras import Json, execute_values
+
+from utils.blob_store import store_blobs
+from utils.db import db_connection, db_cursor
+from utils.findings import record_findings
+from utils.http_cache import bump_version
+from utils.result_codec import stored_result
+from utils.scan_stats import record_scan
+
+logger = logging.getLogger(__name__)
+
+# One INSERT carries at most this many file_contents rows
+FILE_CONTENTS_BATCH_ROWS = 500
+
+
+def link_repo(cursor, user_id, repo_url):
+    """Return the selected_repos id of repo_url, adding the repository if it is new."""
+    repo_name = repo_url.split("/")[-2] + "/" + repo_url.split("/")[-1]
+    cursor.execute("SELECT id FROM selected_repos WHERE full_name = %s", (repo_name,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    cursor.execute(
+        "INSERT INTO selected_repos (user_id, full_name, html_url) VALUES (%s, %s, %s) RETURNING id",
+        (user_id, repo_name, repo_url)
+    )
+    repo_id = cursor.fetchone()[0]
+    bump_version(cursor, user_id, "configs")
+    return repo_id
+
+
+def insert_file_contents(cursor, scan_id, files, input_type):
+    """Store files as blobs and reference them with multi-row INSERTs.
+
+    files are (file_path, content) pairs, or (file_path, content, sha256)
+    triples when the caller already hashed the content.
+    """
+    hashes = store_blobs(
+        cursor, [entry[1] for entry in files], [entry[2] if len(entry) > 2 else None for entry in files]
+    )
+    rows = [(scan_id, entry[0], digest, input_type) for entry, digest in zip(files, hashes)]
+    execute_values(
+        cursor,
+        "INSERT INTO file_contents (scan_id, file_path, blob_hash, input_type) VALUES %s",
+        rows,
+        page_size=FILE_CONTENTS_BATCH_ROWS
+    )
+    return len(rows)
+
+
+def save_file_contents(cursor, scan_id, files, input_type):
+    """Save files in the caller's transaction.
+
+    A failure propagates, so the whole scan is rolled back with it: a scan is
+    never stored without the files it was run on.
+    """
+    try:
+        count = insert_file_contents(cursor, scan_id, files, input_type)
+    except Exception as e:
+        logger.error(f"Failed to save file contents for scan_id {scan_id}: {str(e)}")
+        raise
+    logger.info(f"Saved {count} file contents for scan_id {scan_id}")
+
+
+def save_scan(user_id, scan_type, result, input_type, status, score=None, compliant=None, repo_url=None,
+              files=None, commit_sha=None, scanner_version=None, link_repository=False):
+    """Write a scan, its rollup, findings and files in one transaction; returns the scan id."""
+    with db_cursor(commit=True) as cursor:
+        repo_id = link_repo(cursor, user_id, repo_url) if repo_url and link_repository else None
+        cursor.execute(
+            """
+            INSERT INTO scan_history (user_id, repo_id, scan_result, repo_url, status, score, compliant, input_type,
+                                      scan_type, commit_sha, scanner_version)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+            """,
+            (user_id, repo_id, Json(stored_result(result)), repo_url, status, score, compliant, input_type,
+             scan_type, commit_sha, scanner_version)
+        )
+        scan_id = cursor.fetchone()[0]
+        record_scan(cursor, user_id, scan_type, result)
+        record_findings(cursor, scan_id, user_id, scan_type, result)
+        bump_version(cursor, user_id, "scans")
+        if files:
+            save_file_contents(cursor, scan_id, files, input_type)
+    return scan_id
+
+
+def bench(user_id, files=500, bytes_per_file=4096):
+    """Rows/s of one inline INSERT per file against the blob-store path, on the same connection."""
+    content = "x" * bytes_per_file
+    rows = [(f"bench/file_{i}.tf", content) for i in range(files)]
+    timings = {}
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO scan_history (user_id, scan_result, status, input_type, scan_type) "
+                "VALUES (%s, '{}', 'bench', 'bench', 'bench') RETURNING id",
+                (user_id,)
+            )
+            scan_id = cursor.fetchone()[0]
+
+            started = time.perf_counter()
+            for file_path, text in rows:
+                cursor.execute(
+                    "INSERT INTO file_contents (scan_id, file_path, content, input_type) VALUES (%s, %s, %s, %s)",
+                    (scan_id, file_path, text, "bench")
+                )
+            timings["row_by_row"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            insert_file_contents(cursor, scan_id, rows, "bench")
+            timings["batched"] = time.perf_counter() - started
+        conn.rollback()
+    return {name: round(files / seconds) for name, seconds in timings.items()}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "bench":
+        sys.exit("usage: python -m utils.scan_store bench <user_id> [files] [bytes_per_file]")
+    args = [int(arg) for arg in sys.argv[3:5]]
+    for name, rate in bench(sys.argv[2], *args).items():
+        print(f"{name:>12}: {rate} rows/s")
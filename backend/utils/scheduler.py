@@ -0,0 +1,324 @@
+"""Admission control and per-user fair scheduling of scans.
+
+Every scan (Checkov, the Semgrep proxy, /scan) runs inside
+scan_scheduler.slot(user_id). At most SCAN_MAX_CONCURRENT scans run at once,
+and at most SCAN_MAX_PER_USER for one user; the others wait in per-user FIFO
+queues. When a slot frees up, the head waiter with the smallest virtual finish
+tag goes next (weighted fair queuing): each scan advances its user's virtual
+clock by 1/weight, so ten scans queued by one user do not delay another user's
+single scan. Past SCAN_MAX_QUEUED waiting scans (SCAN_MAX_QUEUED_PER_USER for
+one user) new scans are refused with SchedulerBusy, which the app answers with
+429 and a Retry-After estimate.
+
+Background scans queue with submit() instead: they wait in the same queues
+without holding a thread, and their start callback runs when the slot is
+granted.
+"""
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+SCAN_MAX_CONCURRENT = int(os.getenv("SCAN_MAX_CONCURRENT", "4"))
+SCAN_MAX_PER_USER = int(os.getenv("SCAN_MAX_PER_USER", "2"))
+SCAN_MAX_QUEUED = int(os.getenv("SCAN_MAX_QUEUED", "50"))
+SCAN_MAX_QUEUED_PER_USER = int(os.getenv("SCAN_MAX_QUEUED_PER_USER", "10"))
+SCAN_QUEUE_TIMEOUT = int(os.getenv("SCAN_QUEUE_TIMEOUT", "600"))
+# "user_id:weight" pairs, e.g. "12:2,40:0.5"; users not listed have weight 1
+SCAN_USER_WEIGHTS = os.getenv("SCAN_USER_WEIGHTS", "")
+
+
+def parse_weights(value):
+    weights = {}
+    for item in value.split(","):
+        user_id, _, weight = item.strip().partition(":")
+        if user_id and weight:
+            try:
+                weights[user_id] = max(float(weight), 0.01)
+            except ValueError:
+                logger.warning(f"Ignoring invalid scan weight {item!r}")
+    return weights
+
+
+class SchedulerBusy(Exception):
+    """The scan queues are full; retry_after is a wait estimate in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("user_id", "start_tag", "finish_tag", "granted", "enqueued_at", "start", "refuse")
+
+    def __init__(self, user_id, start_tag, finish_tag, start=None, refuse=None):
+        self.user_id = user_id
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.granted = False
+        self.enqueued_at = time.monotonic()
+        # Background waiters: start(release) runs once granted, refuse(error) on timeout
+        self.start = start
+        self.refuse = refuse
+
+
+class ScanScheduler:
+    def __init__(self, max_concurrent, max_per_user, max_queued, max_queued_per_user, queue_timeout, weights=None):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.queue_timeout = queue_timeout
+        self.weights = weights or {}
+        self._cond = threading.Condition()
+        self._running = {}
+        self._queues = {}
+        self._finish_tags = {}
+        self._virtual_time = 0.0
+        self._avg_duration = 30.0
+        self.stats = {
+            "admitted": 0, "rejected": 0, "timeouts": 0, "completed": 0,
+            "waited": 0, "total_wait_seconds": 0.0, "max_wait_seconds": 0.0,
+        }
+
+    def _queued(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _retry_after(self):
+        return max(1, math.ceil(self._avg_duration * (self._queued() + 1) / self.max_concurrent))
+
+    def _reject(self, message):
+        self.stats["rejected"] += 1
+        raise SchedulerBusy(message, self._retry_after())
+
+    def _check_queue_room(self, user_id, pending=0):
+        if self._queued() - pending >= self.max_queued:
+            self._reject("Trop d'analyses en attente, réessayez plus tard")
+        if len(self._queues.get(user_id, ())) - pending >= self.max_queued_per_user:
+            self._reject("Trop d'analyses en attente pour cet utilisateur, réessayez plus tard")
+
+    def check_admission(self, user_id):
+        """Raise SchedulerBusy right away if a new scan from user_id would be refused."""
+        with self._cond:
+            if sum(self._running.values()) < self.max_concurrent and self._running.get(str(user_id), 0) < self.max_per_user:
+                return
+            self._check_queue_room(str(user_id))
+
+    def _record_wait(self, waiter):
+        waited = time.monotonic() - waiter.enqueued_at
+        self.stats["admitted"] += 1
+        if waited > 0.01:
+            self.stats["waited"] += 1
+        self.stats["total_wait_seconds"] += waited
+        self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+
+    def _expire(self):
+        """Drop background waiters past the queue timeout; the caller holds the condition."""
+        deadline = time.monotonic() - self.queue_timeout
+        expired = [
+            waiter for queue in self._queues.values() for waiter in queue
+            if waiter.start and waiter.enqueued_at <= deadline
+        ]
+        for waiter in expired:
+            self._dequeue(waiter)
+            self.stats["timeouts"] += 1
+            self.stats["rejected"] += 1
+        return [
+            (waiter, SchedulerBusy("Délai d'attente de l'analyse dépassé, réessayez plus tard", self._retry_after()))
+            for waiter in expired
+        ]
+
+    def _grant(self):
+        """Start queued scans while slots are free; the caller holds the condition.
+
+        Returns the background waiters granted, and the (waiter, error) pairs
+        of those that expired, to pass to _notify() once the condition is
+        released.
+        """
+        expired = self._expire()
+        started = []
+        granted = False
+        while sum(self._running.values()) < self.max_concurrent:
+            heads = [
+                queue[0] for user_id, queue in self._queues.items()
+                if self._running.get(user_id, 0) < self.max_per_user
+            ]
+            if not heads:
+                break
+            waiter = min(heads, key=lambda w: w.finish_tag)
+            queue = self._queues[waiter.user_id]
+            queue.popleft()
+            if not queue:
+                del self._queues[waiter.user_id]
+            waiter.granted = True
+            self._running[waiter.user_id] = self._running.get(waiter.user_id, 0) + 1
+            self._virtual_time = max(self._virtual_time, waiter.start_tag)
+            granted = True
+            if waiter.start:
+                self._record_wait(waiter)
+                started.append(waiter)
+        if granted:
+            self._cond.notify_all()
+        return started, expired
+
+    def _notify(self, started, expired):
+        """Run the callbacks of background waiters, outside the condition."""
+        for waiter, error in expired:
+            waiter.refuse(error)
+        for waiter in started:
+            started_at = time.monotonic()
+            try:
+                waiter.start(lambda user_id=waiter.user_id, started_at=started_at: self._release(user_id, started_at))
+            except Exception as e:
+                logger.error(f"Failed to start queued scan of user {waiter.user_id}: {str(e)}")
+                self._release(waiter.user_id, started_at)
+
+    def _enqueue(self, user_id, start=None, refuse=None):
+        start_tag = max(self._virtual_time, self._finish_tags.get(user_id, 0.0))
+        finish_tag = start_tag + 1.0 / self.weights.get(user_id, 1.0)
+        self._finish_tags[user_id] = finish_tag
+        waiter = _Waiter(user_id, start_tag, finish_tag, start, refuse)
+        self._queues.setdefault(user_id, deque()).append(waiter)
+        return waiter
+
+    def _dequeue(self, waiter):
+        queue = self._queues.get(waiter.user_id)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.user_id]
+
+    def _release(self, user_id, started_at):
+        with self._cond:
+            self._running[user_id] -= 1
+            if not self._running[user_id]:
+                del self._running[user_id]
+                # An idle user keeps no credit or debt on the virtual clock
+                if user_id not in self._queues and self._finish_tags.get(user_id, 0.0) <= self._virtual_time:
+                    self._finish_tags.pop(user_id, None)
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * (time.monotonic() - started_at)
+            self.stats["completed"] += 1
+            ready = self._grant()
+        self._notify(*ready)
+
+    @contextmanager
+    def slot(self, user_id):
+        """Hold one scan slot for user_id, waiting for a fair turn; raises SchedulerBusy."""
+        user_id = str(user_id)
+        with self._cond:
+            waiter = self._enqueue(user_id)
+            ready = self._grant()
+            if not waiter.granted:
+                try:
+                    self._check_queue_room(user_id, pending=1)
+                except SchedulerBusy:
+                    self._dequeue(waiter)
+                    raise
+        self._notify(*ready)
+
+        with self._cond:
+            deadline = waiter.enqueued_at + self.queue_timeout
+            while not waiter.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._dequeue(waiter)
+                    self.stats["timeouts"] += 1
+                    self._reject("Délai d'attente de l'analyse dépassé, réessayez plus tard")
+                self._cond.wait(remaining)
+            self._record_wait(waiter)
+
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(user_id, started_at)
+
+    def submit(self, user_id, start, refuse):
+        """Queue a background scan without blocking the calling thread.
+
+        start(release) is called once the scan is granted a slot and must make
+        sure release() is called when the scan ends. refuse(error) is called
+        with SchedulerBusy if the scan is still queued after the queue timeout
+        (checked whenever a scan is queued or ends). Raises SchedulerBusy at
+        once when the queues are full.
+        """
+        user_id = str(user_id)
+        with self._cond:
+            waiter = self._enqueue(user_id, start, refuse)
+            ready = self._grant()
+            if not waiter.granted:
+                try:
+                    self._check_queue_room(user_id, pending=1)
+                except SchedulerBusy:
+                    self._dequeue(waiter)
+                    raise
+        self._notify(*ready)
+
+    def snapshot(self):
+        with self._cond:
+            admitted = self.stats["admitted"]
+            return {
+                **self.stats,
+                "running": sum(self._running.values()),
+                "queued": self._queued(),
+                "running_by_user": dict(self._running),
+                "queued_by_user": {user_id: len(queue) for user_id, queue in self._queues.items()},
+                "avg_wait_seconds": round(self.stats["total_wait_seconds"] / admitted, 3) if admitted else 0.0,
+                "avg_scan_seconds": round(self._avg_duration, 3),
+                "limits": {
+                    "max_concurrent": self.max_concurrent,
+                    "max_per_user": self.max_per_user,
+                    "max_queued": self.max_queued,
+                    "max_queued_per_user": self.max_queued_per_user,
+                },
+            }
+
+
+scan_scheduler = ScanScheduler(
+    SCAN_MAX_CONCURRENT, SCAN_MAX_PER_USER, SCAN_MAX_QUEUED, SCAN_MAX_QUEUED_PER_USER,
+    SCAN_QUEUE_TIMEOUT, parse_weights(SCAN_USER_WEIGHTS)
+)
+
+
+def discard_path(path):
+    """Remove the input file or directory of a scan; a no-op once the scan removed it itself."""
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not delete {path}: {str(e)}")
+
+
+def run_scheduled(user_id, func, *args, cleanup=None, **kwargs):
+    """Call func(*args, **kwargs) inside a scan slot of user_id.
+
+    cleanup() also runs when the scan is refused or times out in the queue,
+    so input files written before the scan are not left behind.
+    """
+    try:
+        with scan_scheduler.slot(user_id):
+            return func(*args, **kwargs)
+    finally:
+        if cleanup:
+            cleanup()
+
+
+def scheduled_events(user_id, events, cleanup=None):
+    """Run a streaming scan generator inside a scan slot; a full queue becomes an error event."""
+    try:
+        with scan_scheduler.slot(user_id):
+            yield from events
+    except SchedulerBusy as e:
+        yield "error", {"error": str(e), "retry_after": e.retry_after}
+    finally:
+        events.close()
+        if cleanup:
+            cleanup()
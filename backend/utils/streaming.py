@@ -0,0 +1,30 @@
+"""Streaming responses for progressive scan results.
+
+A scan generator yields (event, data) pairs; event_stream_response sends them
+as Server-Sent Events when the client accepts text/event-stream, and as
+newline-delimited JSON otherwise.
+"""
+import json
+
+from flask import Response, request
+
+
+def format_event(event, data, sse):
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, "data": data}) + "\n"
+
+
+def event_stream_response(events):
+    sse = "text/event-stream" in request.headers.get("Accept", "")
+
+    def generate():
+        for event, data in events:
+            yield format_event(event, data, sse)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream" if sse else "application/x-ndjson",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
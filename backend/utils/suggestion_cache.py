@@ -0,0 +1,162 @@
+"""Two-tier cache for Gemini remediation suggestions.
+
+Suggestions are keyed by (check_id, resource type, framework): the same Checkov
+check on the same kind of resource gets the same advice, whatever the file.
+The first tier is an in-process LRU, the second a Postgres table shared by all
+workers. Both tiers expire entries after a TTL and are bounded in size.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.db import db_connection, DatabaseUnavailable
+
+logger = logging.getLogger(__name__)
+
+SUGGESTION_CACHE_SIZE = int(os.getenv("SUGGESTION_CACHE_SIZE", "2048"))
+SUGGESTION_CACHE_TTL = int(os.getenv("SUGGESTION_CACHE_TTL", str(30 * 24 * 3600)))
+SUGGESTION_CACHE_DB_MAX_ROWS = int(os.getenv("SUGGESTION_CACHE_DB_MAX_ROWS", "50000"))
+# Trim the Postgres table once every N writes rather than on every insert
+SUGGESTION_CACHE_PRUNE_EVERY = 100
+
+
+def resource_type(resource, framework):
+    """Reduce a Checkov resource id to its type.
+
+    aws_s3_bucket.logs -> aws_s3_bucket, Deployment.default.web -> Deployment.
+    Dockerfile resources are file paths, so they collapse to the framework.
+    """
+    if not resource or framework == "dockerfile":
+        return framework or "unknown"
+    return resource.split(".")[0]
+
+
+def suggestion_key(check, framework):
+    return (check.get("check_id") or "", resource_type(check.get("resource"), framework), framework or "unknown")
+
+
+class SuggestionCache:
+    def __init__(self, max_entries, ttl, db_max_rows):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_max_rows = db_max_rows
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "evictions": 0, "db_errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _remember(self, key, suggestion, stored_at):
+        with self._lock:
+            self._entries[key] = (suggestion, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get(self, key):
+        """Return the cached suggestion for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+
+        row = self._db_get(key)
+        if row:
+            self._count("db_hits")
+            self._remember(key, row[0], row[1])
+            return row[0]
+        self._count("misses")
+        return None
+
+    def set(self, key, suggestion):
+        self._remember(key, suggestion, time.time())
+        self._db_set(key, suggestion)
+
+    def _db_get(self, key):
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        UPDATE suggestion_cache SET last_used_at = NOW()
+                        WHERE check_id = %s AND resource_type = %s AND framework = %s
+                          AND created_at > NOW() - make_interval(secs => %s)
+                        RETURNING suggestion, EXTRACT(EPOCH FROM created_at)
+                        """,
+                        (*key, self.ttl)
+                    )
+                    row = cursor.fetchone()
+                conn.commit()
+                return (row[0], float(row[1])) if row else None
+        except DatabaseUnavailable:
+            return None
+        except Exception as e:
+            logger.warning(f"Suggestion cache lookup failed for {key}: {str(e)}")
+            self._count("db_errors")
+            return None
+
+    def _db_set(self, key, suggestion):
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        INSERT INTO suggestion_cache (check_id, resource_type, framework, suggestion)
+                        VALUES (%s, %s, %s, %s)
+                        ON CONFLICT (check_id, resource_type, framework)
+                        DO UPDATE SET suggestion = EXCLUDED.suggestion, created_at = NOW(), last_used_at = NOW()
+                        """,
+                        (*key, suggestion)
+                    )
+                    with self._lock:
+                        self._writes += 1
+                        prune = self._writes % SUGGESTION_CACHE_PRUNE_EVERY == 0
+                    if prune:
+                        self._db_prune(cursor)
+                conn.commit()
+        except DatabaseUnavailable:
+            return
+        except Exception as e:
+            logger.warning(f"Suggestion cache write failed for {key}: {str(e)}")
+            self._count("db_errors")
+
+    def _db_prune(self, cursor):
+        """Drop expired rows, then the least recently used ones above the size bound."""
+        cursor.execute(
+            "DELETE FROM suggestion_cache WHERE created_at < NOW() - make_interval(secs => %s)",
+            (self.ttl,)
+        )
+        cursor.execute(
+            """
+            DELETE FROM suggestion_cache WHERE ctid IN (
+                SELECT ctid FROM suggestion_cache ORDER BY last_used_at DESC OFFSET %s
+            )
+            """,
+            (self.db_max_rows,)
+        )
+        with self._lock:
+            self.stats["evictions"] += cursor.rowcount
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats["memory_hits"] + self.stats["db_hits"] + self.stats["misses"]
+            hits = self.stats["memory_hits"] + self.stats["db_hits"]
+            return {
+                **self.stats,
+                "memory_entries": len(self._entries),
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+suggestion_cache = SuggestionCache(SUGGESTION_CACHE_SIZE, SUGGESTION_CACHE_TTL, SUGGESTION_CACHE_DB_MAX_ROWS)
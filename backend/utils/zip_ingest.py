@@ -0,0 +1,111 @@
+"""Selective ZIP ingestion.
+
+Uploaded archives are read through their central directory once: only the
+members a scanner cares about are extracted, and the member count and the
+decompressed size are capped so a ZIP bomb cannot fill the disk. The result
+is a manifest (path, size, sha256, text content) that the scan and the
+file_contents persistence both reuse instead of walking the tree again.
+"""
+import hashlib
+import logging
+import os
+import posixpath
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+ZIP_MAX_MEMBERS = int(os.getenv("ZIP_MAX_MEMBERS", "10000"))
+ZIP_MAX_TOTAL_SIZE = int(os.getenv("ZIP_MAX_TOTAL_SIZE", str(200 * 1024 * 1024)))
+ZIP_MAX_MEMBER_SIZE = int(os.getenv("ZIP_MAX_MEMBER_SIZE", str(20 * 1024 * 1024)))
+
+# Files worth reading back for Semgrep scans
+SEMGREP_EXTENSIONS = (
+    '.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.kt', '.scala', '.go', '.rb', '.php',
+    '.c', '.h', '.cpp', '.cs', '.rs', '.swift', '.sh', '.html', '.json', '.yaml', '.yml', '.tf',
+)
+SEMGREP_FILENAMES = ('Dockerfile',)
+
+CHUNK_SIZE = 1 << 16
+
+
+class ZipLimitError(Exception):
+    """The archive exceeds the member-count or decompressed-size limits."""
+
+
+def is_semgrep_file(file_name):
+    return file_name.endswith(SEMGREP_EXTENSIONS) or file_name in SEMGREP_FILENAMES
+
+
+def _safe_member_path(name):
+    """Return the normalized relative path of a member, or None if it escapes the archive root."""
+    path = posixpath.normpath(name.replace("\\", "/"))
+    if path.startswith(("/", "../")) or path == ".." or ":" in path.split("/")[0]:
+        return None
+    return path
+
+
+def ingest_zip(zip_path, wanted, dest_dir=None):
+    """Read the members of zip_path accepted by wanted(file_name).
+
+    When dest_dir is given the members are also written below it. Returns a
+    manifest sorted by path: dicts with path, abs_path (or None), size,
+    sha256 and content (the UTF-8 text, or None for binary members).
+    Raises ZipLimitError or zipfile.BadZipFile.
+    """
+    manifest = []
+    total_size = 0
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        infos = zip_ref.infolist()
+        if len(infos) > ZIP_MAX_MEMBERS:
+            raise ZipLimitError(f"{len(infos)} members (limit {ZIP_MAX_MEMBERS})")
+
+        for info in infos:
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+            if not wanted(posixpath.basename(info.filename)):
+                continue
+            path = _safe_member_path(info.filename)
+            if path is None:
+                logger.warning(f"Skipping ZIP member outside the archive root: {info.filename}")
+                continue
+            # Header sizes can lie, so the limits are enforced on the bytes actually read
+            if info.file_size > ZIP_MAX_MEMBER_SIZE:
+                raise ZipLimitError(f"{path} is {info.file_size} bytes (limit {ZIP_MAX_MEMBER_SIZE})")
+
+            digest = hashlib.sha256()
+            chunks = []
+            size = 0
+            with zip_ref.open(info) as member:
+                for chunk in iter(lambda: member.read(CHUNK_SIZE), b""):
+                    size += len(chunk)
+                    total_size += len(chunk)
+                    if size > ZIP_MAX_MEMBER_SIZE:
+                        raise ZipLimitError(f"{path} exceeds {ZIP_MAX_MEMBER_SIZE} bytes")
+                    if total_size > ZIP_MAX_TOTAL_SIZE:
+                        raise ZipLimitError(f"archive exceeds {ZIP_MAX_TOTAL_SIZE} decompressed bytes")
+                    digest.update(chunk)
+                    chunks.append(chunk)
+            data = b"".join(chunks)
+
+            abs_path = None
+            if dest_dir:
+                abs_path = os.path.join(dest_dir, *path.split("/"))
+                os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+                with open(abs_path, "wb") as f:
+                    f.write(data)
+
+            try:
+                content = data.decode("utf-8")
+            except UnicodeDecodeError:
+                content = None
+
+            manifest.append({
+                "path": path,
+                "abs_path": abs_path,
+                "size": size,
+                "sha256": digest.hexdigest(),
+                "content": content,
+            })
+
+    manifest.sort(key=lambda entry: entry["path"])
+    return manifest
@@ -1,10 +1,12 @@
-import React, { useState, useEffect, useMemo } from "react";
+import React, { useState, useEffect, useMemo, useCallback } from "react";
 import { toast } from "react-toastify";
 import { XCircleIcon, ChevronDownIcon, ChevronUpIcon, MagnifyingGlassIcon } from "@heroicons/react/24/outline";
 import ResultDisplay from "./ResultDisplay";
 import debounce from "lodash.debounce";
 
 const API_URL = process.env.REACT_APP_API_URL || "http://127.0.0.1:5000";
+// Scans fetched per page of /history; further pages are loaded on demand
+const HISTORY_PAGE_SIZE = 50;
 
 const HistoryModal = ({ isOpen, onClose, userId, scanType }) => {
   const [history, setHistory] = useState([]);
@@ -13,46 +15,74 @@ const HistoryModal = ({ isOpen, onClose, userId, scanType }) => {
   const [searchQuery, setSearchQuery] = useState("");
   const [dateRange, setDateRange] = useState({ from: "", to: "" });
   const [expandedGroups, setExpandedGroups] = useState({});
-
-  // Fetch scan history when modal opens
-  useEffect(() => {
-    if (!isOpen || !userId) return;
-
-    const fetchHistory = async () => {
-      setIsLoading(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+
+  // Fetch one page of the history list; returns null after reporting an error
+  const fetchHistoryPage = useCallback(
+    async (cursor) => {
+      const params = new URLSearchParams({ limit: String(HISTORY_PAGE_SIZE) });
+      if (scanType) params.set("scan_type", scanType === "vulnerability" ? "semgrep" : "checkov");
+      if (cursor) params.set("cursor", cursor);
       try {
-        const scan_type = scanType === "vulnerability" ? "semgrep" : "checkov";
-        const url = scanType
-          ? `${API_URL}/history?scan_type=${scan_type}`
-          : `${API_URL}/history`;
-        const response = await fetch(url, {
+        const response = await fetch(`${API_URL}/history?${params}`, {
           headers: {
             "X-User-ID": userId,
           },
         });
         const data = await response.json();
-        if (response.ok) {
-          setHistory(data);
-        } else {
+        if (!response.ok) {
           toast.error("Erreur lors de la récupération de l'historique", {
             position: "top-right",
             autoClose: 2000,
             theme: "dark",
           });
+          return null;
         }
+        return data;
       } catch (error) {
         toast.error("Erreur réseau", {
           position: "top-right",
           autoClose: 2000,
           theme: "dark",
         });
-      } finally {
-        setIsLoading(false);
+        return null;
       }
+    },
+    [userId, scanType]
+  );
+
+  // Fetch the first page of scan history when modal opens
+  useEffect(() => {
+    if (!isOpen || !userId) return;
+
+    let cancelled = false;
+    const fetchHistory = async () => {
+      setIsLoading(true);
+      const data = await fetchHistoryPage(null);
+      if (cancelled) return;
+      setHistory(data ? data.items : []);
+      setNextCursor(data ? data.next_cursor : null);
+      setIsLoading(false);
     };
 
     fetchHistory();
-  }, [isOpen, userId, scanType]);
+    return () => {
+      cancelled = true;
+    };
+  }, [isOpen, userId, fetchHistoryPage]);
+
+  // Append the next page when the user asks for older scans
+  const loadMoreHistory = async () => {
+    if (!nextCursor || isLoadingMore) return;
+    setIsLoadingMore(true);
+    const data = await fetchHistoryPage(nextCursor);
+    if (data) {
+      setHistory((previous) => [...previous, ...data.items]);
+      setNextCursor(data.next_cursor);
+    }
+    setIsLoadingMore(false);
+  };
 
   // Format date to a readable format
   const formatDate = (isoString) => {
@@ -220,8 +250,31 @@ const HistoryModal = ({ isOpen, onClose, userId, scanType }) => {
   };
 
   // Handle card click to show scan details
-  const handleCardClick = (scan) => {
-    setSelectedScan(scan);
+  // The list leaves out scan_result, so the full scan is fetched on click
+  const handleCardClick = async (scan) => {
+    try {
+      const response = await fetch(`${API_URL}/history/${scan.id}`, {
+        headers: {
+          "X-User-ID": userId,
+        },
+      });
+      const data = await response.json();
+      if (response.ok) {
+        setSelectedScan({ ...scan, scan_result: data.scan_result });
+      } else {
+        toast.error("Erreur lors de la récupération du scan", {
+          position: "top-right",
+          autoClose: 2000,
+          theme: "dark",
+        });
+      }
+    } catch (error) {
+      toast.error("Erreur réseau", {
+        position: "top-right",
+        autoClose: 2000,
+        theme: "dark",
+      });
+    }
   };
 
   // Close scan details
@@ -510,6 +563,19 @@ const HistoryModal = ({ isOpen, onClose, userId, scanType }) => {
             />
           </div>
         )}
+
+        {!isLoading && !selectedScan && nextCursor && (
+          <div className="mt-4 flex justify-center">
+            <button
+              onClick={loadMoreHistory}
+              disabled={isLoadingMore}
+              className="bg-gray-600 text-white px-4 py-2 rounded-lg font-semibold hover:bg-gray-700 transition-colors duration-200 disabled:opacity-50"
+              aria-label="Charger les scans plus anciens"
+            >
+              {isLoadingMore ? "Chargement..." : "Charger plus"}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
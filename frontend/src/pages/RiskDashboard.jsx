@@ -17,39 +17,52 @@ import { Bar } from "react-chartjs-2";
 // Register Chart.js components
 ChartJS.register(CategoryScale, LinearScale, BarElement, Title, Tooltip, Legend);
 
+// Vulnerability details fetched per page of /risks; further pages are loaded on demand
+const DETAILS_PAGE_SIZE = 100;
+
 const RiskDashboard = () => {
   const [risks, setRisks] = useState([]);
   const [details, setDetails] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
   const [isRefreshing, setIsRefreshing] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
-  const fetchRisks = async () => {
-    setLoading(true);
-    setError("");
-    try {
-      const user = JSON.parse(localStorage.getItem("user") || "{}");
-      const userId = user.id;
-      if (!userId) throw new Error("Utilisateur non connecté");
+  // Fetch the severity totals and one page of details
+  const fetchRisksPage = async (cursor) => {
+    const user = JSON.parse(localStorage.getItem("user") || "{}");
+    const userId = user.id;
+    if (!userId) throw new Error("Utilisateur non connecté");
 
-      const response = await fetch("http://127.0.0.1:5000/risks", {
-        method: "GET",
-        headers: {
-          "X-User-ID": userId,
-          Authorization: `Bearer ${localStorage.getItem("token")}`,
-        },
-      });
+    const params = new URLSearchParams({ limit: String(DETAILS_PAGE_SIZE) });
+    if (cursor) params.set("cursor", cursor);
+    const response = await fetch(`http://127.0.0.1:5000/risks?${params}`, {
+      method: "GET",
+      headers: {
+        "X-User-ID": userId,
+        Authorization: `Bearer ${localStorage.getItem("token")}`,
+      },
+    });
 
-      const data = await response.json();
-      console.log("📊 Données reçues :", data);
+    const data = await response.json();
+    console.log("📊 Données reçues :", data);
 
-      if (!response.ok) throw new Error(data.error || "Erreur serveur");
-      if (!data.risks || !Array.isArray(data.risks)) {
-        throw new Error("Format inattendu des données");
-      }
+    if (!response.ok) throw new Error(data.error || "Erreur serveur");
+    if (!data.risks || !Array.isArray(data.risks)) {
+      throw new Error("Format inattendu des données");
+    }
+    return data;
+  };
 
+  const fetchRisks = async () => {
+    setLoading(true);
+    setError("");
+    try {
+      const data = await fetchRisksPage(null);
       setRisks(data.risks);
       setDetails(data.details || []);
+      setNextCursor(data.next_cursor);
     } catch (error) {
       console.error("❌ Erreur lors de la récupération des risques :", error);
       setError("Impossible de récupérer les risques : " + error.message);
@@ -64,6 +77,26 @@ const RiskDashboard = () => {
     }
   };
 
+  // Append the next page of details when the user asks for more
+  const loadMoreDetails = async () => {
+    if (!nextCursor || isLoadingMore) return;
+    setIsLoadingMore(true);
+    try {
+      const data = await fetchRisksPage(nextCursor);
+      setDetails((previous) => [...previous, ...(data.details || [])]);
+      setNextCursor(data.next_cursor);
+    } catch (error) {
+      console.error("❌ Erreur lors de la récupération des risques :", error);
+      toast.error("Erreur lors du chargement des risques !", {
+        position: "top-right",
+        autoClose: 3000,
+        theme: "dark",
+      });
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchRisks();
   }, []);
@@ -255,6 +288,18 @@ const RiskDashboard = () => {
                       </div>
                     ))}
                   </div>
+                  {nextCursor && (
+                    <div className="mt-4 flex justify-center">
+                      <button
+                        onClick={loadMoreDetails}
+                        disabled={isLoadingMore}
+                        className="bg-gray-600 text-white px-4 py-2 rounded-lg font-semibold hover:bg-gray-500 transition-colors duration-200 disabled:opacity-50"
+                        aria-label="Charger plus de vulnérabilités"
+                      >
+                        {isLoadingMore ? "Chargement..." : "Charger plus"}
+                      </button>
+                    </div>
+                  )}
                 </>
               )}
             </div>